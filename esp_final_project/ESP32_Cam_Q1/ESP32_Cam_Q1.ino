@@ -30,6 +30,22 @@
 // Global buffer for image processing
 uint8_t image_buffer[TOTAL_PIXELS];
 
+// Thresholded mask encodings, selected with MASK:RAW|BITS|COORDS|AUTO
+#define MASK_RAW    0
+#define MASK_BITS   1
+#define MASK_COORDS 2
+#define MASK_AUTO   3
+#define ROW_BYTES ((IMAGE_WIDTH + 7) / 8)
+#define COORD_BUFFER_SIZE 4096
+
+int mask_mode = MASK_AUTO;
+uint8_t mask_bits[ROW_BYTES * IMAGE_HEIGHT];
+uint8_t mask_coords[COORD_BUFFER_SIZE];
+
+// Continuous mode: frames are sent back to back until STOP arrives
+bool streaming = false;
+uint32_t frame_seq = 0;
+
 void setup() {
   Serial.begin(115200);
   delay(1000);
@@ -100,25 +116,160 @@ void setup() {
   Serial.println("READY");
 }
 
-void processImage() {
-  Serial.println("GET_READY");
+// Thresholded image as one byte per pixel (0 / 255), returns the white count
+int sendThresholdedRaw(int threshold, int needed) {
+  int chunk_size = 1024;
+  Serial.println("THRESHOLDED_START");
+  Serial.print("WIDTH:");
+  Serial.println(IMAGE_WIDTH);
+  Serial.print("HEIGHT:");
+  Serial.println(IMAGE_HEIGHT);
   Serial.flush();
-  delay(2000);  // Give user 2 seconds warning to position camera
   
-  Serial.println("CAPTURING_NOW");
+  int taken = 0;
+  int white_count = 0;
+  
+  // Send thresholded image in chunks
+  for (int i = 0; i < TOTAL_PIXELS; i += chunk_size) {
+    uint8_t output_buffer[chunk_size];
+    int bytes_to_send = min(chunk_size, TOTAL_PIXELS - i);
+    
+    for (int j = 0; j < bytes_to_send; j++) {
+      int idx = i + j;
+      uint8_t pixel = image_buffer[idx];
+      uint8_t output;
+      
+      if (pixel > threshold) {
+        output = 255;
+        white_count++;
+      } else if (pixel < threshold) {
+        output = 0;
+      } else {
+        if (taken < needed) {
+          output = 255;
+          white_count++;
+          taken++;
+        } else {
+          output = 0;
+        }
+      }
+      
+      output_buffer[j] = output;
+    }
+    
+    Serial.write(output_buffer, bytes_to_send);
+    Serial.flush();
+    delay(10);  // Small delay to prevent buffer overflow
+  }
+  
+  Serial.println();
+  Serial.println("THRESHOLDED_END");
   Serial.flush();
   
-  // Turn ON flash and capture IMMEDIATELY
-  digitalWrite(FLASH_GPIO_NUM, HIGH);
-  Serial.println("FLASH_LED_ON");
-  delay(100);  // Small delay to let flash stabilize
+  return white_count;
+}
+
+// Thresholded image as a packed bitmask (THRESHOLDED_BITS, ROW_BYTES per row,
+// MSB first) or as the gaps between consecutive white pixel indices in raster
+// order, LEB128 varint coded (THRESHOLDED_COORDS), whichever is smaller
+// (MASK_AUTO). Same threshold and tie-break as sendThresholdedRaw().
+int sendThresholdedPacked(int threshold, int needed) {
+  int taken = 0;
+  int white_count = 0;
+  int coord_len = 0;
+  int prev = -1;
+  bool coords_fit = true;
+  
+  memset(mask_bits, 0, sizeof(mask_bits));
+  for (int idx = 0; idx < TOTAL_PIXELS; idx++) {
+    uint8_t pixel = image_buffer[idx];
+    if (pixel < threshold || (pixel == threshold && taken >= needed)) {
+      continue;
+    }
+    if (pixel == threshold) {
+      taken++;
+    }
+    white_count++;
+    
+    int x = idx % IMAGE_WIDTH;
+    int y = idx / IMAGE_WIDTH;
+    mask_bits[y * ROW_BYTES + (x >> 3)] |= 0x80 >> (x & 7);
+    
+    uint32_t gap = idx - prev;
+    prev = idx;
+    while (coords_fit) {
+      if (coord_len >= COORD_BUFFER_SIZE) {
+        coords_fit = false;
+        break;
+      }
+      uint8_t low = gap & 0x7F;
+      gap >>= 7;
+      mask_coords[coord_len++] = gap ? (low | 0x80) : low;
+      if (!gap) break;
+    }
+  }
   
-  camera_fb_t *fb = esp_camera_fb_get();
+  bool use_coords = coords_fit && (mask_mode == MASK_COORDS ||
+                                   (mask_mode == MASK_AUTO && coord_len < (int)sizeof(mask_bits)));
+  if (use_coords) {
+    Serial.println("THRESHOLDED_COORDS_START");
+  } else {
+    Serial.println("THRESHOLDED_BITS_START");
+  }
+  Serial.print("WIDTH:");
+  Serial.println(IMAGE_WIDTH);
+  Serial.print("HEIGHT:");
+  Serial.println(IMAGE_HEIGHT);
+  if (use_coords) {
+    Serial.print("COUNT:");
+    Serial.println(white_count);
+    Serial.print("BYTES:");
+    Serial.println(coord_len);
+  }
+  Serial.flush();
   
-  // Turn OFF flash immediately after capture
-  digitalWrite(FLASH_GPIO_NUM, LOW);
-  Serial.println("FLASH_LED_OFF");
+  uint8_t *data = use_coords ? mask_coords : mask_bits;
+  int length = use_coords ? coord_len : (int)sizeof(mask_bits);
+  int chunk_size = 1024;
+  for (int i = 0; i < length; i += chunk_size) {
+    Serial.write(data + i, min(chunk_size, length - i));
+    Serial.flush();
+  }
+  
+  Serial.println();
+  Serial.println(use_coords ? "THRESHOLDED_COORDS_END" : "THRESHOLDED_BITS_END");
+  Serial.flush();
+  return white_count;
+}
+
+// interactive: 2 second countdown and flash (CAPTURE command),
+// otherwise capture right away (STREAM mode)
+void processImage(bool interactive) {
+  camera_fb_t *fb;
+  if (interactive) {
+    Serial.println("GET_READY");
+    Serial.flush();
+    delay(2000);  // Give user 2 seconds warning to position camera
+    
+    Serial.println("CAPTURING_NOW");
+    Serial.flush();
+    
+    // Turn ON flash and capture IMMEDIATELY
+    digitalWrite(FLASH_GPIO_NUM, HIGH);
+    Serial.println("FLASH_LED_ON");
+    delay(100);  // Small delay to let flash stabilize
+    
+    fb = esp_camera_fb_get();
+    
+    // Turn OFF flash immediately after capture
+    digitalWrite(FLASH_GPIO_NUM, LOW);
+    Serial.println("FLASH_LED_OFF");
+  } else {
+    fb = esp_camera_fb_get();
+  }
   Serial.println("CAPTURE_DONE");
+  Serial.print("FRAME:");
+  Serial.println(frame_seq++);
   
   if (!fb) {
     Serial.println("CAPTURE_FAILED");
@@ -186,52 +337,8 @@ void processImage() {
   delay(100);
   
   // Create thresholded image
-  Serial.println("THRESHOLDED_START");
-  Serial.print("WIDTH:");
-  Serial.println(IMAGE_WIDTH);
-  Serial.print("HEIGHT:");
-  Serial.println(IMAGE_HEIGHT);
-  Serial.flush();
-  
-  int taken = 0;
-  int white_count = 0;
-  
-  // Send thresholded image in chunks
-  for (int i = 0; i < TOTAL_PIXELS; i += chunk_size) {
-    uint8_t output_buffer[chunk_size];
-    int bytes_to_send = min(chunk_size, TOTAL_PIXELS - i);
-    
-    for (int j = 0; j < bytes_to_send; j++) {
-      int idx = i + j;
-      uint8_t pixel = image_buffer[idx];
-      uint8_t output;
-      
-      if (pixel > threshold) {
-        output = 255;
-        white_count++;
-      } else if (pixel < threshold) {
-        output = 0;
-      } else {
-        if (taken < needed) {
-          output = 255;
-          white_count++;
-          taken++;
-        } else {
-          output = 0;
-        }
-      }
-      
-      output_buffer[j] = output;
-    }
-    
-    Serial.write(output_buffer, bytes_to_send);
-    Serial.flush();
-    delay(10);  // Small delay to prevent buffer overflow
-  }
-  
-  Serial.println();
-  Serial.println("THRESHOLDED_END");
-  Serial.flush();
+  int white_count = (mask_mode == MASK_RAW) ? sendThresholdedRaw(threshold, needed)
+                                            : sendThresholdedPacked(threshold, needed);
   
   Serial.print("WHITE_PIXELS:");
   Serial.println(white_count);
@@ -252,7 +359,24 @@ void loop() {
     Serial.println("]");
     
     if (cmd == "CAPTURE") {
-      processImage();
+      processImage(true);
+    }
+    else if (cmd == "STREAM") {
+      streaming = true;
+      Serial.println("STREAM_ON");
+    }
+    else if (cmd == "STOP") {
+      streaming = false;
+      Serial.println("STREAM_OFF");
+    }
+    else if (cmd.startsWith("MASK:")) {
+      String mode = cmd.substring(5);
+      if (mode == "RAW") mask_mode = MASK_RAW;
+      else if (mode == "BITS") mask_mode = MASK_BITS;
+      else if (mode == "COORDS") mask_mode = MASK_COORDS;
+      else mask_mode = MASK_AUTO;
+      Serial.print("MASK_MODE:");
+      Serial.println(mask_mode);
     }
     else if (cmd == "TEST") {
       Serial.println("TEST_OK");
@@ -270,5 +394,9 @@ void loop() {
     }
   }
   
+  if (streaming) {
+    processImage(false);
+    return;
+  }
   delay(10);
 }
\ No newline at end of file
@@ -1,4 +1,5 @@
 #include "esp_camera.h"
+#include "resize_tables.h"
 
 // --- CAMERA PIN DEFINITIONS (AI THINKER) ---
 #define PWDN_GPIO_NUM     32
@@ -22,6 +23,10 @@
 // Increased chunk size for faster transmission
 #define CHUNK_SIZE 4096
 
+// Host resize mode (h1/h0): resized frames are sent as a *_DESC line only and
+// the host rebuilds them from the original (view_resized_image.py)
+bool host_resize = false;
+
 void setup() {
   Serial.begin(115200);
   delay(2000);
@@ -32,6 +37,7 @@ void setup() {
   Serial.println("  u<value> - Upsample only (e.g., u2.0, u1.5)");
   Serial.println("  d<value> - Downsample only (e.g., d0.5, d0.666)");
   Serial.println("  b<up>,<down> - Both (e.g., b1.5,0.666)");
+  Serial.println("  h1 / h0 - Host resize mode on/off (send descriptors, not resized pixels)");
 }
 
 void loop() {
@@ -75,6 +81,10 @@ void loop() {
         }
       }
     }
+    else if (mode == 'h') {
+      host_resize = cmd.substring(1).toInt() != 0;
+      Serial.println(host_resize ? "HOST_RESIZE:ON" : "HOST_RESIZE:OFF");
+    }
   }
 }
 
@@ -144,12 +154,34 @@ void sendOriginal(camera_fb_t *fb) {
   delay(50);
 }
 
+// Describes a resize exactly enough for the host to redo it bit for bit:
+//   <TAG>_DESC:src_w:src_h:new_w:new_h:scale:<float32 bits of scale>:NEAREST:TRUNC
+// NEAREST:TRUNC is the mapping below, src = min((int)(i / scale), size - 1)
+// in float32. Sent before every resized frame; in host resize mode the frame
+// itself is skipped.
+// Returns true if the pixels should still be sent.
+bool sendResizeDescriptor(const char *tag, camera_fb_t *fb, int new_w, int new_h, float scale) {
+  uint32_t bits;
+  memcpy(&bits, &scale, sizeof(bits));
+  Serial.printf("%s_DESC:%d:%d:%d:%d:%.3f:%08X:NEAREST:TRUNC\n",
+                tag, fb->width, fb->height, new_w, new_h, scale, (unsigned int)bits);
+  if (host_resize) {
+    Serial.printf("%s_DONE\n", tag);
+    return false;
+  }
+  return true;
+}
+
 void sendUpsampled(camera_fb_t *fb, float scale) {
   int w = fb->width;
   int h = fb->height;
   int new_w = (int)(w * scale);
   int new_h = (int)(h * scale);
   
+  if (!sendResizeDescriptor("UPSAMPLED", fb, new_w, new_h, scale)) {
+    return;
+  }
+  
   Serial.printf("UPSAMPLED:%d:%d:%.3f\n", new_w, new_h, scale);
   Serial.flush();
   delay(50);
@@ -161,16 +193,24 @@ void sendUpsampled(camera_fb_t *fb, float scale) {
     return;
   }
   
+  // Precomputed index tables (resize_tables.h) for the common scales, they
+  // give the same pixels as the per-pixel division below
+  const resize_table_t *table = resize_find_table(w, h, scale, RESIZE_NEAREST);
+  
   // Process and send row by row
   for (int y = 0; y < new_h; y++) {
-    int src_y = (int)(y / scale);
-    if (src_y >= h) src_y = h - 1;
-    
-    // Fill row buffer
-    for (int x = 0; x < new_w; x++) {
-      int src_x = (int)(x / scale);
-      if (src_x >= w) src_x = w - 1;
-      row_buffer[x] = fb->buf[src_y * w + src_x];
+    if (table) {
+      resize_table_row(table, fb->buf, y, NULL, row_buffer);
+    } else {
+      int src_y = (int)(y / scale);
+      if (src_y >= h) src_y = h - 1;
+      
+      // Fill row buffer
+      for (int x = 0; x < new_w; x++) {
+        int src_x = (int)(x / scale);
+        if (src_x >= w) src_x = w - 1;
+        row_buffer[x] = fb->buf[src_y * w + src_x];
+      }
     }
     
     // Send row
@@ -196,6 +236,10 @@ void sendDownsampled(camera_fb_t *fb, float scale) {
   int new_w = (int)(w * scale);
   int new_h = (int)(h * scale);
   
+  if (!sendResizeDescriptor("DOWNSAMPLED", fb, new_w, new_h, scale)) {
+    return;
+  }
+  
   Serial.printf("DOWNSAMPLED:%d:%d:%.3f\n", new_w, new_h, scale);
   Serial.flush();
   delay(50);
@@ -207,16 +251,24 @@ void sendDownsampled(camera_fb_t *fb, float scale) {
     return;
   }
   
+  // Precomputed index tables (resize_tables.h) for the common scales, they
+  // give the same pixels as the per-pixel division below
+  const resize_table_t *table = resize_find_table(w, h, scale, RESIZE_NEAREST);
+  
   // Process and send row by row
   for (int y = 0; y < new_h; y++) {
-    int src_y = (int)(y / scale);
-    if (src_y >= h) src_y = h - 1;
-    
-    // Fill row buffer
-    for (int x = 0; x < new_w; x++) {
-      int src_x = (int)(x / scale);
-      if (src_x >= w) src_x = w - 1;
-      row_buffer[x] = fb->buf[src_y * w + src_x];
+    if (table) {
+      resize_table_row(table, fb->buf, y, NULL, row_buffer);
+    } else {
+      int src_y = (int)(y / scale);
+      if (src_y >= h) src_y = h - 1;
+      
+      // Fill row buffer
+      for (int x = 0; x < new_w; x++) {
+        int src_x = (int)(x / scale);
+        if (src_x >= w) src_x = w - 1;
+        row_buffer[x] = fb->buf[src_y * w + src_x];
+      }
     }
     
     // Send row
@@ -0,0 +1,135 @@
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from exact_threshold import exact_mask, open_image
+from script import extract_exact_pixels
+
+# Headless extract_exact_pixels over folders and globs:
+#
+#   python batch_extract.py captures/ "more/**/*.png" --out masks --csv results.csv
+#
+# Images are spread over a process pool in chunks of --chunksize paths and
+# every result is written to the CSV (and its mask to --out) as soon as it
+# arrives, in completion order. Masks keep the input's path relative to the
+# common folder of all inputs, extension included, with ".png" appended
+# (a.jpg -> a.jpg.png), so a.png and a.jpg do not overwrite each other.
+# .npy inputs are always read as they are (open_image), cv2 cannot load them.
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".pgm", ".npy")
+
+CSV_FIELDS = ("path", "width", "height", "threshold", "above", "needed", "white", "mask", "ms", "error")
+
+
+def find_images(inputs):
+    """Sorted, de-duplicated image paths of directories (recursive), globs and files"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.update(os.path.join(root, name) for name in files
+                             if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif glob.has_magic(item):
+            paths.update(path for path in glob.glob(item, recursive=True) if os.path.isfile(path))
+        elif os.path.isfile(item):
+            paths.add(item)
+        else:
+            print(f"Warning: {item} not found", file=sys.stderr)
+    return sorted(paths)
+
+
+def mask_path(path, root, out_dir):
+    return os.path.join(out_dir, os.path.relpath(path, root) + ".png")
+
+
+# Per worker settings, set once by init_worker() instead of shipping them
+# with every task
+settings = {}
+
+
+def init_worker(target, root, out_dir, unchanged):
+    # One OpenCV thread per process, the pool already uses every core
+    cv2.setNumThreads(1)
+    settings.update(target=target, root=root, out_dir=out_dir, unchanged=unchanged)
+
+
+def process(path):
+    """One image -> CSV row dict, errors are reported in the row"""
+    row = dict.fromkeys(CSV_FIELDS, "")
+    row["path"] = path
+    start = time.perf_counter()
+    try:
+        if settings["unchanged"] or path.lower().endswith(".npy"):
+            mask, result = exact_mask(np.asarray(open_image(path)), settings["target"])
+        else:
+            extracted = extract_exact_pixels(path, settings["target"], show=False)
+            if extracted is None:
+                raise ValueError("unreadable image")
+            mask, result = extracted
+        row.update(height=mask.shape[0], width=mask.shape[1], white=int(np.count_nonzero(mask)),
+                   **result._asdict())
+        if settings["out_dir"]:
+            row["mask"] = mask_path(path, settings["root"], settings["out_dir"])
+            os.makedirs(os.path.dirname(row["mask"]), exist_ok=True)
+            if not cv2.imwrite(row["mask"], mask):
+                raise OSError(f"could not write {row['mask']}")
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["ms"] = f"{(time.perf_counter() - start) * 1e3:.2f}"
+    return row
+
+
+def run_batch(paths, csv_path, out_dir=None, target=1000, workers=None, chunksize=64,
+              unchanged=False, progress=1000):
+    """Processes paths on a pool, streaming rows into csv_path. Returns (done, failed)."""
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else "."
+    done = failed = 0
+    start = time.perf_counter()
+    with open(csv_path, "w", newline="") as f, \
+         Pool(workers, init_worker, (target, root, out_dir, unchanged)) as pool:
+        writer = csv.DictWriter(f, CSV_FIELDS)
+        writer.writeheader()
+        for row in pool.imap_unordered(process, [os.path.abspath(p) for p in paths], chunksize):
+            writer.writerow(row)
+            done += 1
+            if row["error"]:
+                failed += 1
+                print(f"{row['path']}: {row['error']}", file=sys.stderr)
+            if done % progress == 0 or done == len(paths):
+                f.flush()
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{len(paths)} images, {failed} failed, {done / max(elapsed, 1e-9):.1f} img/s")
+    return done, failed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Exact-count thresholding of image folders")
+    parser.add_argument("inputs", nargs="+", help="image files, directories (recursive) or glob patterns")
+    parser.add_argument("--csv", default="exact_pixels.csv", help="results table")
+    parser.add_argument("--out", help="mask directory (masks are not written without it)")
+    parser.add_argument("--target", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=64, help="paths handed to a worker at once")
+    parser.add_argument("--unchanged", action="store_true",
+                        help="keep 16-bit data instead of converting to 8-bit gray (.npy is always kept)")
+    args = parser.parse_args(argv)
+
+    paths = find_images(args.inputs)
+    if not paths:
+        print("No images found")
+        return 1
+    print(f"{len(paths)} images -> {args.csv}" + (f", masks in {args.out}" if args.out else ""))
+    done, failed = run_batch(paths, args.csv, args.out, args.target, args.workers,
+                             args.chunksize, args.unchanged)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
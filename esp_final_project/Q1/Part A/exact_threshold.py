@@ -0,0 +1,229 @@
+import argparse
+import os
+import sys
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Exact-count thresholding, bit-exact with ESP32_Cam_Q1:
+#
+#   threshold  highest level t with at least `target` pixels >= t
+#   above      pixels > t
+#   needed     target - above, taken from the pixels == t in raster order
+#              (row by row, left to right)
+#
+# Images with fewer than `target` pixels in total follow the firmware as
+# well: threshold 0, above = every pixel, and the whole image turns white.
+ThresholdResult = namedtuple("ThresholdResult", "threshold above needed")
+
+# Histogram bins per supported pixel type
+LEVELS = {np.dtype(np.uint8): 256, np.dtype(np.uint16): 65536}
+
+# Working set of the tiled mode: rows per band are chosen so that one band
+# of pixels plus its mask and tie scratch stays below this many bytes
+TILE_BUDGET = 64 << 20
+
+
+def dtype_levels(dtype):
+    try:
+        return LEVELS[np.dtype(dtype)]
+    except KeyError:
+        raise ValueError(f"unsupported pixel type {np.dtype(dtype)}, expected uint8 or uint16") from None
+
+
+def histograms(stack, levels=None):
+    """(N, levels) int64 histograms of an (N, ...) stack"""
+    stack = np.asarray(stack)
+    levels = levels or dtype_levels(stack.dtype)
+    hists = np.empty((len(stack), levels), dtype=np.int64)
+    for i, image in enumerate(stack):
+        if image.dtype == np.uint8 and image.size < 1 << 24:
+            # calcHist counts in float32, exact below 2**24 pixels
+            hists[i] = cv2.calcHist([np.ascontiguousarray(image)], [0], None, [levels], [0, levels]).ravel()
+        else:
+            hists[i] = np.bincount(image.ravel(), minlength=levels)[:levels]
+    return hists
+
+
+def find_thresholds(hists, target=1000):
+    """(N, levels) histograms -> (thresholds, above, needed) int64 arrays"""
+    hists = np.atleast_2d(hists)
+    # at_least[:, i] = pixels >= i
+    at_least = np.cumsum(hists[:, ::-1], axis=1)[:, ::-1]
+    thresholds = np.maximum(np.count_nonzero(at_least >= target, axis=1) - 1, 0)
+    rows = np.arange(len(hists))
+    above = np.where(at_least[:, 0] >= target,
+                     at_least[rows, thresholds] - hists[rows, thresholds], at_least[:, 0])
+    return thresholds, above, target - above
+
+
+def find_threshold(hist, target=1000):
+    """ThresholdResult of a single (levels,) histogram"""
+    return ThresholdResult(*(int(v[0]) for v in find_thresholds(hist, target)))
+
+
+def masks_for(stack, thresholds, needed, out=None):
+    """Binary 0/255 masks of an (N, H, W) stack for known thresholds and tie counts.
+
+    Ties are broken per image by slicing the flat indices of its pixels ==
+    threshold, so no Python loop runs per pixel.
+    """
+    stack = np.asarray(stack)
+    count = len(stack)
+    flat = stack.reshape(count, -1)
+    if out is None:
+        out = np.empty(stack.shape, dtype=np.uint8)
+    masks = out.reshape(count, -1)
+    # Compare in the image dtype, thresholds always fit
+    levels_at = np.asarray(thresholds).astype(flat.dtype).reshape(count, 1)
+    needed = np.asarray(needed).reshape(count)
+    np.greater(flat, levels_at, out=masks.view(bool))
+    masks *= 255
+
+    ties = np.flatnonzero(flat == levels_at)
+    image = ties // flat.shape[1]
+    first = np.searchsorted(image, np.arange(count))
+    rank = np.arange(ties.size) - first[image]
+    masks.reshape(-1)[ties[rank < needed[image]]] = 255
+    return out
+
+
+def exact_masks(stack, target=1000, out=None, levels=None):
+    """Binary 0/255 masks with exactly `target` white pixels for an (N, H, W) stack.
+
+    Returns (masks, thresholds, above, needed).
+    """
+    thresholds, above, needed = find_thresholds(histograms(stack, levels), target)
+    return masks_for(stack, thresholds, needed, out), thresholds, above, needed
+
+
+def exact_mask(gray, target=1000, out=None, levels=None):
+    """exact_masks() of a single image -> (mask, ThresholdResult)"""
+    mask, thresholds, above, needed = exact_masks(
+        gray[None], target, None if out is None else out[None], levels)
+    return mask[0], ThresholdResult(int(thresholds[0]), int(above[0]), int(needed[0]))
+
+
+def mismatches(stack, device_masks, target=1000):
+    """Per image count of pixels where a device mask differs from exact_masks()"""
+    expected = exact_masks(stack, target)[0]
+    device = np.asarray(device_masks) != 0
+    return np.count_nonzero((expected != 0) != device, axis=tuple(range(1, expected.ndim)))
+
+
+# Out-of-core mode for images that do not fit in memory (stitched scans,
+# 16-bit sensor dumps). The image is read in bands of whole rows, so raster
+# order is band order and the tie-break only has to carry the number of
+# threshold-level pixels taken so far from one band to the next.
+
+def open_image(path, shape=None, dtype=None):
+    """Memory-mapped grayscale image.
+
+    .npy files and headerless raw dumps (which need shape and dtype) are
+    mapped, not read. Other formats go through cv2.imread and are loaded.
+    """
+    if path.endswith(".npy"):
+        image = np.load(path, mmap_mode="r")
+    elif shape is not None:
+        image = np.memmap(path, dtype=dtype or np.uint16, mode="r", shape=tuple(shape))
+    else:
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise FileNotFoundError(path)
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if image.ndim != 2:
+        raise ValueError(f"{path}: expected a 2D grayscale image, got shape {image.shape}")
+    dtype_levels(image.dtype)
+    return image
+
+
+def band_rows(image, budget=TILE_BUDGET):
+    """Rows per band so that pixels + mask + tie flags of one band fit the budget"""
+    return max(1, budget // (image.shape[1] * (image.dtype.itemsize + 2)))
+
+
+def iter_bands(image, rows):
+    for y in range(0, image.shape[0], rows):
+        yield y, np.asarray(image[y:y + rows])
+
+
+def tiled_histogram(image, budget=TILE_BUDGET):
+    """Pass 1: histogram accumulated band by band"""
+    levels = dtype_levels(image.dtype)
+    hist = np.zeros(levels, dtype=np.int64)
+    for _, band in iter_bands(image, band_rows(image, budget)):
+        hist += histograms(band[None], levels)[0]
+    return hist
+
+
+def iter_mask_bands(image, result, budget=TILE_BUDGET):
+    """Pass 2: yields (y, mask band) for a ThresholdResult of the image.
+
+    Mask bands are reused buffers, only valid until the next one.
+    """
+    threshold, _, needed = result
+    rows = band_rows(image, budget)
+    level = image.dtype.type(threshold)
+    out = np.empty((rows, image.shape[1]), dtype=np.uint8)
+    equal = np.empty((rows, image.shape[1]), dtype=bool)
+    taken = 0
+    for y, band in iter_bands(image, rows):
+        mask = out[:len(band)]
+        np.greater(band, level, out=mask.view(bool))
+        mask *= 255
+        if taken < needed:
+            # Ties are counted per row first and only the rows up to the last
+            # one taken are searched, so the index array stays near `needed`
+            # entries instead of one per pixel of the band
+            ties = equal[:len(band)]
+            np.equal(band, level, out=ties)
+            per_row = np.cumsum(np.count_nonzero(ties, axis=1))
+            last = int(np.searchsorted(per_row, needed - taken)) + 1
+            index = np.flatnonzero(ties[:last])[:needed - taken]
+            mask.reshape(-1)[index] = 255
+            taken += index.size
+        yield y, mask
+
+
+def exact_mask_tiled(image, target=1000, out=None, budget=TILE_BUDGET):
+    """Two-pass exact_mask() with a bounded working set -> (mask, ThresholdResult).
+
+    out may be any writable (H, W) uint8 array, typically a memory map such
+    as np.lib.format.open_memmap(); by default the mask is kept in memory.
+    """
+    result = find_threshold(tiled_histogram(image, budget), target)
+    if out is None:
+        out = np.empty(image.shape, dtype=np.uint8)
+    for y, mask in iter_mask_bands(image, result, budget):
+        out[y:y + len(mask)] = mask
+    return out, result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Exact-count thresholding of a large 8/16-bit image")
+    parser.add_argument("input", help=".npy, raw dump (with --shape) or any image cv2 can read")
+    parser.add_argument("output", help="mask written as .npy (memory-mapped) or an image file")
+    parser.add_argument("--target", type=int, default=1000)
+    parser.add_argument("--shape", type=int, nargs=2, metavar=("HEIGHT", "WIDTH"), help="raw dump geometry")
+    parser.add_argument("--dtype", choices=("uint8", "uint16"), default="uint16", help="raw dump pixel type")
+    parser.add_argument("--budget-mb", type=int, default=TILE_BUDGET >> 20)
+    args = parser.parse_args(argv)
+
+    image = open_image(args.input, args.shape, args.dtype)
+    if args.output.endswith(".npy"):
+        out = np.lib.format.open_memmap(args.output, mode="w+", dtype=np.uint8, shape=image.shape)
+    else:
+        out = None
+    mask, result = exact_mask_tiled(image, args.target, out, args.budget_mb << 20)
+    if out is None:
+        cv2.imwrite(args.output, mask)
+    else:
+        out.flush()
+    print(f"{image.shape[1]}x{image.shape[0]} {image.dtype}: threshold {result.threshold}, "
+          f"above {result.above}, needed {result.needed} -> {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,54 +1,37 @@
+import sys
+
 import cv2
 import numpy as np
 
-def extract_exact_pixels(image_path, target_count=1000):
+from exact_threshold import exact_mask
+
+def extract_exact_pixels(image_path, target_count=1000, show=True):
+    # Returns (binary image, (threshold, above, needed)); show=False skips the
+    # prints and windows (see batch_extract.py for whole folders)
     # 1. Load Image in COLOR (to show the true original)
     original_img = cv2.imread(image_path, cv2.IMREAD_COLOR)
     
     if original_img is None:
-        print("Error: Image not found.")
+        if show:
+            print("Error: Image not found.")
         return
 
     # 2. Convert to Grayscale for processing
     gray_img = cv2.cvtColor(original_img, cv2.COLOR_BGR2GRAY)
 
-    # 3. Histogram Analysis on the Grayscale image
-    hist = cv2.calcHist([gray_img], [0], None, [256], [0, 256])
+    # 3. Histogram Analysis + 4. Binary Image (with the ESP32 tie-breaker):
+    # everything brighter than the threshold, plus the first 'needed' pixels
+    # AT the threshold in raster order
+    binary_img, result = exact_mask(gray_img, target_count)
+    threshold_val, current_count, needed_from_threshold_level = result
+
+    if not show:
+        return binary_img, result
 
-    current_count = 0
-    threshold_val = 0
-    
-    # Find the threshold where we cross the target
-    for i in range(255, -1, -1):
-        count_at_level = int(hist[i][0])
-        if current_count + count_at_level >= target_count:
-            threshold_val = i
-            break
-        current_count += count_at_level
-        
-    # Calculate how many pixels we need from the "borderline" intensity level
-    needed_from_threshold_level = target_count - current_count
-    
     print(f"Threshold Level: {threshold_val}")
     print(f"Pixels brighter than {threshold_val}: {current_count}")
     print(f"Pixels needed from level {threshold_val}: {needed_from_threshold_level}")
 
-    # 4. Create the Binary Image (The Tie-Breaker)
-    binary_img = np.zeros_like(gray_img)
-    
-    # A. Set all pixels strictly BRIGHTER than threshold to White (255)
-    binary_img[gray_img > threshold_val] = 255
-    
-    # B. Set exactly 'N' pixels AT the threshold to White
-    # Get coordinates of all pixels that equal the threshold value
-    rows, cols = np.where(gray_img == threshold_val)
-    
-    # Select the exact number needed to reach 1000
-    coords = list(zip(rows, cols))[:needed_from_threshold_level]
-    
-    for r, c in coords:
-        binary_img[r, c] = 255
-
     # Verify Count
     print(f"Final Total White Pixels: {np.count_nonzero(binary_img)}")
 
@@ -59,6 +42,9 @@ def extract_exact_pixels(image_path, target_count=1000):
     
     cv2.waitKey(0)
     cv2.destroyAllWindows()
+    return binary_img, result
 
 # Usage
-extract_exact_pixels('Gemini_Generated_Image_9jooi29jooi29joo.png', target_count=1000)
\ No newline at end of file
+if __name__ == "__main__":
+    image_path = sys.argv[1] if len(sys.argv) > 1 else 'Gemini_Generated_Image_9jooi29jooi29joo.png'
+    extract_exact_pixels(image_path, target_count=1000)
\ No newline at end of file
@@ -0,0 +1,218 @@
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from exact_threshold import dtype_levels, find_threshold, histograms, masks_for
+
+# Per frame result of StreamingThresholder.update():
+#   threshold, above, needed  as in exact_threshold.ThresholdResult
+#   ties                      pixels at the threshold level (needed of them are white)
+#   changed                   blocks whose pixels changed since the last frame
+#   steps                     levels the threshold search moved from the last threshold
+#   full                      True when the histogram was rebuilt from scratch
+FrameStats = namedtuple("FrameStats", "seq threshold above needed ties changed steps full")
+
+
+class StreamingThresholder:
+    """Exact-count thresholding of a video stream, same results as exact_mask().
+
+    The histogram of the previous frame is kept and only the block x block
+    blocks that changed are subtracted/added again. The threshold search
+    walks from the previous threshold, so nearly identical frames cost a
+    frame compare plus the mask itself. When more than `refresh` of the
+    blocks changed (or the geometry did) the histogram is rebuilt.
+    """
+
+    def __init__(self, target=1000, block=16, refresh=0.5):
+        self.target = target
+        self.block = block
+        self.refresh = refresh
+        self.reset()
+
+    def reset(self):
+        self.previous = None
+        self.hist = None
+        self.threshold = None
+        self.seq = 0
+
+    def changed_blocks(self, frame):
+        """(rows, cols) boolean grid of blocks that differ from the last frame"""
+        block = self.block
+        diff = frame != self.previous
+        # Rows first: only bands of rows that changed are reduced per column
+        bands = np.logical_or.reduceat(diff.any(axis=1), np.arange(0, frame.shape[0], block))
+        columns = np.arange(0, frame.shape[1], block)
+        grid = np.zeros((len(bands), len(columns)), dtype=bool)
+        for band in np.flatnonzero(bands):
+            grid[band] = np.logical_or.reduceat(diff[band * block:(band + 1) * block].any(axis=0), columns)
+        return grid
+
+    def update_histogram(self, frame, changed):
+        """Moves the changed blocks of the last frame out of the histogram, the new ones in"""
+        levels = len(self.hist)
+        block = self.block
+        blocks = [np.s_[r * block:(r + 1) * block, c * block:(c + 1) * block]
+                  for r, c in zip(*np.nonzero(changed))]
+        old = np.concatenate([self.previous[b].ravel() for b in blocks])
+        new = np.concatenate([frame[b].ravel() for b in blocks])
+        self.hist -= np.bincount(old, minlength=levels)
+        self.hist += np.bincount(new, minlength=levels)
+
+    def search(self):
+        """Threshold, above and steps, starting from the previous threshold"""
+        hist = self.hist
+        t = self.threshold
+        at_least = int(hist[t:].sum())
+        steps = 0
+        if at_least >= self.target:
+            while t + 1 < len(hist) and at_least - hist[t] >= self.target:
+                at_least -= int(hist[t])
+                t += 1
+                steps += 1
+        else:
+            while t > 0 and at_least < self.target:
+                t -= 1
+                at_least += int(hist[t])
+                steps += 1
+        if at_least < self.target:
+            # Fewer pixels than target: like the firmware, everything is white
+            return 0, at_least, steps
+        return t, at_least - int(hist[t]), steps
+
+    def update(self, frame, changed=None, out=None):
+        """Thresholds the next (H, W) grayscale frame -> (mask, FrameStats).
+
+        changed may pass a known (rows, cols) block grid of changed blocks
+        (e.g. from ROI transfers) and skips the frame compare.
+        """
+        frame = np.asarray(frame)
+        grid = (-(-frame.shape[0] // self.block), -(-frame.shape[1] // self.block))
+        full = self.previous is None or self.previous.shape != frame.shape \
+            or self.previous.dtype != frame.dtype
+        if not full:
+            if changed is None:
+                changed = self.changed_blocks(frame)
+            full = np.count_nonzero(changed) > self.refresh * changed.size
+        if full:
+            self.hist = histograms(frame[None], dtype_levels(frame.dtype))[0]
+            result = find_threshold(self.hist, self.target)
+            threshold, above, steps = result.threshold, result.above, 0
+            changed_count = grid[0] * grid[1]
+            self.previous = frame.copy()
+        else:
+            changed_count = int(np.count_nonzero(changed))
+            if changed_count:
+                self.update_histogram(frame, changed)
+                np.copyto(self.previous, frame)
+            threshold, above, steps = self.search()
+        self.threshold = threshold
+        needed = self.target - above
+        mask = masks_for(frame[None], [threshold], [needed], None if out is None else out[None])[0]
+        stats = FrameStats(self.seq, threshold, above, needed, int(self.hist[threshold]),
+                           changed_count, steps, full)
+        self.seq += 1
+        return mask, stats
+
+
+def video_frames(source):
+    """Grayscale frames of a video file or camera index"""
+    capture = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    finally:
+        capture.release()
+
+
+def esp32_frames(port):
+    """(original, device mask) pairs from ESP32CameraSystem's STREAM mode
+
+    Streaming stops when the generator is closed.
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Part B"))
+    from visualize_image import ESP32CameraSystem
+    from stream_capture import ESP32Streamer, FrameQueue
+
+    camera = ESP32CameraSystem(port=port)
+    if not camera.connect():
+        return
+    queue = FrameQueue()
+    streamer = ESP32Streamer(camera, queue)
+    streamer.start()
+    try:
+        while True:
+            frame = queue.get(timeout=0.5)
+            if frame is not None and frame.original is not None:
+                yield frame.original, frame.thresholded
+    finally:
+        streamer.stop()
+        camera.close()
+
+
+def run(frames, target=1000, block=16, show=False, limit=None):
+    """Thresholds (frame, device mask or None) pairs, prints per frame stats.
+
+    Device masks (ESP32 STREAM mode) are checked against the host result.
+    Returns the list of FrameStats.
+    """
+    thresholder = StreamingThresholder(target, block)
+    history = []
+    start = time.perf_counter()
+    for frame, device in frames:
+        began = time.perf_counter()
+        mask, stats = thresholder.update(frame)
+        elapsed = (time.perf_counter() - began) * 1e3
+        history.append(stats)
+        check = ""
+        if device is not None:
+            check = f" | device mismatch {np.count_nonzero((device != 0) != (mask != 0))}"
+        print(f"#{stats.seq:5d} threshold {stats.threshold:5d} above {stats.above:6d} "
+              f"needed {stats.needed:5d}/{stats.ties:6d} ties | changed {stats.changed:4d} "
+              f"steps {stats.steps:3d}{' full' if stats.full else ''} | {elapsed:6.2f} ms{check}")
+        if show:
+            cv2.imshow("Frame", frame)
+            cv2.imshow(f"Exact {target}", mask)
+            if cv2.waitKey(1) & 0xFF in (ord('q'), 27):
+                break
+        if limit is not None and len(history) >= limit:
+            break
+    if show:
+        cv2.destroyAllWindows()
+    elapsed = time.perf_counter() - start
+    print(f"{len(history)} frames in {elapsed:.2f} s")
+    return history
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Exact-count thresholding of a video stream")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="video file or camera index")
+    source.add_argument("--port", help="ESP32-CAM serial port (STREAM mode, device masks are checked)")
+    parser.add_argument("--target", type=int, default=1000)
+    parser.add_argument("--block", type=int, default=16)
+    parser.add_argument("--frames", type=int, default=None)
+    parser.add_argument("--show", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.video is not None:
+        frames = ((frame, None) for frame in video_frames(args.video))
+    else:
+        frames = esp32_frames(args.port)
+    try:
+        run(frames, args.target, args.block, args.show, args.frames)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frames.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,215 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Record types produced by FrameStreamParser
+RECORD_LINE = "line"            # status line, value = text
+RECORD_META = "meta"            # KEY:value line, key = lower case key, value = int
+RECORD_FRAME_HEADER = "header"  # key = frame name, value = (width, height)
+RECORD_PAYLOAD = "payload"      # key = frame name, value = bytes received so far
+RECORD_FRAME = "frame"          # key = frame name, value = (height, width) uint8 array
+RECORD_FRAME_END = "end"        # key = frame name
+RECORD_DONE = "done"
+
+Record = namedtuple("Record", "type key value")
+
+# Lines that carry an integer value after the colon
+META_KEYS = ("FRAME", "PROCESSED", "THRESHOLD", "ABOVE", "NEEDED", "WHITE_PIXELS")
+
+# Payload kinds, selected by the suffix of NAME_START:
+#   NAME_START        WIDTH, HEIGHT, width * height bytes
+#   NAME_BITS_START   WIDTH, HEIGHT, ceil(width / 8) * height bytes of 0/1
+#                     pixels, MSB first, every row padded to a whole byte
+#   NAME_COORDS_START WIDTH, HEIGHT, COUNT, BYTES, then BYTES bytes: the gaps
+#                     between consecutive set pixel indices (raster order,
+#                     starting from -1) as LEB128 varints
+# Bitmask and coordinate records are decoded into a 0/255 NAME frame.
+KIND_RAW = "raw"
+KIND_BITS = "bits"
+KIND_COORDS = "coords"
+KIND_FIELDS = {KIND_RAW: ("WIDTH", "HEIGHT"), KIND_BITS: ("WIDTH", "HEIGHT"),
+               KIND_COORDS: ("WIDTH", "HEIGHT", "COUNT", "BYTES")}
+
+# Byte -> its 8 pixels as 0/255, MSB first
+BIT_LUT = (np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1) * 255).astype(np.uint8)
+
+
+def split_name(text):
+    """'THRESHOLDED_BITS' -> ('thresholded', 'bits')"""
+    name = text.lower()
+    for kind in (KIND_BITS, KIND_COORDS):
+        if name.endswith("_" + kind):
+            return name[:-len(kind) - 1], kind
+    return name, KIND_RAW
+
+
+def decode_varints(data, count=None):
+    """LEB128 varints -> int64 array, vectorized"""
+    b = np.frombuffer(data, dtype=np.uint8)
+    if b.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    last = b < 0x80
+    group = np.concatenate(([0], np.cumsum(last[:-1])))
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    shift = 7 * (np.arange(b.size) - starts[group])
+    values = np.bincount(group, weights=(b & 0x7F).astype(np.int64) << shift,
+                         minlength=count or 0)
+    return values.astype(np.int64)
+
+
+def decode_bits(packed, width, height, out):
+    """Packed bitmask -> 0/255 pixels written into out (height, width)"""
+    rows = np.frombuffer(packed, dtype=np.uint8).reshape(height, -1)
+    if width % 8 == 0:
+        np.take(BIT_LUT, rows, axis=0, out=out.reshape(height, width // 8, 8))
+    else:
+        out[:] = BIT_LUT[rows].reshape(height, -1)[:, :width]
+    return out
+
+
+def decode_coords(data, count, out):
+    """Varint coded index gaps -> 0/255 pixels written into out"""
+    flat = np.cumsum(decode_varints(data, count)) - 1
+    out.fill(0)
+    out.reshape(-1)[flat[(flat >= 0) & (flat < out.size)]] = 255
+    return out
+
+
+class FrameStreamParser:
+    """Incremental parser for the ESP32_Cam_Q1 serial output.
+
+    The firmware mixes text lines with frames:
+
+        NAME_START / WIDTH:w / HEIGHT:h / <w*h bytes> / NAME_END
+
+    (or one of the packed kinds described above).
+
+    feed() accepts arbitrary slices of that stream and calls on_record for
+    every Record as soon as it is complete. Frame pixels are copied straight
+    into preallocated buffers that are reused while the geometry stays the
+    same, so a RECORD_FRAME array is only valid until the next frame of the
+    same name arrives.
+    """
+
+    def __init__(self, on_record=None, max_line=256):
+        self.on_record = on_record
+        self.max_line = max_line
+        self.buffers = {}
+        self.line = bytearray()
+        self.reset()
+
+    def reset(self):
+        """Forget any partially received line or frame"""
+        self.line.clear()
+        self.name = None
+        self.kind = KIND_RAW
+        self.fields = {}
+        self.view = None
+        self.received = 0
+
+    def emit(self, type, key=None, value=None):
+        if self.on_record is not None:
+            self.on_record(Record(type, key, value))
+
+    def buffer(self, name, shape):
+        """Preallocated uint8 buffer of a given shape for a frame name"""
+        frame = self.buffers.get(name)
+        if frame is None or frame.shape != shape:
+            frame = np.empty(shape, dtype=np.uint8)
+            self.buffers[name] = frame
+        return frame
+
+    def in_payload(self):
+        return self.view is not None
+
+    def payload_size(self):
+        """Size of the frame being received (0 outside a frame)"""
+        return len(self.view) if self.view is not None else 0
+
+    def payload_view(self):
+        """Writable view of the payload bytes still missing (for readinto)"""
+        return self.view[self.received:] if self.view is not None else None
+
+    def advance(self, count):
+        """Marks count bytes written through payload_view() as received"""
+        self.received += count
+        self.emit(RECORD_PAYLOAD, self.name, self.received)
+        if self.received == len(self.view):
+            self.view.release()
+            self.view = None
+            self.emit(RECORD_FRAME, self.name, self.decode())
+
+    def decode(self):
+        """The finished frame of the current record, decoded if packed"""
+        if self.kind == KIND_RAW:
+            return self.buffers[self.name]
+        width, height = self.fields["WIDTH"], self.fields["HEIGHT"]
+        payload = self.buffers[(self.name, self.kind)]
+        frame = self.buffer(self.name, (height, width))
+        if self.kind == KIND_BITS:
+            return decode_bits(payload, width, height, frame)
+        return decode_coords(payload, self.fields["COUNT"], frame)
+
+    def start_payload(self):
+        width, height = self.fields["WIDTH"], self.fields["HEIGHT"]
+        if self.kind == KIND_RAW:
+            payload = self.buffer(self.name, (height, width))
+        elif self.kind == KIND_BITS:
+            payload = self.buffer((self.name, self.kind), (height, (width + 7) // 8))
+        else:
+            payload = self.buffer((self.name, self.kind), (self.fields["BYTES"],))
+        self.view = memoryview(payload.reshape(-1))
+        self.received = 0
+        self.emit(RECORD_FRAME_HEADER, self.name, (width, height))
+        if len(self.view) == 0:
+            self.advance(0)
+
+    def feed(self, data):
+        if not isinstance(data, (bytes, bytearray)):
+            data = bytes(data)
+        view = memoryview(data)
+        pos = 0
+        while pos < len(data):
+            if self.view is not None:
+                count = min(len(data) - pos, len(self.view) - self.received)
+                self.view[self.received:self.received + count] = view[pos:pos + count]
+                pos += count
+                self.advance(count)
+                continue
+            end = data.find(b"\n", pos)
+            if end < 0:
+                self.line += view[pos:]
+                if len(self.line) > self.max_line:
+                    # Not a text line (noise or a frame we missed the header of)
+                    self.line.clear()
+                return
+            self.line += view[pos:end]
+            pos = end + 1
+            text = self.line.decode("utf-8", errors="ignore").strip()
+            self.line.clear()
+            if text:
+                self.parse_line(text)
+
+    def parse_line(self, text):
+        if text.endswith("_START"):
+            self.name, self.kind = split_name(text[:-len("_START")])
+            self.fields = {}
+            return
+        key, sep, value = text.partition(":")
+        required = KIND_FIELDS[self.kind]
+        if sep and self.name is not None and key in required and value.strip().isdigit():
+            self.fields[key] = int(value)
+            if all(field in self.fields for field in required):
+                self.start_payload()
+            return
+        if text.endswith("_END"):
+            self.emit(RECORD_FRAME_END, split_name(text[:-len("_END")])[0])
+            self.name = None
+            return
+        if sep and key in META_KEYS and value.strip().lstrip("-").isdigit():
+            self.emit(RECORD_META, key.lower(), int(value))
+            return
+        if text == "DONE":
+            self.emit(RECORD_DONE)
+            return
+        self.emit(RECORD_LINE, None, text)
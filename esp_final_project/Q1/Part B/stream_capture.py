@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+import numpy as np
+
+import frame_parser
+
+# One complete frame set of the ESP32 STREAM mode. started/received are
+# perf_counter() times of the FRAME line and of DONE on the host.
+StreamFrame = namedtuple("StreamFrame", "seq original thresholded info started received")
+
+POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class FrameQueue:
+    """Bounded queue between the serial reader and the consumer.
+
+    When full, put() drops the oldest queued frame (drop_oldest), drops the
+    new frame (drop_newest) or waits for the consumer (block). Blocking
+    stalls the reader, so the ESP32's serial buffer overflows instead.
+    """
+
+    def __init__(self, maxsize=4, policy="drop_oldest"):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, not {policy!r}")
+        self.items = deque()
+        self.maxsize = maxsize
+        self.policy = policy
+        self.ready = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.ready:
+            if len(self.items) >= self.maxsize:
+                if self.policy == "drop_newest":
+                    self.dropped += 1
+                    return
+                if self.policy == "drop_oldest":
+                    self.items.popleft()
+                    self.dropped += 1
+                else:
+                    self.ready.wait_for(lambda: len(self.items) < self.maxsize or self.closed)
+            if self.closed:
+                # Nobody takes it any more, and a blocked producer must not hang
+                self.dropped += 1
+                return
+            self.items.append(item)
+            self.ready.notify_all()
+
+    def get(self, timeout=None):
+        """Next item, or None on timeout / once closed and empty"""
+        with self.ready:
+            self.ready.wait_for(lambda: self.items or self.closed, timeout)
+            if not self.items:
+                return None
+            item = self.items.popleft()
+            self.ready.notify_all()
+            return item
+
+    def __len__(self):
+        return len(self.items)
+
+    def close(self):
+        with self.ready:
+            self.closed = True
+            self.ready.notify_all()
+
+
+class RateMeter:
+    """Rolling frames/s and latency over the last `window` events"""
+
+    def __init__(self, window=30):
+        self.times = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.count = 0
+
+    def tick(self, latency=None, now=None):
+        self.times.append(time.perf_counter() if now is None else now)
+        if latency is not None:
+            self.latencies.append(latency)
+        self.count += 1
+
+    def fps(self):
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / max(self.times[-1] - self.times[0], 1e-9)
+
+    def latency_ms(self):
+        """(mean, max) latency in ms over the window"""
+        if not self.latencies:
+            return 0.0, 0.0
+        values = np.asarray(self.latencies) * 1e3
+        return float(values.mean()), float(values.max())
+
+
+class ESP32Streamer:
+    """Producer thread: puts the ESP32 in STREAM mode and queues every frame set"""
+
+    def __init__(self, camera, queue):
+        self.camera = camera
+        self.queue = queue
+        self.meter = RateMeter()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.clear()
+
+    def clear(self):
+        self.images = {}
+        self.info = {}
+        self.started = None
+
+    def on_record(self, record):
+        if record.type == frame_parser.RECORD_META:
+            if record.key == "frame":
+                self.clear()
+                self.started = time.perf_counter()
+            self.info[record.key] = record.value
+        elif record.type == frame_parser.RECORD_FRAME:
+            # The parser reuses its buffers for the next frame
+            self.images[record.key] = record.value.copy()
+        elif record.type == frame_parser.RECORD_DONE:
+            now = time.perf_counter()
+            started = now if self.started is None else self.started
+            self.meter.tick(now - started, now)
+            self.queue.put(StreamFrame(self.info.get("frame", self.meter.count - 1),
+                                       self.images.get("original"), self.images.get("thresholded"),
+                                       self.info, started, now))
+            self.clear()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.camera.pump(0.1)
+
+    def start(self):
+        self.camera.ser.reset_input_buffer()
+        self.camera.parser.on_record = self.on_record
+        self.camera.parser.reset()
+        self.camera.ser.write(b"STREAM\n")
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        # Closing first wakes a producer blocked in put() (policy "block")
+        self.queue.close()
+        if self.thread is not None:
+            self.thread.join()
+        self.camera.ser.write(b"STOP\n")
+        self.camera.ser.reset_input_buffer()
+
+
+def run_stream(camera, maxsize=4, policy="drop_oldest", show=True, save_dir=None,
+               target=1000, duration=None):
+    """Consumer: display/save/analyse streamed frames until 'q' or Ctrl+C.
+
+    Per frame it checks that the thresholded image has exactly `target`
+    white pixels, and reports frames/s, DONE-to-consumer latency and dropped
+    frames once a second. Returns a summary dict.
+    """
+    queue = FrameQueue(maxsize, policy)
+    streamer = ESP32Streamer(camera, queue)
+    meter = RateMeter()
+    whites = []
+    thresholds = []
+    last_report = time.perf_counter()
+    end = None if duration is None else last_report + duration
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+
+    streamer.start()
+    try:
+        while end is None or time.perf_counter() < end:
+            frame = queue.get(timeout=0.5)
+            if frame is not None:
+                if frame.thresholded is not None:
+                    whites.append(int(np.count_nonzero(frame.thresholded)))
+                if "threshold" in frame.info:
+                    thresholds.append(frame.info["threshold"])
+                if show:
+                    if frame.original is not None:
+                        cv2.imshow("Stream (Grayscale)", frame.original)
+                    if frame.thresholded is not None:
+                        cv2.imshow("Stream (Binary)", frame.thresholded)
+                if save_dir:
+                    for name in ("original", "thresholded"):
+                        image = getattr(frame, name)
+                        if image is not None:
+                            cv2.imwrite(os.path.join(save_dir, f"{name}_{frame.seq:06d}.png"), image)
+                meter.tick(time.perf_counter() - frame.received)
+            if show and cv2.waitKey(1) & 0xFF in (ord('q'), 27):
+                break
+            now = time.perf_counter()
+            if now - last_report >= 1.0:
+                transfer, _ = streamer.meter.latency_ms()
+                mean, worst = meter.latency_ms()
+                print(f"  {meter.fps():5.2f} fps | transfer {transfer:7.1f} ms | "
+                      f"queue {mean:6.1f} ms (max {worst:6.1f}) | dropped {queue.dropped}")
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        streamer.stop()
+        if show:
+            cv2.destroyAllWindows()
+
+    whites = np.asarray(whites)
+    summary = {
+        "frames": meter.count,
+        "received": streamer.meter.count,
+        "dropped": queue.dropped,
+        "exact": int(np.count_nonzero(whites == target)),
+        "white_min": int(whites.min()) if whites.size else None,
+        "white_max": int(whites.max()) if whites.size else None,
+        "threshold_min": min(thresholds) if thresholds else None,
+        "threshold_max": max(thresholds) if thresholds else None,
+    }
+    print(f"\nStream: {summary['frames']} shown, {summary['received']} received, "
+          f"{summary['dropped']} dropped")
+    if whites.size:
+        print(f"  Exactly {target} white pixels in {summary['exact']}/{whites.size} frames "
+              f"(range {summary['white_min']}..{summary['white_max']})")
+    if thresholds:
+        print(f"  Threshold range {summary['threshold_min']}..{summary['threshold_max']}")
+    return summary
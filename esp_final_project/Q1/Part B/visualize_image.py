@@ -1,8 +1,9 @@
 import serial
-import numpy as np
 import cv2
 import time
-import sys
+
+import frame_parser
+import stream_capture
 
 class ESP32CameraSystem:
     def __init__(self, port='COM8', baudrate=115200):
@@ -10,6 +11,7 @@ class ESP32CameraSystem:
         self.baudrate = baudrate
         self.ser = None
         self.connected = False
+        self.parser = frame_parser.FrameStreamParser()
         
     def connect(self):
         """Connect to ESP32-CAM"""
@@ -52,14 +54,24 @@ class ESP32CameraSystem:
             print(f"Connection failed: {e}")
             return False
     
-    def read_line_with_timeout(self, timeout=2.0):
-        """Read a line with a specific timeout"""
-        start = time.time()
-        while time.time() - start < timeout:
-            if self.ser.in_waiting:
-                return self.ser.readline().decode('utf-8', errors='ignore').strip()
-            time.sleep(0.01)
-        return None
+    def pump(self, timeout):
+        """Feed one bulk read (waiting at most timeout seconds) into the parser"""
+        # Returns as soon as bytes arrive, frame payloads go straight into
+        # the parser's preallocated buffers. Setting the timeout reconfigures
+        # the port, so only do it when it changes.
+        timeout = max(0.0, timeout)
+        if self.ser.timeout != timeout:
+            self.ser.timeout = timeout
+        view = self.parser.payload_view()
+        if view is not None:
+            count = self.ser.readinto(view)
+            if count:
+                self.parser.advance(count)
+            return count
+        data = self.ser.read(max(1, self.ser.in_waiting))
+        if data:
+            self.parser.feed(data)
+        return len(data)
     
     def capture_image(self):
         """Capture and process image from ESP32"""
@@ -72,144 +84,56 @@ class ESP32CameraSystem:
         self.ser.write(b"CAPTURE\n")
         self.ser.flush()
         print("[DEBUG] Command sent, waiting for response...")
-        time.sleep(0.2)
         
-        original_image = None
-        thresholded_image = None
+        images = {}
         threshold_info = {}
-        width = 320
-        height = 240
-        
-        start_time = time.time()
+        progress = {}
+        state = {"done": False, "deadline": time.time() + 15}
         
-        while time.time() - start_time < 15:  # Increased timeout
-            if self.ser.in_waiting:
-                line = self.ser.readline().decode('utf-8', errors='ignore').strip()
-                if not line:
-                    continue
-                
-                print(f"ESP32: {line}")
-                
-                if line == "GET_READY":
+        def on_record(record):
+            if record.type == frame_parser.RECORD_LINE:
+                print(f"ESP32: {record.value}")
+                if record.value == "GET_READY":
                     print("⚠️  GET READY! Point camera at target NOW! Photo in 2 seconds...")
-                
-                elif line == "CAPTURING_NOW":
+                elif record.value == "CAPTURING_NOW":
                     print("📸 FLASH & CAPTURE HAPPENING NOW!")
-                
-                elif line == "CAPTURE_DONE":
+                elif record.value == "CAPTURE_DONE":
                     print("✓ Photo captured! Processing...")
-                
-                elif line.startswith("PROCESSED:"):
-                    threshold_info['processed'] = int(line.split(':')[1])
-                
-                elif line.startswith("THRESHOLD:"):
-                    threshold_info['threshold'] = int(line.split(":")[1])
-                
-                elif line.startswith("ABOVE:"):
-                    threshold_info['above'] = int(line.split(":")[1])
-                
-                elif line.startswith("NEEDED:"):
-                    threshold_info['needed'] = int(line.split(":")[1])
-                
-                elif line.startswith("WHITE_PIXELS:"):
-                    threshold_info['white_pixels'] = int(line.split(":")[1])
-                
-                elif line == "ORIGINAL_START":
-                    # Read dimensions
-                    width_line = self.read_line_with_timeout()
-                    height_line = self.read_line_with_timeout()
-                    
-                    if width_line and width_line.startswith("WIDTH:"):
-                        width = int(width_line.split(":")[1])
-                    if height_line and height_line.startswith("HEIGHT:"):
-                        height = int(height_line.split(":")[1])
-                    
-                    print(f"Receiving original image ({width}x{height})...")
-                    
-                    # Read image data
-                    total_pixels = width * height
-                    data = bytearray()
-                    
-                    bytes_read = 0
-                    last_progress = 0
-                    while len(data) < total_pixels:
-                        remaining = total_pixels - len(data)
-                        chunk = self.ser.read(min(4096, remaining))
-                        if not chunk:
-                            time.sleep(0.01)
-                            continue
-                        data.extend(chunk)
-                        bytes_read += len(chunk)
-                        
-                        # Show progress every 10%
-                        progress = int((bytes_read / total_pixels) * 100)
-                        if progress >= last_progress + 10:
-                            print(f"  Progress: {progress}%")
-                            last_progress = progress
-                    
-                    if len(data) == total_pixels:
-                        original_image = np.frombuffer(data, dtype=np.uint8).reshape(height, width)
-                        print("✓ Original image received")
-                    else:
-                        print(f"Error: Expected {total_pixels} bytes, got {len(data)}")
-                    
-                    # Read end marker
-                    end_marker = self.read_line_with_timeout()
-                    if end_marker:
-                        print(f"ESP32: {end_marker}")
-                
-                elif line == "THRESHOLDED_START":
-                    # Read dimensions
-                    width_line = self.read_line_with_timeout()
-                    height_line = self.read_line_with_timeout()
-                    
-                    if width_line and width_line.startswith("WIDTH:"):
-                        width = int(width_line.split(":")[1])
-                    if height_line and height_line.startswith("HEIGHT:"):
-                        height = int(height_line.split(":")[1])
-                    
-                    print(f"Receiving thresholded image ({width}x{height})...")
-                    
-                    # Read image data
-                    total_pixels = width * height
-                    data = bytearray()
-                    
-                    bytes_read = 0
-                    last_progress = 0
-                    while len(data) < total_pixels:
-                        remaining = total_pixels - len(data)
-                        chunk = self.ser.read(min(4096, remaining))
-                        if not chunk:
-                            time.sleep(0.01)
-                            continue
-                        data.extend(chunk)
-                        bytes_read += len(chunk)
-                        
-                        # Show progress every 10%
-                        progress = int((bytes_read / total_pixels) * 100)
-                        if progress >= last_progress + 10:
-                            print(f"  Progress: {progress}%")
-                            last_progress = progress
-                    
-                    if len(data) == total_pixels:
-                        thresholded_image = np.frombuffer(data, dtype=np.uint8).reshape(height, width)
-                        print("✓ Thresholded image received")
-                    else:
-                        print(f"Error: Expected {total_pixels} bytes, got {len(data)}")
-                    
-                    # Read end marker
-                    end_marker = self.read_line_with_timeout()
-                    if end_marker:
-                        print(f"ESP32: {end_marker}")
-                    
-                    # Continue reading to get WHITE_PIXELS and DONE messages
-                    start_time = time.time()  # Reset timeout for final messages
-                
-                elif line == "DONE":
-                    print("✓ Processing complete")
-                    return original_image, thresholded_image, threshold_info
-            else:
-                time.sleep(0.01)
+            elif record.type == frame_parser.RECORD_META:
+                threshold_info[record.key] = record.value
+            elif record.type == frame_parser.RECORD_FRAME_HEADER:
+                width, height = record.value
+                progress[record.key] = 0
+                print(f"Receiving {record.key} image ({width}x{height})...")
+            elif record.type == frame_parser.RECORD_PAYLOAD:
+                # Show progress every 10%
+                size = self.parser.payload_size()
+                percent = record.value * 100 // size if size else 100
+                if percent >= progress[record.key] + 10:
+                    print(f"  Progress: {percent}%")
+                    progress[record.key] = percent
+            elif record.type == frame_parser.RECORD_FRAME:
+                # The parser reuses its frame buffers for the next capture
+                images[record.key] = record.value.copy()
+                print(f"✓ {record.key.capitalize()} image received")
+            elif record.type == frame_parser.RECORD_FRAME_END:
+                print(f"ESP32: {record.key.upper()}_END")
+                # Reset timeout for final messages
+                state["deadline"] = time.time() + 15
+            elif record.type == frame_parser.RECORD_DONE:
+                print("✓ Processing complete")
+                state["done"] = True
+        
+        self.parser.on_record = on_record
+        self.parser.reset()
+        while not state["done"] and time.time() < state["deadline"]:
+            self.pump(0.1)
+        self.ser.timeout = 5.0
+        
+        original_image = images.get("original")
+        thresholded_image = images.get("thresholded")
+        if state["done"]:
+            return original_image, thresholded_image, threshold_info
         
         print("Timeout - but may have received images")
         # Return what we have even if we didn't get DONE
@@ -280,6 +204,7 @@ def main():
     print("\nConnection successful!")
     print("\nCommands:")
     print("  c - Capture and process image")
+    print("  v - Stream continuously (press q in a window to stop)")
     print("  s - Save current images")
     print("  q - Quit")
     print("-" * 30)
@@ -324,6 +249,10 @@ def main():
                 else:
                     print("Failed to capture images")
                 
+            elif command == 'v':
+                print("\nStreaming... press q in an image window (or Ctrl+C) to stop")
+                stream_capture.run_stream(camera)
+                
             elif command == 's':
                 if current_original is not None or current_thresholded is not None:
                     camera.save_images(current_original, current_thresholded, "capture_")
@@ -332,7 +261,7 @@ def main():
                     print("No images to save. Capture an image first.")
             
             else:
-                print("Unknown command. Use 'c', 's', or 'q'")
+                print("Unknown command. Use 'c', 'v', 's', or 'q'")
     
     except KeyboardInterrupt:
         print("\n\nProgram interrupted by user")
@@ -1,14 +1,272 @@
+import threading
+import time
+from collections import deque, namedtuple
+
 import cv2
 import numpy as np
 import tensorflow as tf
 
+from tensor_input import TensorInput
+from yolo_decode import decode, dequantize, scale_boxes
+
 # --- CONFIGURATION ---
 MODEL_PATH = "recovered_model.tflite"
-INPUT_SIZE = 96  # From your Netron screenshot
 THRESHOLD = 0.6  # Confidence threshold
+IOU_THRESHOLD = 0.45  # Overlapping boxes of the same digit above this are merged
+REPORT_EVERY = 1.0  # Seconds between latency reports
+
+# The webcam loop runs as three stages so camera, model and window overlap:
+#
+#   capture thread    cap.read()                       -> frames
+#   inference thread  crop/resize, invoke(), decode()  -> results
+#   main thread       drawing, imshow(), waitKey()
+#
+# The stages are joined by one-slot LatestFrame queues: a stage that falls
+# behind skips to the newest frame instead of working through a backlog, so
+# the shown result is never older than one frame per stage.
+
+# A webcam frame, captured = perf_counter() time cap.read() returned it
+Captured = namedtuple("Captured", "seq frame captured")
+# Inference result of one frame, ready to draw
+Result = namedtuple("Result", "seq crop model_view detections captured")
+
+STAGES = ("capture", "preprocess", "invoke", "decode", "display", "end-to-end")
+
+
+class LatestFrame:
+    """One-slot queue between two stages, the latest frame wins.
+
+    put() replaces a frame the consumer has not taken yet (counted in
+    dropped), get() waits for the next one. A producer that fails closes
+    the queue with its exception in `error`.
+    """
+
+    def __init__(self):
+        self.item = None
+        self.ready = threading.Condition()
+        self.closed = False
+        self.error = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self.ready:
+            if self.item is not None:
+                self.dropped += 1
+            self.item = item
+            self.ready.notify_all()
+
+    def get(self, timeout=None):
+        """Newest item, or None on timeout / once closed and empty"""
+        with self.ready:
+            self.ready.wait_for(lambda: self.item is not None or self.closed, timeout)
+            item, self.item = self.item, None
+            return item
+
+    def close(self, error=None):
+        with self.ready:
+            self.closed = True
+            self.error = self.error or error
+            self.ready.notify_all()
+
+
+class StageTimes:
+    """Rolling latency and rate per pipeline stage over the last `window` frames"""
+
+    def __init__(self, window=30):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds, now=None):
+        with self.lock:
+            if stage not in self.samples:
+                self.samples[stage] = deque(maxlen=self.window)
+                self.counts[stage] = 0
+            self.samples[stage].append((time.perf_counter() if now is None else now, seconds))
+            self.counts[stage] += 1
+
+    def summary(self, stage, now=None):
+        """(frames/s, mean ms, max ms) of a stage, zeros before its first frame.
+        The rate runs up to `now`, so it falls while a stage is stalled."""
+        with self.lock:
+            samples = list(self.samples.get(stage, ()))
+        if not samples:
+            return 0.0, 0.0, 0.0
+        now = time.perf_counter() if now is None else now
+        times, values = np.asarray(samples).T
+        fps = (len(times) - 1) / max(now - times[0], 1e-9)
+        return float(fps), float(values.mean() * 1e3), float(values.max() * 1e3)
+
+    def report(self, dropped):
+        capture_fps, _, _ = self.summary("capture")
+        shown_fps, _, _ = self.summary("display")
+        parts = []
+        for stage in STAGES[1:-1]:
+            _, mean, _ = self.summary(stage)
+            parts.append(f"{stage} {mean:5.1f} ms")
+        _, lag, worst = self.summary("end-to-end")
+        return (f"camera {capture_fps:5.1f} fps | shown {shown_fps:5.1f} fps | " + " | ".join(parts)
+                + f" | end-to-end {lag:6.1f} ms (max {worst:6.1f}) | dropped {dropped}")
+
+
+def center_crop(frame):
+    """Square center crop of a webcam frame (a view, no copy)"""
+    h, w = frame.shape[:2]
+    min_dim = min(h, w)
+    return frame[(h-min_dim)//2:(h+min_dim)//2, (w-min_dim)//2:(w+min_dim)//2]
+
+
+def capture_loop(cap, frames, times, stopped):
+    """Capture thread: reads the webcam into `frames` until stopped or the camera ends"""
+    seq = 0
+    while not stopped.is_set():
+        began = time.perf_counter()
+        ret, frame = cap.read()
+        now = time.perf_counter()
+        if not ret:
+            break
+        times.add("capture", now - began, now)
+        frames.put(Captured(seq, frame, now))
+        seq += 1
+    frames.close()
+
+
+def inference_loop(interpreter, frames, results, times):
+    """Inference thread: newest frame of `frames` -> Result in `results`"""
+    output_details = interpreter.get_output_details()
+
+    # Resize, RGB and normalization go straight into the input tensor
+    model_input = TensorInput(interpreter)
+
+    try:
+        while True:
+            captured = frames.get()
+            if captured is None:
+                break
+            # 3. PRE-PROCESS (CROP & RESIZE)
+            # --- CRITICAL CHANGE: NO INVERSION ---
+            # We send the image AS IS because your model knows what "paper" looks like.
+            began = time.perf_counter()
+            crop_img = center_crop(captured.frame)
+            # The model's 96x96 view is a reused buffer, display gets its own copy
+            model_view = model_input.fill(crop_img).copy()
+            prepared = time.perf_counter()
+
+            # 4. INFERENCE
+            interpreter.invoke()
+            invoked = time.perf_counter()
+
+            # 5. DECODE OUTPUT
+            output_data = interpreter.get_tensor(output_details[0]['index'])[0]
+
+            # Handle Output Quantization
+            output_data = dequantize(output_data, output_details[0]['quantization'])
+
+            # All boxes above the threshold at once, one per digit after NMS
+            detections = decode(output_data, THRESHOLD, IOU_THRESHOLD)
+            decoded = time.perf_counter()
+
+            times.add("preprocess", prepared - began, prepared)
+            times.add("invoke", invoked - prepared, invoked)
+            times.add("decode", decoded - invoked, decoded)
+            results.put(Result(captured.seq, crop_img, model_view, detections, captured.captured))
+    except Exception as e:
+        # Re-raised on the main thread by run_pipeline()
+        results.close(e)
+    finally:
+        results.close()
+
+
+def draw_result(result):
+    """Webcam crop with the model view, detected digit boxes and status text"""
+    # 6. VISUALIZATION
+    display_frame = result.crop.copy()
+    detections = result.detections
+
+    # Show what the AI sees (Small box top-left)
+    preview_size = 150
+    # (the model view is still BGR, ready for OpenCV display)
+    cv2.resize(result.model_view, (preview_size, preview_size),
+               dst=display_frame[0:preview_size, 0:preview_size])
+
+    # Draw every detected digit on the crop (boxes are relative to it)
+    min_dim = display_frame.shape[0]
+    boxes = scale_boxes(detections.boxes, min_dim, min_dim)
+    for (x1, y1, x2, y2), digit, conf in zip(boxes, detections.classes, detections.scores):
+        cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(display_frame, f"{digit} ({conf:.2f})", (x1, max(y1 - 8, 20)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+    # Display Text
+    status_color = (0, 0, 255) # Red
+    status_text = f"Searching..."
+
+    if len(detections.scores):
+        status_color = (0, 255, 0) # Green
+        # Digits read left to right
+        digits = detections.classes[np.argsort(detections.boxes[:, 0])]
+        status_text = f"DIGITS: {''.join(str(d) for d in digits)} ({detections.scores.max():.2f})"
+
+    cv2.putText(display_frame, status_text, (10, preview_size + 40),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2)
+
+    # Draw a rectangle around the "AI View" to show where to look
+    cv2.rectangle(display_frame, (0,0), (preview_size, preview_size), (255, 255, 0), 2)
+    return display_frame
+
+
+def run_pipeline(cap, interpreter, duration=None):
+    """Runs the three stages until 'q', the camera ends or `duration` seconds.
+    Returns the StageTimes. The window must live on the main thread, so
+    display runs here."""
+    frames, results = LatestFrame(), LatestFrame()
+    times = StageTimes()
+    stopped = threading.Event()
+    threads = [threading.Thread(target=capture_loop, args=(cap, frames, times, stopped), daemon=True),
+               threading.Thread(target=inference_loop, args=(interpreter, frames, results, times), daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    start = last_report = time.perf_counter()
+    shown = 0
+    try:
+        while duration is None or time.perf_counter() - start < duration:
+            result = results.get(timeout=0.1)
+            if result is None and results.closed:
+                break
+            if result is not None:
+                began = time.perf_counter()
+                cv2.imshow('Part B - Final', draw_result(result))
+                now = time.perf_counter()
+                times.add("display", now - began, now)
+                times.add("end-to-end", now - result.captured, now)
+                shown += 1
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+            now = time.perf_counter()
+            if now - last_report >= REPORT_EVERY:
+                print(times.report(frames.dropped + results.dropped))
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stopped.set()
+        frames.close()
+        for thread in threads:
+            thread.join()
+    if results.error is not None:
+        raise RuntimeError("inference thread failed") from results.error
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{shown} frames shown in {elapsed:.1f} s ({shown / max(elapsed, 1e-9):.1f} fps), "
+          f"{times.counts.get('capture', 0)} captured, {frames.dropped} skipped before inference, "
+          f"{results.dropped} before display")
+    print(times.report(frames.dropped + results.dropped))
+    return times
 
-def sigmoid(x):
-    return 1 / (1 + np.exp(-x))
 
 def main():
     # 1. LOAD MODEL
@@ -19,109 +277,20 @@ def main():
         print(f"Error: {e}")
         return
 
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
-    
-    # Check data types
-    is_quantized_input = (input_details[0]['dtype'] == np.uint8)
-    
     # 2. START WEBCAM
     cap = cv2.VideoCapture(0)
-    
+
     print("---------------------------------------")
     print("Running Part B: Custom Handwriting Model")
     print("Model trained on: REAL PHOTOS (Dark pen, White paper)")
     print("Press 'q' to quit")
     print("---------------------------------------")
 
-    while True:
-        ret, frame = cap.read()
-        if not ret: break
-
-        # 3. PRE-PROCESS (CROP & RESIZE)
-        # We crop the center to make it square
-        h, w, _ = frame.shape
-        min_dim = min(h, w)
-        crop_img = frame[(h-min_dim)//2:(h+min_dim)//2, (w-min_dim)//2:(w+min_dim)//2]
-        
-        # Resize to 96x96
-        input_img = cv2.resize(crop_img, (INPUT_SIZE, INPUT_SIZE))
-        
-        # --- CRITICAL CHANGE: NO INVERSION ---
-        # We send the image AS IS because your model knows what "paper" looks like.
-        
-        # Convert BGR to RGB (AI standard)
-        input_rgb = cv2.cvtColor(input_img, cv2.COLOR_BGR2RGB)
-        
-        # Add batch dimension [1, 96, 96, 3]
-        input_tensor = np.expand_dims(input_rgb, axis=0)
-
-        # Normalize Input
-        if is_quantized_input:
-            input_data = input_tensor.astype(np.uint8)
-        else:
-            # Standard normalization 0.0 - 1.0
-            input_data = (input_tensor.astype(np.float32) / 255.0)
-
-        # 4. INFERENCE
-        interpreter.set_tensor(input_details[0]['index'], input_data)
-        interpreter.invoke()
-        
-        # 5. DECODE OUTPUT
-        output_data = interpreter.get_tensor(output_details[0]['index'])[0]
-        
-        # Handle Output Quantization
-        scale = output_details[0]['quantization'][0]
-        zero_point = output_details[0]['quantization'][1]
-        
-        if scale > 0: 
-            output_data = (output_data.astype(np.float32) - zero_point) * scale
-
-        # Find best prediction
-        max_conf = 0
-        best_class = -1
-
-        for i in range(output_data.shape[0]):
-            # Apply Sigmoid to get probability (0.0 - 1.0)
-            raw_conf = output_data[i][4] # Objectness
-            confidence = sigmoid(raw_conf)
-
-            if confidence > max_conf:
-                max_conf = confidence
-                class_scores = output_data[i][5:]
-                best_class = np.argmax(class_scores)
-
-        # 6. VISUALIZATION
-        display_frame = crop_img.copy()
-        
-        # Show what the AI sees (Small box top-left)
-        preview_size = 150
-        ai_view = cv2.resize(input_rgb, (preview_size, preview_size))
-        # Convert back to BGR for OpenCV display
-        ai_view_bgr = cv2.cvtColor(ai_view, cv2.COLOR_RGB2BGR)
-        display_frame[0:preview_size, 0:preview_size] = ai_view_bgr
-
-        # Display Text
-        status_color = (0, 0, 255) # Red
-        status_text = f"Searching..."
-        
-        if max_conf > THRESHOLD:
-            status_color = (0, 255, 0) # Green
-            status_text = f"DIGIT: {best_class} ({max_conf:.2f})"
-        
-        cv2.putText(display_frame, status_text, (10, preview_size + 40), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2)
-
-        # Draw a rectangle around the "AI View" to show where to look
-        cv2.rectangle(display_frame, (0,0), (preview_size, preview_size), (255, 255, 0), 2)
-
-        cv2.imshow('Part B - Final', display_frame)
-
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    try:
+        run_pipeline(cap, interpreter)
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+# Zero-copy input filling for the TFLite interpreter.
+#
+# The plain preprocessing (resize, cvtColor, expand_dims, astype, / 255.0,
+# set_tensor) allocates a new array at every step and set_tensor() copies
+# the result once more. TensorInput instead writes every step into a
+# preallocated buffer and the last one straight into the interpreter's own
+# input tensor:
+#
+#   crop --cv2.resize--> resized --cvtColor--> rgb --cv2.LUT--> input tensor
+#
+# The LUT maps each 8-bit pixel to the model's input value in one pass, so
+# the float normalization (or int8 quantization) costs a table lookup.
+# uint8 models take the raw pixels, there cvtColor writes the tensor.
+
+
+def input_lut(dtype, quantization=(0.0, 0)):
+    """256-entry table of the model input value of every 8-bit pixel"""
+    pixels = np.arange(256, dtype=np.float32)
+    if dtype == np.uint8:
+        # uint8 models get the raw pixels, as run_part_b always sent them
+        return pixels.astype(np.uint8)
+    if dtype == np.int8:
+        scale, zero_point = quantization
+        return np.clip(np.round(pixels / 255.0 / scale + zero_point), -128, 127).astype(np.int8)
+    if dtype != np.float32:
+        raise ValueError(f"unsupported input type {np.dtype(dtype).name}")
+    # Same float32 arithmetic as astype(np.float32) / 255.0
+    return pixels / 255.0
+
+
+class TensorInput:
+    """Fills an interpreter's (1, H, W, 3) input tensor from BGR images.
+
+    Call fill() before every invoke(). interpreter.tensor() hands out a
+    view of the tensor's memory, which is only taken inside fill(): the
+    interpreter refuses to invoke() while such a view is still referenced.
+    """
+
+    def __init__(self, interpreter, detail=None):
+        detail = interpreter.get_input_details()[0] if detail is None else detail
+        _, height, width, channels = detail['shape']
+        if channels != 3:
+            raise ValueError(f"expected a 3-channel input, model has {channels}")
+        self.size = (int(width), int(height))
+        self.tensor = interpreter.tensor(detail['index'])
+        self.lut = None if detail['dtype'] == np.uint8 else input_lut(detail['dtype'], detail['quantization'])
+        self.resized = np.empty((height, width, 3), dtype=np.uint8)
+        self.rgb = np.empty_like(self.resized)
+
+    def fill(self, image):
+        """Resizes a BGR image into the input tensor. Returns the resized
+        BGR image the model sees, a scratch buffer the next fill() overwrites."""
+        cv2.resize(image, self.size, dst=self.resized)
+        if self.lut is None:
+            cv2.cvtColor(self.resized, cv2.COLOR_BGR2RGB, dst=self.tensor()[0])
+        else:
+            cv2.cvtColor(self.resized, cv2.COLOR_BGR2RGB, dst=self.rgb)
+            cv2.LUT(self.rgb, self.lut, dst=self.tensor()[0])
+        return self.resized
@@ -3,13 +3,14 @@ import numpy as np
 import tensorflow as tf
 import os
 
+from yolo_decode import best_prediction, decode, dequantize, scale_boxes
+
 # --- CONFIGURATION ---
 MODEL_PATH = "recovered_model.tflite"
 IMAGE_FILENAME = "resim.png"  # <--- REPLACE THIS with your image name
 INPUT_SIZE = 96  # From your Netron screenshot
-
-def sigmoid(x):
-    return 1 / (1 + np.exp(-x))
+THRESHOLD = 0.5  # Confidence threshold
+IOU_THRESHOLD = 0.45  # Overlapping boxes of the same digit above this are merged
 
 def main():
     # 1. CHECK FILE EXISTENCE
@@ -63,41 +64,41 @@ def main():
     output_data = interpreter.get_tensor(output_details[0]['index'])[0]
     
     # Handle Output Quantization
-    scale = output_details[0]['quantization'][0]
-    zero_point = output_details[0]['quantization'][1]
-    if scale > 0: 
-        output_data = (output_data.astype(np.float32) - zero_point) * scale
+    output_data = dequantize(output_data, output_details[0]['quantization'])
 
-    # Find Best Prediction
-    max_conf = 0
-    best_class = -1
-    
-    # Loop through all 567 potential boxes
-    for i in range(output_data.shape[0]):
-        # Confidence is usually at index 4
-        raw_conf = output_data[i][4] 
-        confidence = sigmoid(raw_conf)
-
-        if confidence > max_conf:
-            max_conf = confidence
-            # Classes are indices 5 to 14 (for 10 digits)
-            class_scores = output_data[i][5:]
-            best_class = np.argmax(class_scores)
+    # Decode all 567 potential boxes at once, NMS keeps one box per digit
+    detections = decode(output_data, THRESHOLD, IOU_THRESHOLD)
 
     # 6. REPORT RESULTS
     print("\n" + "="*30)
     print(f"   PREDICTION RESULT")
     print("="*30)
     
-    if max_conf > 0.5:
-        print(f"DETECTED DIGIT: {best_class}")
-        print(f"Confidence:     {max_conf:.2f} ({(max_conf*100):.1f}%)")
+    if len(detections.scores):
+        # Left to right, the way the digits are read
+        order = np.argsort(detections.boxes[:, 0])
+        print(f"DETECTED DIGITS: {''.join(str(d) for d in detections.classes[order])}")
+        for i in order:
+            x1, y1, x2, y2 = detections.boxes[i]
+            conf = detections.scores[i]
+            print(f"  {detections.classes[i]}  confidence {conf:.2f} ({(conf*100):.1f}%)  "
+                  f"box ({x1:.2f}, {y1:.2f}) - ({x2:.2f}, {y2:.2f})")
     else:
+        max_conf, best_class = best_prediction(output_data)
         print("No digit detected (Confidence too low)")
         print(f"Best Guess: {best_class} ({max_conf:.2f})")
     
     print("="*30 + "\n")
 
+    # Boxes are relative to the input, which is the whole image stretched
+    h, w = original_img.shape[:2]
+    for (x1, y1, x2, y2), digit in zip(scale_boxes(detections.boxes, w, h), detections.classes):
+        cv2.rectangle(original_img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(original_img, str(digit), (x1, max(y1 - 8, 20)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    if len(detections.scores):
+        cv2.imshow("Detections", original_img)
+
     # 7. SHOW WHAT THE MODEL SAW
     # It helps to see if the resize squished the digit
     cv2.imshow("Input to AI (96x96)", input_img)
@@ -0,0 +1,93 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Vectorized decoding of the recovered model's YOLO-style output.
+#
+# The output is (rows, 5 + classes), one row per anchor box (567 at 96x96):
+#
+#   0:4   box centre x, y and width, height (normalized to the input size)
+#   4     objectness logit, confidence = sigmoid
+#   5:    class scores of the digits 0-9, the digit is the argmax
+#
+# decode() filters all rows at once and keeps the best box per digit
+# location with a class-aware greedy NMS, so several digits in one frame
+# are found instead of only the single best row.
+
+# Boxes as (N, 4) x1, y1, x2, y2 in output units, sorted by score
+Detections = namedtuple("Detections", "boxes scores classes class_scores")
+
+IOU_THRESHOLD = 0.45
+MAX_DETECTIONS = 10
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def logit(p, eps=1e-12):
+    """Inverse of sigmoid, p is clipped to (eps, 1 - eps) so thresholds of 0 and 1 stay finite"""
+    p = np.clip(p, eps, 1 - eps)
+    return float(np.log(p / (1 - p)))
+
+
+def dequantize(output, quantization):
+    """Float output of a (scale, zero_point) quantized tensor, unchanged if not quantized"""
+    scale, zero_point = quantization
+    if scale > 0:
+        return (output.astype(np.float32) - zero_point) * scale
+    return output
+
+
+def xywh_to_xyxy(xywh):
+    half = xywh[:, 2:4] / 2
+    return np.concatenate([xywh[:, 0:2] - half, xywh[:, 0:2] + half], axis=1)
+
+
+def nms(boxes, scores, classes, iou_threshold=IOU_THRESHOLD, max_detections=MAX_DETECTIONS):
+    """Indices of the boxes kept by greedy NMS, best first. Boxes of
+    different classes never suppress each other."""
+    # Shifting each class by more than the extent of all boxes keeps
+    # classes apart, so one pass handles every class
+    shifted = boxes + classes[:, None] * (np.abs(boxes).max() + 1) * 2
+    x1, y1, x2, y2 = shifted.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size and len(keep) < max_detections:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        # IoU of the best remaining box with all others
+        w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / np.maximum(areas[best] + areas[rest] - inter, 1e-12)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+def decode(output, threshold=0.5, iou_threshold=IOU_THRESHOLD, max_detections=MAX_DETECTIONS):
+    """Detections of a (rows, 5 + classes) output with confidence > threshold"""
+    output = np.asarray(output)
+    # sigmoid is monotonic, so rows are filtered on the logit and only the
+    # survivors go through exp()
+    candidates = np.flatnonzero(output[:, 4] > logit(threshold))
+    rows = output[candidates].astype(np.float32)
+    scores = sigmoid(rows[:, 4])
+    classes = np.argmax(rows[:, 5:], axis=1)
+    class_scores = sigmoid(rows[np.arange(len(rows)), 5 + classes])
+    boxes = xywh_to_xyxy(rows[:, 0:4])
+    keep = nms(boxes, scores, classes, iou_threshold, max_detections) if len(rows) else candidates
+    return Detections(boxes[keep], scores[keep], classes[keep], class_scores[keep])
+
+
+def best_prediction(output):
+    """(confidence, digit) of the row with the highest objectness"""
+    output = np.asarray(output)
+    row = int(np.argmax(output[:, 4]))
+    return float(sigmoid(output[row, 4])), int(np.argmax(output[row, 5:]))
+
+
+def scale_boxes(boxes, width, height):
+    """Normalized boxes -> [x1, y1, x2, y2] int pixel lists of a width x height image (for cv2 drawing)"""
+    return np.round(boxes * [width, height, width, height]).astype(int).tolist()
@@ -0,0 +1,184 @@
+import argparse
+import csv
+import glob
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from resize_reconstruct import scaled_size, source_indices
+
+# Reference resampling for the ESP32_Cam_Q3 resize modes, with quality metrics.
+#
+# All methods use the device's coordinate mapping: output pixel i starts at
+# source position i / scale (float32, top-left aligned, clamped to the
+# image), the way sendUpsampled()/sendDownsampled() index the frame. Each
+# method is a separable (new size x size) weight matrix per axis, so a whole
+# (N, H, W) batch is resampled with two matrix products:
+#
+#   nearest   source pixel (int)(i / scale), bit-exact with the device
+#   bilinear  linear blend of the two source pixels around i / scale
+#   area      average over [i / scale, (i + 1) / scale) weighted by coverage
+#
+#   python resample_reference.py captures/*.png --scales 0.5 0.6666 1.5 2.0 --csv quality.csv
+
+KINDS = ("nearest", "bilinear", "area")
+
+
+def weights(kind, count, size, scale):
+    """(count, size) float64 resampling matrix along one axis"""
+    scale = np.float32(scale)
+    w = np.zeros((count, size))
+    rows = np.arange(count)
+    if kind == "nearest":
+        w[rows, source_indices(count, size, scale)] = 1
+    elif kind == "bilinear":
+        position = (np.arange(count, dtype=np.float32) / scale).astype(np.float64)
+        left = np.minimum(np.floor(position).astype(np.intp), size - 1)
+        right = np.minimum(left + 1, size - 1)
+        frac = np.clip(position - left, 0, 1)
+        np.add.at(w, (rows, left), 1 - frac)
+        np.add.at(w, (rows, right), frac)
+    elif kind == "area":
+        # Overlap of output cell [i, i + 1) / scale with every source pixel
+        # [j, j + 1); cells running past the image are clamped to its edge
+        start = np.minimum(np.arange(count) / float(scale), size - 1e-9)
+        end = np.minimum((np.arange(count) + 1) / float(scale), size)
+        edges = np.arange(size + 1, dtype=np.float64)
+        overlap = np.minimum(end[:, None], edges[None, 1:]) - np.maximum(start[:, None], edges[None, :-1])
+        w = np.clip(overlap, 0, None)
+        w /= w.sum(axis=1, keepdims=True)
+    else:
+        raise ValueError(f"kind must be one of {KINDS}, not {kind!r}")
+    return w
+
+
+def resample(images, scale, kind="bilinear"):
+    """(H, W) or (N, H, W) uint8 -> resized uint8 with the device's output size"""
+    images = np.asarray(images)
+    height, width = images.shape[-2:]
+    new_w, new_h = scaled_size(width, scale), scaled_size(height, scale)
+    if kind == "nearest":
+        # Pure gather, no rounding involved
+        rows = source_indices(new_h, height, scale)
+        cols = source_indices(new_w, width, scale)
+        return np.take(np.take(images, rows, axis=-2), cols, axis=-1)
+    wy = weights(kind, new_h, height, scale)
+    wx = weights(kind, new_w, width, scale)
+    out = wy @ images.astype(np.float64) @ wx.T
+    return np.clip(np.floor(out + 0.5), 0, 255).astype(np.uint8)
+
+
+def psnr(a, b):
+    """Peak signal-to-noise ratio in dB, inf for identical images"""
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse))
+
+
+def ssim(a, b):
+    """Mean SSIM (Gaussian 11x11 window, sigma 1.5) of two grayscale images"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a ** 2
+    var_b = blur(b * b) - mu_b ** 2
+    cov = blur(a * b) - mu_a * mu_b
+    value = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(value.mean())
+
+
+def max_error(a, b):
+    return int(np.abs(a.astype(np.int16) - b.astype(np.int16)).max())
+
+
+def compare(test, reference):
+    """{'psnr', 'ssim', 'max_error'} of a test image against a reference"""
+    return {"psnr": psnr(test, reference), "ssim": ssim(test, reference), "max_error": max_error(test, reference)}
+
+
+def device_frame(directory, scale, width, height):
+    """Resized frame saved by view_resized_image.py for this capture, or None"""
+    kind = "upsampled" if scale >= 1 else "downsampled"
+    new_w, new_h = scaled_size(width, scale), scaled_size(height, scale)
+    # The scale in the file name is the device's display text, match by size
+    paths = sorted(glob.glob(os.path.join(glob.escape(directory), f"{kind}_*x_{new_w}x{new_h}.png")))
+    return cv2.imread(paths[0], cv2.IMREAD_GRAYSCALE) if paths else None
+
+
+def quality_report(paths, scales, references=("bilinear", "area")):
+    """Rows comparing the device's nearest resize against the reference kinds.
+
+    Captures of the same size are resampled as one batch per scale. When a
+    resized frame saved by view_resized_image.py sits next to a capture it is
+    checked against the nearest reference as well (test = "device").
+    """
+    groups = {}
+    for path in paths:
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            print(f"Skipping {path}: not an image", file=sys.stderr)
+            continue
+        groups.setdefault(img.shape, []).append((path, img))
+    rows = []
+    for shape, items in groups.items():
+        stack = np.stack([img for _, img in items])
+        for scale in scales:
+            nearest = resample(stack, scale, "nearest")
+            resampled = {kind: resample(stack, scale, kind) for kind in references}
+            for i, (path, _) in enumerate(items):
+                base = {"capture": path, "scale": f"{float(np.float32(scale)):g}",
+                        "size": f"{nearest.shape[-1]}x{nearest.shape[-2]}"}
+                for kind in references:
+                    rows.append({**base, "test": "nearest", "reference": kind,
+                                 **compare(nearest[i], resampled[kind][i])})
+                device = device_frame(os.path.dirname(path), scale, shape[1], shape[0])
+                if device is not None and device.shape == nearest[i].shape:
+                    rows.append({**base, "test": "device", "reference": "nearest",
+                                 **compare(device, nearest[i])})
+    return rows
+
+
+def print_report(rows):
+    print(f"{'capture':<32} {'scale':>7} {'size':>9} {'test':>8} {'reference':>9} "
+          f"{'PSNR dB':>8} {'SSIM':>7} {'max':>4}")
+    for row in rows:
+        print(f"{os.path.basename(row['capture'])[:32]:<32} {row['scale']:>7} {row['size']:>9} "
+              f"{row['test']:>8} {row['reference']:>9} {row['psnr']:8.2f} {row['ssim']:7.4f} "
+              f"{row['max_error']:4d}")
+    # Mean per (test, reference, scale) over all captures
+    summary = {}
+    for row in rows:
+        summary.setdefault((row["test"], row["reference"], row["scale"]), []).append(row)
+    print("\nMean over captures:")
+    for (test, reference, scale), group in sorted(summary.items()):
+        finite = [r["psnr"] for r in group if np.isfinite(r["psnr"])]
+        mean_psnr = np.mean(finite) if finite else float("inf")
+        print(f"  {test:>8} vs {reference:<9} x{scale:<7} PSNR {mean_psnr:6.2f} dB  "
+              f"SSIM {np.mean([r['ssim'] for r in group]):.4f}  "
+              f"max {max(r['max_error'] for r in group):3d}  ({len(group)} captures)")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Quality of the ESP32 nearest resize against reference resampling")
+    parser.add_argument("captures", nargs="+", help="grayscale captures (files or glob patterns)")
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.6666, 1.5])
+    parser.add_argument("--reference", nargs="+", choices=KINDS[1:], default=list(KINDS[1:]))
+    parser.add_argument("--csv", help="write the rows to this CSV file")
+    args = parser.parse_args(argv)
+
+    paths = sorted({p for item in args.captures for p in (glob.glob(item) or [item])})
+    rows = quality_report(paths, args.scales, args.reference)
+    print_report(rows)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, ["capture", "scale", "size", "test", "reference", "psnr", "ssim", "max_error"])
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\n{len(rows)} rows written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
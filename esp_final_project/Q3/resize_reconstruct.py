@@ -0,0 +1,75 @@
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+# Host-side reconstruction of the ESP32_Cam_Q3 resized frames.
+#
+# In host resize mode (command h1) the device sends the original frame and,
+# instead of the resized pixels, one descriptor line per resize:
+#
+#   UPSAMPLED_DESC:<src_w>:<src_h>:<new_w>:<new_h>:<scale>:<scale bits>:<kind>:<rounding>
+#
+# <scale bits> is the float32 the device computed with, as 8 hex digits (the
+# %.3f <scale> is for display only). Supported kind/rounding:
+#
+#   NEAREST:TRUNC  out[y, x] = src[min((int)(y / scale), src_h - 1),
+#                                  min((int)(x / scale), src_w - 1)]
+#                  with the division done in float32 and new_w/new_h =
+#                  (int)(src_w * scale), (int)(src_h * scale) in float32
+#
+# which is what sendUpsampled()/sendDownsampled() do, so the result is
+# bit-exact with a full transfer.
+
+KINDS = {("NEAREST", "TRUNC")}
+
+ResizeDescriptor = namedtuple("ResizeDescriptor", "name src_w src_h new_w new_h scale kind rounding")
+
+
+def parse_descriptor(line):
+    """'UPSAMPLED_DESC:...' -> ResizeDescriptor, ValueError if malformed"""
+    tag, *fields = line.strip().split(':')
+    if not tag.endswith("_DESC") or len(fields) != 8:
+        raise ValueError(f"not a resize descriptor: {line!r}")
+    src_w, src_h, new_w, new_h = (int(v) for v in fields[:4])
+    scale = struct.unpack("<f", struct.pack("<I", int(fields[5], 16)))[0]
+    kind, rounding = fields[6], fields[7]
+    if (kind, rounding) not in KINDS:
+        raise ValueError(f"unsupported resize {kind}:{rounding}")
+    return ResizeDescriptor(tag[:-len("_DESC")].lower(), src_w, src_h, new_w, new_h,
+                            np.float32(scale), kind, rounding)
+
+
+def scaled_size(size, scale):
+    """(int)(size * scale) in float32, as on the device"""
+    return int(np.float32(size) * np.float32(scale))
+
+
+def source_indices(count, size, scale):
+    """Source index of every output index: min((int)(i / scale), size - 1) in float32"""
+    index = np.arange(count, dtype=np.float32) / np.float32(scale)
+    return np.minimum(index.astype(np.intp), size - 1)
+
+
+def reconstruct(original, desc, out=None):
+    """Resized frame of a (src_h, src_w) original, as described by desc"""
+    if original.shape != (desc.src_h, desc.src_w):
+        raise ValueError(f"original is {original.shape[1]}x{original.shape[0]}, "
+                         f"descriptor expects {desc.src_w}x{desc.src_h}")
+    if (scaled_size(desc.src_w, desc.scale), scaled_size(desc.src_h, desc.scale)) != (desc.new_w, desc.new_h):
+        raise ValueError(f"descriptor size {desc.new_w}x{desc.new_h} does not match scale {desc.scale}")
+    rows = source_indices(desc.new_h, desc.src_h, desc.scale)
+    cols = source_indices(desc.new_w, desc.src_w, desc.scale)
+    if out is None:
+        out = np.empty((desc.new_h, desc.new_w), dtype=original.dtype)
+    # Two gathers: pick the source rows, then the source columns of each
+    np.take(np.take(original, rows, axis=0), cols, axis=1, out=out)
+    return out
+
+
+def verify(reconstructed, transferred):
+    """(mismatching pixels, max abs difference) of a reconstruction vs a full transfer"""
+    if reconstructed.shape != transferred.shape:
+        return reconstructed.size, 255
+    diff = np.abs(reconstructed.astype(np.int16) - transferred.astype(np.int16))
+    return int(np.count_nonzero(diff)), int(diff.max()) if diff.size else 0
@@ -0,0 +1,242 @@
+import argparse
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+import resample_reference
+from resize_reconstruct import scaled_size
+
+# Precomputed separable resize tables for ESP32_Cam_Q3, emitted as a C header.
+#
+# Per scale and axis a table holds, for every output index, the first source
+# index (int16) of `taps` consecutive source pixels and their weights in
+# Q14 fixed point (int16, summing to exactly 1 << 14). The device resamples
+# a row with lookups and multiply-adds only:
+#
+#   tmp[x]   = (sum_k wx[x][k] * src[row][ix[x] + k] + (1 << 7)) >> 8      Q6
+#   out[x]   = (sum_k wy[y][k] * tmp_k[x] + (1 << 19)) >> 20                 clamped
+#
+# Nearest tables have one tap and no weights: out = src[iy[y]][ix[x]], the
+# same float32 (int)(i / scale) mapping the firmware computes per pixel.
+#
+#   python resize_tables.py --scales 1.5 0.6666 2.0 0.5 -o ../ESP32_Cam_Q3/resize_tables.h
+
+Q = 14
+H_SHIFT = 8             # horizontal pass result in Q(Q - H_SHIFT) = Q6
+V_SHIFT = 2 * Q - H_SHIFT
+KIND_IDS = {"nearest": 0, "bilinear": 1, "area": 2}
+
+AxisTable = namedtuple("AxisTable", "index weight taps")
+ResizeTable = namedtuple("ResizeTable", "kind scale src_w src_h dst_w dst_h x y")
+
+
+def axis_table(kind, count, size, scale):
+    """AxisTable of one axis, weights None for nearest"""
+    w = resample_reference.weights(kind, count, size, scale)
+    if kind == "nearest":
+        return AxisTable(w.argmax(axis=1).astype(np.int16), None, 1)
+    nonzero = w > 0
+    first = nonzero.argmax(axis=1)
+    last = size - 1 - nonzero[:, ::-1].argmax(axis=1)
+    taps = int((last - first + 1).max())
+    start = np.minimum(first, size - taps)
+    columns = start[:, None] + np.arange(taps)
+    window = np.take_along_axis(w, columns, axis=1)
+    # Round to Q14 and give the rounding residual to the largest tap, so that
+    # every row sums to exactly 1 << Q
+    weight = np.round(window * (1 << Q)).astype(np.int64)
+    largest = window.argmax(axis=1)
+    weight[np.arange(count), largest] += (1 << Q) - weight.sum(axis=1)
+    return AxisTable(start.astype(np.int16), weight.astype(np.int16), taps)
+
+
+def build_table(kind, scale, src_w, src_h):
+    scale = np.float32(scale)
+    dst_w, dst_h = scaled_size(src_w, scale), scaled_size(src_h, scale)
+    return ResizeTable(kind, scale, src_w, src_h, dst_w, dst_h,
+                       axis_table(kind, dst_w, src_w, scale), axis_table(kind, dst_h, src_h, scale))
+
+
+def simulate(table, image):
+    """Host simulation of resize_table_row() over all rows, integer math as on the device"""
+    image = np.asarray(image)
+    if table.kind == "nearest":
+        return image[table.y.index.astype(np.intp)][:, table.x.index.astype(np.intp)]
+    src = image.astype(np.int64)
+    # Horizontal pass for every source row: (src_h, dst_w) in Q6
+    columns = table.x.index.astype(np.intp)[:, None] + np.arange(table.x.taps)
+    tmp = (np.einsum("rxk,xk->rx", src[:, columns], table.x.weight.astype(np.int64))
+           + (1 << (H_SHIFT - 1))) >> H_SHIFT
+    # Vertical pass
+    rows = table.y.index.astype(np.intp)[:, None] + np.arange(table.y.taps)
+    out = (np.einsum("ykx,yk->yx", tmp[rows], table.y.weight.astype(np.int64))
+           + (1 << (V_SHIFT - 1))) >> V_SHIFT
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def check(table, images):
+    """(mismatching pixels, max error) of simulate() vs resample_reference over images"""
+    mismatches = max_error = 0
+    for image in images:
+        result = simulate(table, image)
+        reference = resample_reference.resample(image, table.scale, table.kind)
+        diff = np.abs(result.astype(np.int16) - reference.astype(np.int16))
+        mismatches += int(np.count_nonzero(diff))
+        max_error = max(max_error, int(diff.max()))
+    return mismatches, max_error
+
+
+def c_array(ctype, name, values, per_line=16):
+    values = np.asarray(values).ravel()
+    lines = [", ".join(str(int(v)) for v in values[i:i + per_line]) for i in range(0, len(values), per_line)]
+    body = ",\n  ".join(lines)
+    return f"static const {ctype} {name}[{len(values)}] = {{\n  {body}\n}};\n"
+
+
+HEADER_CODE = '''
+typedef struct {
+  float scale;
+  uint16_t src_w, src_h, dst_w, dst_h;
+  uint8_t kind, taps_x, taps_y;
+  const int16_t *x_index, *y_index;    // first source column/row per output
+  const int16_t *x_weight, *y_weight;  // [dst][taps] Q14, NULL for nearest
+} resize_table_t;
+'''
+
+HEADER_FUNCTIONS = '''
+// Table for this frame size, scale (exact float match) and kind, or NULL
+static inline const resize_table_t *resize_find_table(int src_w, int src_h, float scale, int kind) {
+  for (int i = 0; i < RESIZE_TABLE_COUNT; i++) {
+    const resize_table_t *t = &RESIZE_TABLES[i];
+    if (t->src_w == src_w && t->src_h == src_h && t->scale == scale && t->kind == kind) {
+      return t;
+    }
+  }
+  return NULL;
+}
+
+// Output row y of a src_w x src_h 8-bit frame. tmp needs taps_y * dst_w
+// int16 entries (unused for nearest).
+static inline void resize_table_row(const resize_table_t *t, const uint8_t *src, int y,
+                                    int16_t *tmp, uint8_t *out) {
+  if (t->kind == RESIZE_NEAREST) {
+    const uint8_t *row = src + t->y_index[y] * t->src_w;
+    for (int x = 0; x < t->dst_w; x++) {
+      out[x] = row[t->x_index[x]];
+    }
+    return;
+  }
+  for (int k = 0; k < t->taps_y; k++) {
+    const uint8_t *row = src + (t->y_index[y] + k) * t->src_w;
+    int16_t *dst = tmp + k * t->dst_w;
+    for (int x = 0; x < t->dst_w; x++) {
+      const uint8_t *p = row + t->x_index[x];
+      const int16_t *w = t->x_weight + x * t->taps_x;
+      int32_t sum = 1 << (RESIZE_H_SHIFT - 1);
+      for (int j = 0; j < t->taps_x; j++) {
+        sum += w[j] * p[j];
+      }
+      dst[x] = (int16_t)(sum >> RESIZE_H_SHIFT);
+    }
+  }
+  const int16_t *wy = t->y_weight + y * t->taps_y;
+  for (int x = 0; x < t->dst_w; x++) {
+    int32_t sum = 1 << (RESIZE_V_SHIFT - 1);
+    for (int k = 0; k < t->taps_y; k++) {
+      sum += wy[k] * tmp[k * t->dst_w + x];
+    }
+    sum >>= RESIZE_V_SHIFT;
+    out[x] = sum < 0 ? 0 : sum > 255 ? 255 : (uint8_t)sum;
+  }
+}
+'''
+
+
+def emit_header(tables, command=""):
+    """C header text for a list of ResizeTable"""
+    out = ["// Generated by resize_tables.py, do not edit.",
+           f"// {command}" if command else "//",
+           "#pragma once", "", "#include <stdint.h>", "#include <stddef.h>", "",
+           f"#define RESIZE_Q {Q}", f"#define RESIZE_H_SHIFT {H_SHIFT}", f"#define RESIZE_V_SHIFT {V_SHIFT}", ""]
+    out += [f"#define RESIZE_{kind.upper()} {i}" for kind, i in KIND_IDS.items()]
+    out.append(HEADER_CODE)
+    entries = []
+    for i, t in enumerate(tables):
+        name = f"resize_{i}"
+        out.append(f"// {t.kind} x{float(t.scale):g}: {t.src_w}x{t.src_h} -> {t.dst_w}x{t.dst_h}")
+        refs = {}
+        for axis in ("x", "y"):
+            at = getattr(t, axis)
+            out.append(c_array("int16_t", f"{name}_{axis}_index", at.index))
+            refs[f"{axis}_index"] = f"{name}_{axis}_index"
+            if at.weight is not None:
+                out.append(c_array("int16_t", f"{name}_{axis}_weight", at.weight))
+                refs[f"{axis}_weight"] = f"{name}_{axis}_weight"
+            else:
+                refs[f"{axis}_weight"] = "NULL"
+        entries.append(f"  {{ {float(t.scale)!r}f, {t.src_w}, {t.src_h}, {t.dst_w}, {t.dst_h}, "
+                       f"RESIZE_{t.kind.upper()}, {t.x.taps}, {t.y.taps},\n"
+                       f"    {refs['x_index']}, {refs['y_index']}, {refs['x_weight']}, {refs['y_weight']} }},")
+    out.append("static const resize_table_t RESIZE_TABLES[] = {")
+    out += entries
+    out.append("};")
+    out.append(f"#define RESIZE_TABLE_COUNT {len(tables)}")
+    out.append(HEADER_FUNCTIONS)
+    return "\n".join(out)
+
+
+def table_bytes(table):
+    size = 0
+    for at in (table.x, table.y):
+        size += at.index.nbytes + (at.weight.nbytes if at.weight is not None else 0)
+    return size
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Precompute ESP32 resize tables as a C header")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.5, 0.6666])
+    parser.add_argument("--kinds", nargs="+", choices=list(KIND_IDS), default=["nearest"])
+    parser.add_argument("--size", default="320x240", help="source frame WxH")
+    parser.add_argument("-o", "--output", help="header path (default: print)")
+    parser.add_argument("--check", nargs="*", metavar="IMAGE",
+                        help="simulate the tables on these images (random frames if none) "
+                             "against resample_reference")
+    args = parser.parse_args(argv)
+
+    src_w, src_h = (int(v) for v in args.size.lower().split("x"))
+    tables = [build_table(kind, scale, src_w, src_h) for scale in args.scales for kind in args.kinds]
+    for t in tables:
+        print(f"{t.kind:>8} x{float(t.scale):<8g} {t.src_w}x{t.src_h} -> {t.dst_w}x{t.dst_h} "
+              f"taps {t.x.taps}x{t.y.taps}, {table_bytes(t)} bytes", file=sys.stderr)
+
+    if args.check is not None:
+        import cv2
+        if args.check:
+            images = [cv2.resize(cv2.imread(p, cv2.IMREAD_GRAYSCALE), (src_w, src_h)) for p in args.check]
+        else:
+            rng = np.random.default_rng(0)
+            images = [rng.integers(0, 256, (src_h, src_w), dtype=np.uint8) for _ in range(4)]
+        # Nearest must match the reference exactly, the Q14 weighted kinds
+        # may round differently by 1 where the float result is close to .5
+        failed = False
+        for t in tables:
+            mismatches, max_error = check(t, images)
+            print(f"check {t.kind:>8} x{float(t.scale):<8g}: {mismatches} pixels differ from the "
+                  f"reference (max {max_error})", file=sys.stderr)
+            failed |= max_error > (0 if t.kind == "nearest" else 1)
+        if failed:
+            print("check failed", file=sys.stderr)
+            return 1
+
+    header = emit_header(tables, "python resize_tables.py " + " ".join(argv))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(header)
+    else:
+        print(header)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
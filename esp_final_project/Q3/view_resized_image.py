@@ -2,10 +2,18 @@ import serial
 import numpy as np
 import cv2
 import time
+from collections import namedtuple
+
+import resample_reference
+import resize_reconstruct
 
 SERIAL_PORT = 'COM8'
 BAUD_RATE = 115200
 
+# In host resize mode every VERIFY_EVERY-th command (and the first) still
+# transfers the resized frames, to check them against the reconstruction
+VERIFY_EVERY = 10
+
 def main():
     print("Connecting to ESP32...")
     ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=5)
@@ -28,8 +36,14 @@ def main():
     print("  u<value>   - Upsample only (e.g., u2.0, u1.5)")
     print("  d<value>   - Downsample only (e.g., d0.5, d0.75)")
     print("  b<up>,<down> - Both custom (e.g., b2.0,0.5)")
+    print("  h          - Toggle host resize mode (only the original is transferred)")
+    print("  v          - Verify the next command with a full transfer")
     print("  q          - Quit")
     
+    host_resize = False
+    verify_next = False
+    commands = 0
+    
     while True:
         cmd = input("\nEnter command: ").strip()
         
@@ -39,18 +53,44 @@ def main():
         if not cmd:
             continue
         
+        if cmd == 'h':
+            if set_host_resize(ser, not host_resize):
+                host_resize = not host_resize
+                verify_next = host_resize
+            continue
+        
+        if cmd == 'v':
+            verify_next = True
+            print("Next command is verified with a full transfer")
+            continue
+        
         # Validate command format
         if cmd[0] not in ['a', 'u', 'd', 'b']:
-            print("Invalid command! Use a, u, d, or b")
+            print("Invalid command! Use a, u, d, b, h or v")
             continue
         
+        # Occasional full transfer to check the host reconstruction
+        verify = host_resize and (verify_next or commands % VERIFY_EVERY == 0)
+        if verify:
+            print("Verification: resized frames are transferred this time")
+            set_host_resize(ser, False)
+        
         # Send command
         print(f"\nSending '{cmd}' command...")
         ser.write(cmd.encode() + b'\n')
         ser.flush()
         
         # Process images
-        images = process_images(ser)
+        transfers = []
+        checks = []
+        images = process_images(ser, transfers, host_resize and not verify, checks)
+        print_transfer_stats(transfers)
+        print_checks(checks)
+        commands += 1
+        
+        if verify:
+            set_host_resize(ser, True)
+            verify_next = False
         
         # Display and save
         if images:
@@ -58,9 +98,69 @@ def main():
     
     ser.close()
 
-def process_images(ser):
-    """Process and return all images"""
+def set_host_resize(ser, on):
+    """Switch the device's host resize mode, True once it confirmed"""
+    ser.write(b"h1\n" if on else b"h0\n")
+    ser.flush()
+    expected = "HOST_RESIZE:ON" if on else "HOST_RESIZE:OFF"
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        line = ser.readline().decode('utf-8', errors='ignore').strip()
+        if line == expected:
+            print(f"Host resize mode {'on' if on else 'off'}")
+            return True
+        if line:
+            print(f"> {line}")
+    print("✗ ESP32 did not confirm the host resize mode (old firmware?)")
+    return False
+
+def add_resized(images, desc, line, host_resize):
+    """Handles a *_DESC line: rebuilds the frame in host resize mode,
+    otherwise keeps the descriptor to check the transferred frame"""
+    scale = line.split(':')[5]
+    key = f'{desc.name}_{scale}'
+    if not host_resize:
+        images.setdefault('descriptors', {})[key] = desc
+        return
+    if 'original' not in images:
+        print(f"✗ Cannot rebuild {desc.name}: no original")
+        return
+    start = time.perf_counter()
+    img = resize_reconstruct.reconstruct(images['original'], desc)
+    print(f"✓ {desc.name.capitalize()} rebuilt on host: {desc.new_w}x{desc.new_h} "
+          f"in {(time.perf_counter() - start) * 1e3:.2f} ms ({img.size} bytes not transferred)")
+    images[key] = {'img': img, 'scale': scale, 'desc': desc}
+
+def check_resized(images, key, img, checks):
+    """Compares a transferred resized frame with the host reconstruction"""
+    desc = images.get('descriptors', {}).get(key)
+    if desc is None or 'original' not in images:
+        return
+    images[key]['desc'] = desc
+    try:
+        rebuilt = resize_reconstruct.reconstruct(images['original'], desc)
+    except ValueError as e:
+        print(f"✗ Cannot rebuild {key}: {e}")
+        return
+    mismatches, max_diff = resize_reconstruct.verify(rebuilt, img)
+    checks.append((key, mismatches, max_diff, img.size))
+
+def print_checks(checks):
+    """Verification results of process_images()"""
+    for key, mismatches, max_diff, size in checks:
+        if mismatches == 0:
+            print(f"✓ Host reconstruction of {key} is bit-exact ({size} pixels)")
+        else:
+            print(f"✗ Host reconstruction of {key}: {mismatches}/{size} pixels differ (max {max_diff})")
+
+def process_images(ser, transfers=None, host_resize=False, checks=None):
+    """Process and return all images, Transfer records are appended to
+    transfers and reconstruction checks to checks"""
     images = {}
+    if transfers is None:
+        transfers = []
+    if checks is None:
+        checks = []
     
     while True:
         line = ser.readline().decode('utf-8', errors='ignore').strip()
@@ -79,10 +179,11 @@ def process_images(ser):
             expected = w * h
             print(f"Receiving original: {w}x{h} ({expected} bytes)")
             
-            data = read_image_data(ser, expected, "original")
-            if data is not None:
+            transfer = read_image_data(ser, expected, "original")
+            transfers.append(transfer)
+            if transfer.complete:
                 try:
-                    img = np.frombuffer(data, dtype=np.uint8).reshape((h, w))
+                    img = transfer.data.reshape((h, w))
                     images['original'] = img
                     print(f"✓ Original received: {w}x{h}")
                 except Exception as e:
@@ -96,12 +197,14 @@ def process_images(ser):
             expected = w * h
             print(f"Receiving upsampled ({scale}x): {w}x{h} ({expected} bytes)")
             
-            data = read_image_data(ser, expected, "upsampled")
-            if data is not None:
+            transfer = read_image_data(ser, expected, "upsampled")
+            transfers.append(transfer)
+            if transfer.complete:
                 try:
-                    img = np.frombuffer(data, dtype=np.uint8).reshape((h, w))
+                    img = transfer.data.reshape((h, w))
                     images[f'upsampled_{scale}'] = {'img': img, 'scale': scale}
                     print(f"✓ Upsampled received: {w}x{h}")
+                    check_resized(images, f'upsampled_{scale}', img, checks)
                 except Exception as e:
                     print(f"✗ Failed to reshape upsampled: {e}")
         
@@ -113,15 +216,25 @@ def process_images(ser):
             expected = w * h
             print(f"Receiving downsampled ({scale}x): {w}x{h} ({expected} bytes)")
             
-            data = read_image_data(ser, expected, "downsampled")
-            if data is not None:
+            transfer = read_image_data(ser, expected, "downsampled")
+            transfers.append(transfer)
+            if transfer.complete:
                 try:
-                    img = np.frombuffer(data, dtype=np.uint8).reshape((h, w))
+                    img = transfer.data.reshape((h, w))
                     images[f'downsampled_{scale}'] = {'img': img, 'scale': scale}
                     print(f"✓ Downsampled received: {w}x{h}")
+                    check_resized(images, f'downsampled_{scale}', img, checks)
                 except Exception as e:
                     print(f"✗ Failed to reshape downsampled: {e}")
         
+        elif "_DESC:" in line:
+            try:
+                desc = resize_reconstruct.parse_descriptor(line)
+            except ValueError as e:
+                print(f"✗ {e}")
+            else:
+                add_resized(images, desc, line, host_resize)
+        
         elif line == "FINISHED":
             print("\n✓ All processing finished!")
             break
@@ -130,59 +243,78 @@ def process_images(ser):
             print(f"\n✗ ESP32 Error: {line}")
             break
     
+    images.pop('descriptors', None)
     return images
 
-def read_image_data(ser, expected_bytes, name, timeout=60):
-    """Read image data with better timeout handling"""
-    data = bytearray()
-    start_time = time.time()
-    last_update = start_time
+# One payload transfer: data is the preallocated buffer, only complete when
+# received == expected
+Transfer = namedtuple("Transfer", "name data expected received seconds complete")
+
+def transfer_rate(transfer):
+    """Throughput of a transfer in bytes/s"""
+    return transfer.received / max(transfer.seconds, 1e-9)
+
+def read_image_data(ser, expected_bytes, name, timeout=60, idle_timeout=10, poll=0.5):
+    """Read a payload straight into a preallocated buffer.
+
+    Blocking readinto() calls return as soon as the rest of the payload
+    arrived, or after `poll` seconds with whatever came in by then, which
+    paces the progress output. The transfer stops after `idle_timeout`
+    seconds without data or `timeout` seconds in total; a short transfer is
+    returned as such (complete=False), never padded.
+    """
+    data = np.empty(expected_bytes, dtype=np.uint8)
+    view = memoryview(data)
+    received = 0
+    previous_timeout = ser.timeout
+    ser.timeout = poll
+    start_time = time.perf_counter()
     last_data_time = start_time
     
     print(f"  Reading {name}...")
     
-    while len(data) < expected_bytes:
-        current_time = time.time()
-        
-        # Check timeout (no data received for 10 seconds)
-        if current_time - last_data_time > 10:
-            print(f"  ✗ Timeout on {name}! No data for 10s. Got {len(data)}/{expected_bytes} bytes")
-            print(f"    Missing {expected_bytes - len(data)} bytes")
-            break
-        
-        # Check total timeout
-        if current_time - start_time > timeout:
-            print(f"  ✗ Total timeout on {name}! Got {len(data)}/{expected_bytes} bytes")
-            break
-        
-        # Read available data
-        if ser.in_waiting:
-            to_read = min(ser.in_waiting, expected_bytes - len(data))
-            chunk = ser.read(to_read)
-            data.extend(chunk)
-            last_data_time = current_time
-            
-            # Progress update every 0.5 seconds
-            if current_time - last_update > 0.5:
-                percent = (len(data) / expected_bytes) * 100
-                print(f"    {len(data)}/{expected_bytes} bytes ({percent:.1f}%)")
-                last_update = current_time
-        else:
-            time.sleep(0.001)
-    
-    print(f"  {name}: Read {len(data)} bytes total")
+    try:
+        while received < expected_bytes:
+            count = ser.readinto(view[received:])
+            current_time = time.perf_counter()
+            if count:
+                received += count
+                last_data_time = current_time
+                if received < expected_bytes:
+                    percent = (received / expected_bytes) * 100
+                    print(f"    {received}/{expected_bytes} bytes ({percent:.1f}%)")
+            elif current_time - last_data_time > idle_timeout:
+                print(f"  ✗ Timeout on {name}! No data for {idle_timeout}s")
+                break
+            if received < expected_bytes and current_time - start_time > timeout:
+                print(f"  ✗ Total timeout on {name}!")
+                break
+    finally:
+        ser.timeout = previous_timeout
+        view.release()
     
-    if len(data) == expected_bytes:
-        print(f"  ✓ {name} complete")
-        return bytes(data)
-    elif len(data) > 0:
-        print(f"  ⚠ {name} incomplete: {len(data)}/{expected_bytes}")
-        if len(data) < expected_bytes:
-            data.extend([0] * (expected_bytes - len(data)))
-        return bytes(data)
+    transfer = Transfer(name, data, expected_bytes, received,
+                        time.perf_counter() - start_time, received == expected_bytes)
+    if transfer.complete:
+        print(f"  ✓ {name} complete: {received} bytes in {transfer.seconds:.2f}s "
+              f"({transfer_rate(transfer) / 1024:.1f} KB/s)")
     else:
-        print(f"  ✗ {name}: No data received")
-        return None
+        print(f"  ✗ {name} partial: {received}/{expected_bytes} bytes, "
+              f"missing {expected_bytes - received} (discarded)")
+    return transfer
+
+def print_transfer_stats(transfers):
+    """Per-transfer size, time and throughput"""
+    if not transfers:
+        return
+    print("\n=== Transfers ===")
+    for t in transfers:
+        state = "ok" if t.complete else "PARTIAL"
+        print(f"  {t.name:<12} {t.received:>7}/{t.expected:<7} bytes {t.seconds:7.2f}s "
+              f"{transfer_rate(t) / 1024:7.1f} KB/s  {state}")
+    total = sum(t.received for t in transfers)
+    seconds = sum(t.seconds for t in transfers)
+    print(f"  {'total':<12} {total:>7} bytes {seconds:15.2f}s {total / max(seconds, 1e-9) / 1024:7.1f} KB/s")
 
 def display_and_save_all(images):
     """Display and save all images"""
@@ -209,10 +341,29 @@ def display_and_save_all(images):
             cv2.imwrite(filename, img)
             print(f"✓ Saved: {filename} ({w}x{h})")
     
+    print_quality(images)
+    
     # Display comparison if we have images
     if len(images) >= 2:
         display_comparison(images)
 
+def print_quality(images):
+    """Quality of the device's resized frames against host reference resampling"""
+    if 'original' not in images:
+        return
+    for name, content in images.items():
+        if name == 'original':
+            continue
+        # The descriptor has the exact scale, the name only 3 decimals
+        scale = content['desc'].scale if 'desc' in content else float(content['scale'])
+        for kind in ("bilinear", "area"):
+            reference = resample_reference.resample(images['original'], scale, kind)
+            if reference.shape != content['img'].shape:
+                continue
+            q = resample_reference.compare(content['img'], reference)
+            print(f"  {name} vs {kind}: PSNR {q['psnr']:.2f} dB, SSIM {q['ssim']:.4f}, "
+                  f"max error {q['max_error']}")
+
 def display_comparison(images):
     """Display comparison of available images"""
     display_h = 250
@@ -12,7 +12,8 @@
   * @param pImg    Pointer to image buffer
   * @param height  height of the image
   * @param width   width of the image
-  * @param format  Choose IMAGE_FORMAT_GRAYSCALE, IMAGE_FORMAT_RGB565, or IMAGE_FORMAT_RGB888
+  * @param format  Choose IMAGE_FORMAT_GRAYSCALE, IMAGE_FORMAT_RGB565, IMAGE_FORMAT_RGB888
+  *                or a packed IMAGE_FORMAT_GRAY4/GRAY2/GRAY1
   * @retval 0 if successfully initialized
   */
 int8_t LIB_IMAGE_InitStruct(IMAGE_HandleTypeDef * img, uint8_t *pImg, uint16_t height, uint16_t width, IMAGE_Format format)
@@ -26,6 +27,81 @@ int8_t LIB_IMAGE_InitStruct(IMAGE_HandleTypeDef * img, uint8_t *pImg, uint16_t h
 	img->height = height;
 	img->width 	= width;
 	img->pData 	= pImg;
-	img->size 	= (uint32_t)img->format * (uint32_t)img->height * (uint32_t)img->width;
+	img->size 	= LIB_IMAGE_RowBytes(width, format) * (uint32_t)img->height;
+	return IMAGE_OK;
+}
+
+/**
+  * @brief Number of bits one pixel takes on the wire
+  * @param format  Image format
+  * @retval bits per pixel, 0 for an unknown format
+  */
+uint8_t LIB_IMAGE_BitsPerPixel(IMAGE_Format format)
+{
+	switch (format)
+	{
+	case IMAGE_FORMAT_GRAYSCALE:	return 8;
+	case IMAGE_FORMAT_RGB565:		return 16;
+	case IMAGE_FORMAT_RGB888:		return 24;
+	case IMAGE_FORMAT_GRAY4:		return 4;
+	case IMAGE_FORMAT_GRAY2:		return 2;
+	case IMAGE_FORMAT_GRAY1:		return 1;
+	default:						return 0;
+	}
+}
+
+/**
+  * @brief Bytes of one image row, packed rows are padded to a whole byte
+  * @param width   width of the image
+  * @param format  Image format
+  * @retval bytes per row
+  */
+uint32_t LIB_IMAGE_RowBytes(uint16_t width, IMAGE_Format format)
+{
+	return ((uint32_t)width * LIB_IMAGE_BitsPerPixel(format) + 7) / 8;
+}
+
+/**
+  * @brief Packs an 8-bit grayscale buffer into a GRAY4/GRAY2/GRAY1 image
+  *        by rounding every pixel to the nearest of 2^bits levels,
+  *        (pixel * levels + 127) / 255 like py_imgpack.quantize
+  * @param img   Initialized image with a packed format, receives the data
+  * @param gray  width * height grayscale pixels
+  * @retval 0 if successfully packed
+  */
+int8_t LIB_IMAGE_PackGrayscale(IMAGE_HandleTypeDef * img, const uint8_t * gray)
+{
+	uint8_t __bits = LIB_IMAGE_BitsPerPixel(img->format);
+	uint16_t __levels = (uint16_t)((1u << __bits) - 1);
+	uint32_t __rowBytes = LIB_IMAGE_RowBytes(img->width, img->format);
+	uint8_t * __pRow = img->pData;
+	uint16_t __x, __y;
+
+	__LIB_IMAGE_CHECK_PARAM(gray);
+	if (__bits == 0 || __bits > 4)
+	{
+		return IMAGE_ERROR;
+	}
+	for (__y = 0; __y < img->height; __y++)
+	{
+		uint8_t __acc = 0, __used = 0;
+		uint8_t * __pOut = __pRow;
+		for (__x = 0; __x < img->width; __x++)
+		{
+			__acc = (uint8_t)((__acc << __bits) | ((*gray++ * __levels + 127) / 255));
+			__used += __bits;
+			if (__used == 8)
+			{
+				*__pOut++ = __acc;
+				__acc = 0;
+				__used = 0;
+			}
+		}
+		if (__used)
+		{
+			*__pOut = (uint8_t)(__acc << (8 - __used));
+		}
+		__pRow += __rowBytes;
+	}
 	return IMAGE_OK;
 }
@@ -0,0 +1,357 @@
+import time
+import zlib
+import struct
+
+# Chunked, CRC protected payload framing for py_serialimg transfers.
+#
+# Requested by setting FRAMED_FLAG in the header format byte. The payload
+# bytes that would otherwise go on the wire (including the py_imgcodec
+# prefix when encodings are enabled) are split into chunks:
+#
+#   "SC" + tag(4) + seq(2) + count(2) + length(2) + data[length] + crc32(4)
+#
+# tag is the crc32 of the whole payload, crc32 covers tag, seq, count,
+# length and data; 1 <= length <= CHUNK_SIZE and every chunk but the last is
+# CHUNK_SIZE long. Once the receiver has every chunk, or the line stays
+# quiet for a round timeout, it answers with
+#
+#   "SN" + tag(4) + n(2) + seq(2) * n + crc32(4)    (crc32 over tag, n, seqs)
+#
+# listing the chunks of payload tag it still needs. n == 0 acknowledges the
+# payload and ends the transfer; seq ALL_CHUNKS with tag NO_TAG asks for
+# everything (no chunk was valid, so the receiver does not know the payload
+# yet). The sender retransmits only the listed chunks and waits for the next
+# NACK. Bytes that are neither chunks nor NACKs are ignored, so a lost ACK
+# cannot desynchronise the "ST" request stream.
+#
+# The receiver NACKs as soon as the last chunk of a round has gone by, valid
+# or failing its CRC, so the round timeout is only waited for when that
+# chunk's header is lost too. A receiver that hears nothing for a round
+# timeout repeats its NACK, so the sender waits longer than that
+# (nack_timeout) before it counts a NACK as lost; it gives up after
+# max_timeouts of them in a row (the receiver is gone). max_rounds limits
+# rounds in a row that make no progress (no new chunk for the receiver, no
+# shorter NACK for the sender), so a noisy line slows a transfer down but
+# does not fail it.
+#
+# The tag keeps a lost ACK from mixing two payloads up: the sender of the
+# acknowledged payload keeps waiting while the receiver has moved on to the
+# next one. The receiver stays silent until bytes arrive, only assembles
+# chunks that agree on tag and count and checks the joined payload against
+# the tag; the stale sender ignores NACKs about other payloads and takes a
+# NO_TAG NACK, after the receiver already knew its tag, as the lost ACK.
+# The other end may also take up the next transfer right after the ACK; a
+# sender given find_request takes a valid request header found in the
+# stream as the ACK and hands it back through unread.
+#
+#   python py_imgframing.py        loopback check with injected bit errors
+
+FRAMED_FLAG = 0x80
+
+CHUNK_SYNC   = b"SC"
+CHUNK_HEADER = "<IHHH"
+CHUNK_SIZE   = 1024
+NACK_SYNC    = b"SN"
+NACK_HEADER  = "<IH"
+ALL_CHUNKS   = 0xFFFF
+NO_TAG       = 0
+CRC_SIZE     = 4
+
+HEADER_SIZE = len(CHUNK_SYNC) + struct.calcsize(CHUNK_HEADER)
+
+def split_chunks(data, chunk_size = CHUNK_SIZE):
+    tag   = zlib.crc32(data)
+    count = max(1, -(-len(data) // chunk_size))
+    return [build_chunk(tag, seq, count, data[seq * chunk_size:(seq + 1) * chunk_size])
+            for seq in range(count)]
+
+def build_chunk(tag, seq, count, data):
+    body = struct.pack(CHUNK_HEADER, tag, seq, count, len(data)) + bytes(data)
+    return CHUNK_SYNC + body + struct.pack("<I", zlib.crc32(body))
+
+def build_nack(tag, missing):
+    body = struct.pack(f"{NACK_HEADER}{len(missing)}H", tag, len(missing), *missing)
+    return NACK_SYNC + body + struct.pack("<I", zlib.crc32(body))
+
+# Reassembles one framed payload from arbitrary slices of the byte stream.
+# Chunks are grouped by tag, the NACKs are about the tag with the most of
+# them (tag is None until a chunk was valid).
+class ChunkAssembler:
+    def __init__(self, chunk_size = CHUNK_SIZE):
+        self.buffer     = bytearray()
+        self.payloads   = {}      # tag -> (count, {seq: data})
+        self.tag        = None
+        self.chunk_size = chunk_size
+        self.last       = None    # (seq, count) of the latest chunk, valid or not
+        self.bad        = 0
+        self.received   = 0
+        self.payload    = None    # joined data once it matched its tag
+
+    # Parses complete chunks; once the payload is in, the rest stays in buffer
+    def feed(self, data):
+        self.received += len(data)
+        self.buffer   += data
+        while not self.complete():
+            idx = self.buffer.find(CHUNK_SYNC)
+            if idx < 0:
+                del self.buffer[:max(0, len(self.buffer) - 1)]
+                return
+            if len(self.buffer) - idx < HEADER_SIZE:
+                del self.buffer[:idx]
+                return
+            tag, seq, count, length = struct.unpack_from(CHUNK_HEADER, self.buffer, idx + len(CHUNK_SYNC))
+            if not (0 < length <= self.chunk_size and seq < count and count != ALL_CHUNKS):
+                del self.buffer[:idx + 1]
+                continue
+            end = idx + HEADER_SIZE + length + CRC_SIZE
+            if len(self.buffer) < end:
+                del self.buffer[:idx]
+                return
+            body = bytes(self.buffer[idx + len(CHUNK_SYNC):end - CRC_SIZE])
+            crc, = struct.unpack_from("<I", self.buffer, end - CRC_SIZE)
+            self.last = (seq, count)
+            known = self.payloads.get(tag)
+            if zlib.crc32(body) != crc or (known is not None and count != known[0]):
+                self.bad += 1
+                del self.buffer[:idx + 1]
+                continue
+            del self.buffer[:end]
+            count, chunks = self.payloads.setdefault(tag, (count, {}))
+            chunks[seq] = body[struct.calcsize(CHUNK_HEADER):]
+            if self.tag is None or len(chunks) > len(self.payloads[self.tag][1]):
+                self.tag = tag
+            if len(chunks) == count:
+                self.check(tag)
+
+    # Accepts a payload with all chunks in if it matches its tag, drops it otherwise
+    def check(self, tag):
+        count, chunks = self.payloads[tag]
+        payload = b"".join(chunks[seq] for seq in range(count))
+        if zlib.crc32(payload) == tag:
+            self.tag, self.payload = tag, payload
+            return
+        del self.payloads[tag]
+        if self.tag == tag:
+            self.tag = max(self.payloads, key = lambda t: len(self.payloads[t][1]), default = None)
+
+    def missing(self):
+        if self.tag is None:
+            return [ALL_CHUNKS]
+        count, chunks = self.payloads[self.tag]
+        return [seq for seq in range(count) if seq not in chunks]
+
+    def nack_tag(self):
+        return NO_TAG if self.tag is None else self.tag
+
+    # True once the last chunk parsed was final (the payload's last chunk if None)
+    def reached(self, final):
+        if self.last is None:
+            return False
+        seq, count = self.last
+        return seq == (count - 1 if final is None else final)
+
+    def complete(self):
+        return self.payload is not None
+
+    def data(self):
+        return self.payload
+
+# Scans the stream for one valid NACK, returns (tag, seq list) or None on
+# timeout. Bytes after the NACK (e.g. the next "ST" header), or everything
+# read when none came, are handed to unread. find_request(bytes) returns the
+# index of a request header (-1 if none); one that comes before any valid
+# NACK is handed to unread and (None, []) returned.
+def read_nack(receive, timeout, unread = None, find_request = None):
+    size     = len(NACK_SYNC) + struct.calcsize(NACK_HEADER)
+    buffer   = bytearray()
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        buffer += receive(max(0.0, deadline - time.perf_counter()))
+        while True:
+            idx     = buffer.find(NACK_SYNC)
+            request = -1 if find_request is None else find_request(buffer)
+            if request >= 0 and (idx < 0 or request < idx):
+                if unread is not None:
+                    unread(bytes(buffer[request:]))
+                return None, []
+            if idx < 0 or len(buffer) - idx < size:
+                break
+            tag, n = struct.unpack_from(NACK_HEADER, buffer, idx + len(NACK_SYNC))
+            if n > ALL_CHUNKS // 64:
+                del buffer[:idx + 1]
+                continue
+            end = idx + size + 2 * n + CRC_SIZE
+            if len(buffer) < end:
+                if request < 0:
+                    break
+                # A request follows, so this NACK's length was damaged
+                del buffer[:idx + 1]
+                continue
+            body = bytes(buffer[idx + len(NACK_SYNC):end - CRC_SIZE])
+            crc, = struct.unpack_from("<I", buffer, end - CRC_SIZE)
+            if zlib.crc32(body) == crc:
+                if unread is not None and len(buffer) > end:
+                    unread(bytes(buffer[end:]))
+                return tag, list(struct.unpack_from(f"<{n}H", body, struct.calcsize(NACK_HEADER)))
+            del buffer[:idx + 1]
+    if unread is not None and buffer:
+        unread(bytes(buffer))
+    return None
+
+# Sender side: transmit(bytes) writes, receive(timeout) returns available
+# bytes (b"" on timeout) and unread(bytes) takes back what was read past the
+# end of the transfer. Returns the number of retransmitted chunks.
+# nack_timeout (default twice round_timeout) must outlast the receiver's
+# quiet period plus the time the chunks spend on the line. With
+# find_request (see read_nack) the receiver's next request acknowledges the
+# payload too, so a damaged ACK does not fail the transfer.
+def send_framed(data, transmit, receive, round_timeout = 0.5, max_rounds = 16, chunk_size = CHUNK_SIZE,
+                unread = None, nack_timeout = None, max_timeouts = 4, find_request = None):
+    if nack_timeout is None:
+        nack_timeout = 2 * round_timeout
+    tag    = zlib.crc32(data)
+    chunks = split_chunks(data, chunk_size)
+    transmit(b"".join(chunks))
+    retransmitted = 0
+    stalled = timeouts = 0
+    outstanding = len(chunks)
+    known = False
+    while stalled < max_rounds and timeouts < max_timeouts:
+        nack = read_nack(receive, nack_timeout, unread, find_request)
+        if nack is not None and nack[0] is None:
+            # The receiver's next request: it took the payload
+            return retransmitted
+        if nack is None or nack[0] not in (tag, NO_TAG):
+            # The receiver repeats a lost NACK after its round timeout,
+            # NACKs about another payload are as good as none
+            timeouts += 1
+            continue
+        nack_tag, missing = nack
+        if nack_tag == tag:
+            known = True
+        elif known:
+            # The receiver knew this payload and started over: it took it
+            # and the ACK was lost
+            return retransmitted
+        if not missing:
+            return retransmitted
+        timeouts = 0
+        if ALL_CHUNKS in missing:
+            missing = range(len(chunks))
+        missing = [seq for seq in missing if seq < len(chunks)]
+        stalled = 0 if len(missing) < outstanding else stalled + 1
+        outstanding = min(outstanding, len(missing))
+        transmit(b"".join(chunks[seq] for seq in missing))
+        retransmitted += len(missing)
+    raise TimeoutError("Framed payload was not acknowledged")
+
+# Receiver side: returns the reassembled payload bytes. start_timeout limits
+# the wait for the first byte (None: max_rounds round timeouts), for a
+# receiver whose request may never have reached the sender.
+def receive_framed(transmit, receive, round_timeout = 0.5, max_rounds = 16, chunk_size = CHUNK_SIZE,
+                   unread = None, start_timeout = None):
+    assembler = ChunkAssembler(chunk_size)
+    stalled = 0
+    started = time.perf_counter()
+    while stalled < max_rounds:
+        if start_timeout is not None and not assembler.received \
+                and time.perf_counter() - started >= start_timeout:
+            raise TimeoutError("Framed payload did not start")
+        pending  = assembler.missing()
+        tag      = assembler.tag
+        final    = None if ALL_CHUNKS in pending else pending[-1]
+        deadline = time.perf_counter() + round_timeout
+        while not assembler.complete():
+            data = receive(max(0.0, deadline - time.perf_counter()))
+            if data:
+                assembler.last = None
+                assembler.feed(data)
+                deadline = time.perf_counter() + round_timeout
+                if assembler.reached(final):
+                    break
+            elif time.perf_counter() >= deadline:
+                break
+        if assembler.complete():
+            transmit(build_nack(assembler.tag, []))
+            if unread is not None and assembler.buffer:
+                unread(bytes(assembler.buffer))
+            return assembler.data()
+        missing = assembler.missing()
+        # Nothing heard yet: a NACK could only reach a sender still waiting
+        # for the ACK of the previous payload
+        if assembler.received:
+            transmit(build_nack(assembler.nack_tag(), missing))
+        stalled = 0 if assembler.tag != tag or len(missing) < len(pending) else stalled + 1
+    raise TimeoutError(f"Framed payload incomplete, missing {len(assembler.missing())} chunks")
+
+# Sends payloads through an in-memory link that flips bits in both
+# directions with probability error_rate per byte, and checks every one
+# arrives intact. A payload whose ACK was lost for good fails on the sender
+# side only, like in py_serialbench; those are counted, not raised.
+# Returns (payloads, seconds, retransmitted chunks, unacknowledged).
+def loopback(payloads, error_rate, seed = 0, round_timeout = 0.1, chunk_size = CHUNK_SIZE):
+    import queue
+    import random
+    import threading
+
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def corrupt(data):
+        data = bytearray(data)
+        with lock:
+            for i in range(len(data)):
+                if rng.random() < error_rate:
+                    data[i] ^= 1 << rng.randrange(8)
+        return bytes(data)
+
+    def channel():
+        lines = queue.Queue()
+        def receive(timeout):
+            try:
+                return lines.get(timeout = max(timeout, 1e-3))
+            except queue.Empty:
+                return b""
+        return (lambda data: lines.put(corrupt(data))), receive
+
+    to_receiver, receiver_reads = channel()
+    to_sender, sender_reads = channel()
+    retransmitted = unacknowledged = 0
+    failure = []
+
+    def sender():
+        nonlocal retransmitted, unacknowledged
+        try:
+            for payload in payloads:
+                try:
+                    retransmitted += send_framed(payload, to_receiver, sender_reads, round_timeout,
+                                                 chunk_size = chunk_size)
+                except TimeoutError:
+                    unacknowledged += 1
+        except Exception as e:
+            failure.append(e)
+
+    thread = threading.Thread(target = sender, daemon = True)
+    start = time.perf_counter()
+    thread.start()
+    for index, payload in enumerate(payloads):
+        received = receive_framed(to_sender, receiver_reads, round_timeout, chunk_size = chunk_size)
+        if received != payload:
+            raise AssertionError(f"payload {index} corrupted")
+    thread.join()
+    if failure:
+        raise failure[0]
+    return len(payloads), time.perf_counter() - start, retransmitted, unacknowledged
+
+if __name__ == "__main__":
+    import os
+
+    # At 2e-3 most 1 KiB chunks are hit, smaller chunks keep it workable
+    payloads = [os.urandom(128 * 128 * 2) for _ in range(30)]
+    for error_rate, chunk_size in ((0.0, CHUNK_SIZE), (1e-4, CHUNK_SIZE), (5e-4, CHUNK_SIZE), (2e-3, 256)):
+        for seed in (1, 2, 3):
+            count, seconds, retransmitted, unacknowledged = loopback(payloads, error_rate, seed,
+                                                                     chunk_size = chunk_size)
+            print(f"errors {error_rate:<7g} chunks {chunk_size:4d} seed {seed}: {count} payloads intact "
+                  f"in {seconds:5.2f} s, {retransmitted} chunks retransmitted, "
+                  f"{unacknowledged} ACKs lost")
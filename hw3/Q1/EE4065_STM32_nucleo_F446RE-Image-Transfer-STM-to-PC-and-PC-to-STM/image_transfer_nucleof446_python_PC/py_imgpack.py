@@ -0,0 +1,71 @@
+import numpy as np
+
+# Packed low bit depth grayscale formats (lib_image.h IMAGE_FORMAT_GRAY4/2/1).
+# Pixels are quantized to 2**bits levels and packed MSB first; every row is
+# padded to a whole byte, so a row takes ceil(width * bits / 8) bytes.
+
+IMAGE_FORMAT_GRAY4 = 4
+IMAGE_FORMAT_GRAY2 = 5
+IMAGE_FORMAT_GRAY1 = 6
+
+# Bits per pixel of every format code (also the unpacked ones)
+formatBits = {1: 8, 2: 16, 3: 24, IMAGE_FORMAT_GRAY4: 4, IMAGE_FORMAT_GRAY2: 2, IMAGE_FORMAT_GRAY1: 1}
+
+# 8x8 Bayer matrix, thresholds in [0, 1)
+BAYER_8X8 = np.array([[ 0, 32,  8, 40,  2, 34, 10, 42],
+                      [48, 16, 56, 24, 50, 18, 58, 26],
+                      [12, 44,  4, 36, 14, 46,  6, 38],
+                      [60, 28, 52, 20, 62, 30, 54, 22],
+                      [ 3, 35, 11, 43,  1, 33,  9, 41],
+                      [51, 19, 59, 27, 49, 17, 57, 25],
+                      [15, 47,  7, 39, 13, 45,  5, 37],
+                      [63, 31, 55, 23, 61, 29, 53, 21]], dtype = np.float32) / 64
+
+def is_packed(format):
+    return formatBits.get(format, 8) < 8
+
+def row_bytes(width, format):
+    return (width * formatBits[format] + 7) // 8
+
+# Wire size of one frame in bytes
+def payload_size(width, height, format):
+    return height * row_bytes(width, format)
+
+# 8-bit grayscale (height, width) -> levels 0 .. 2**bits - 1.
+# With dither the rounding threshold follows an ordered Bayer pattern, which
+# keeps gradients readable at 1-2 bits and stays fully vectorized.
+def quantize(gray, bits, dither = False):
+    levels = (1 << bits) - 1
+    if not dither:
+        return ((gray.astype(np.uint16) * levels + 127) // 255).astype(np.uint8)
+    height, width = gray.shape
+    threshold = np.tile(BAYER_8X8, (-(-height // 8), -(-width // 8)))[:height, :width]
+    scaled = gray.astype(np.float32) * (levels / 255.0)
+    return np.minimum(np.floor(scaled + threshold), levels).astype(np.uint8)
+
+# 8-bit grayscale (height, width) -> packed payload bytes
+def pack(gray, format, dither = False):
+    bits = formatBits[format]
+    q = quantize(gray, bits, dither)
+    if bits == 1:
+        return np.packbits(q, axis = 1).tobytes()
+    height, width = q.shape
+    # Low `bits` bits of every level, MSB first, then one bit stream per row
+    planes = np.unpackbits(q[:, :, None], axis = 2)[:, :, 8 - bits:]
+    return np.packbits(planes.reshape(height, width * bits), axis = 1).tobytes()
+
+# Packed payload -> levels (height, width), 0 .. 2**bits - 1
+def unpack_levels(data, width, height, format):
+    bits = formatBits[format]
+    rows = np.frombuffer(data, dtype = np.uint8).reshape(height, row_bytes(width, format))
+    stream = np.unpackbits(rows, axis = 1, count = width * bits)
+    if bits == 1:
+        return stream
+    weights = (1 << np.arange(bits - 1, -1, -1)).astype(np.uint8)
+    return stream.reshape(height, width, bits) @ weights
+
+# Packed payload -> 8-bit grayscale (height, width) spanning 0 .. 255
+def unpack(data, width, height, format):
+    levels = (1 << formatBits[format]) - 1
+    lut = (np.arange(levels + 1, dtype = np.uint16) * 255 // levels).astype(np.uint8)
+    return lut[unpack_levels(data, width, height, format)]
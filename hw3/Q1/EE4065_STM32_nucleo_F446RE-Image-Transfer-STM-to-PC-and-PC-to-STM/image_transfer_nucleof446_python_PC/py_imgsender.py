@@ -0,0 +1,158 @@
+import os
+import sys
+import glob
+import queue
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import py_serialimg
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+# Directory, glob pattern, single path, image array, stack of images or any
+# iterable of paths/arrays -> list of items to send
+def expand_source(source):
+    if isinstance(source, str):
+        if os.path.isdir(source):
+            return sorted(os.path.join(source, name) for name in os.listdir(source)
+                          if name.lower().endswith(IMAGE_EXTENSIONS))
+        if glob.has_magic(source):
+            return sorted(glob.glob(source))
+        return [source]
+    if isinstance(source, np.ndarray):
+        return list(source) if source.ndim == 4 else [source]
+    return list(source)
+
+# Sends images to the MCU as soon as it asks for one.
+# A worker thread decodes, resizes and converts the next `prefetch` items for
+# the negotiated geometry while the link is busy, and converted payloads of
+# file sources are kept in an LRU cache keyed by (path, width, height, format).
+# The geometry is taken from the first request unless it is given up front;
+# a request with a different geometry converts its frame on the spot.
+class PrefetchingSender:
+    def __init__(self, source, prefetch = 4, cache_size = 64, repeat = False, geometry = None):
+        self.items      = expand_source(source)
+        self.repeat     = repeat
+        self.cache      = OrderedDict()
+        self.cache_size = cache_size
+        self.lock       = threading.Lock()
+        self.ready      = queue.Queue(maxsize = prefetch)
+        self.geometry   = geometry
+        self.known      = threading.Event()
+        self.stopped    = threading.Event()
+        self.hits       = 0
+        self.misses     = 0
+        if geometry is not None:
+            self.known.set()
+        self.worker = threading.Thread(target = self.prefetch, daemon = True)
+        self.worker.start()
+
+    # Raw payload of one item for (width, height, format), cached for file paths
+    def payload(self, item, geometry):
+        if not isinstance(item, str):
+            return py_serialimg.image_to_payload(item, *geometry)
+        key = (item,) + geometry
+        with self.lock:
+            data = self.cache.get(key)
+            if data is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+        data = py_serialimg.image_to_payload(item, *geometry)
+        with self.lock:
+            self.cache[key] = data
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last = False)
+        return data
+
+    def prefetch(self):
+        self.known.wait()
+        while not self.stopped.is_set():
+            for item in self.items:
+                if self.stopped.is_set():
+                    break
+                geometry = self.geometry
+                try:
+                    entry = (item, geometry, self.payload(item, geometry), None)
+                except Exception as e:
+                    # e.g. an unreadable file; send() raises it in its turn
+                    entry = (item, geometry, None, e)
+                while not self.stopped.is_set():
+                    try:
+                        self.ready.put(entry, timeout = 0.5)
+                        break
+                    except queue.Full:
+                        pass
+            if not self.repeat or not self.items:
+                break
+        try:
+            self.ready.put_nowait(None)
+        except queue.Full:
+            pass
+
+    # Writes the next image to link for its current request.
+    # Returns the item sent, or None once the source is exhausted.
+    # Raises ValueError if the worker could not convert the next item; the
+    # request is still open then and the next call answers it.
+    def send(self, link):
+        geometry = (link.width, link.height, link.format)
+        if not self.known.is_set():
+            self.geometry = geometry
+            self.known.set()
+        entry = self.ready.get()
+        if entry is None:
+            self.ready.put(None)
+            return None
+        item, prepared, data, error = entry
+        if error is not None:
+            name = item if isinstance(item, str) else "image array"
+            raise ValueError(f"Could not convert {name}: {error}") from error
+        if link.roi is not None:
+            # Crops are converted on the spot, the cache holds full frames
+            link.write(item)
+            return item
+        if prepared != geometry:
+            self.geometry = geometry
+            data = self.payload(item, geometry)
+        link.write_payload(data)
+        return item
+
+    def stop(self):
+        self.stopped.set()
+        self.known.set()
+
+# Answers every MCU_READS request with the next image of the source and
+# every MCU_WRITES request by receiving the frame, e.g.
+#   python py_imgsender.py COM6 "digits/*.png"
+def main(port, source):
+    sender = PrefetchingSender(source, repeat = True)
+    if not sender.items:
+        # send() would return None for every request and never write a frame
+        sender.stop()
+        raise SystemExit(f"No images in {source}")
+    link = py_serialimg.SerialImageLink(port)
+    try:
+        while True:
+            rqType, height, width, format = link.poll_for_request()
+            if rqType == py_serialimg.MCU_READS:
+                # Items that cannot be converted are skipped
+                for _ in range(max(1, len(sender.items))):
+                    try:
+                        print("Sent", sender.send(link), f"({width}x{height})")
+                        break
+                    except ValueError as e:
+                        print("Skipped:", e)
+            elif rqType == py_serialimg.MCU_WRITES:
+                link.read(show = False)
+                print("Received frame", link.frames)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        sender.stop()
+        link.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,42 @@
+/*
+ * lib_imgcodec.h
+ *
+ * Payload encodings of the serial image protocol (see py_imgcodec.py).
+ *
+ * The MCU advertises the encodings it accepts by OR-ing IMAGE_ENCODING_FLAG_*
+ * into the format byte of the "ST" request header. When any flag is set,
+ * every payload is preceded by encoding (1 byte) and length (4 bytes, little
+ * endian) of the encoded data that follows:
+ *
+ *   IMAGE_ENCODING_RAW   : plain img->size bytes
+ *   IMAGE_ENCODING_RLE   : (count, value) pairs, 1 <= count <= 255
+ *   IMAGE_ENCODING_DELTA : RLE pairs of (frame XOR previous frame); the
+ *                          destination buffer must still hold the previous
+ *                          frame and is updated in place
+ */
+
+#ifndef INC_LIB_IMGCODEC_H_
+#define INC_LIB_IMGCODEC_H_
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+#include "lib_image.h"
+
+#define IMAGE_ENCODING_RAW			((uint8_t)0)
+#define IMAGE_ENCODING_RLE			((uint8_t)1)
+#define IMAGE_ENCODING_DELTA		((uint8_t)2)
+
+#define IMAGE_ENCODING_FLAG_RLE		((uint8_t)0x10)
+#define IMAGE_ENCODING_FLAG_DELTA	((uint8_t)0x20)
+
+#define IMAGE_ENCODING_PREFIX_SIZE	((uint32_t)5)
+
+int8_t LIB_IMGCODEC_Decode(uint8_t encoding, const uint8_t * src, uint32_t srcLen, IMAGE_HandleTypeDef * img);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif /* INC_LIB_IMGCODEC_H_ */
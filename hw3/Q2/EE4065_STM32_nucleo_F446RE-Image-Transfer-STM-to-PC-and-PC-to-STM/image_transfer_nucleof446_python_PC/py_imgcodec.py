@@ -0,0 +1,113 @@
+import struct
+import numpy as np
+
+# Payload encodings for py_serialimg transfers.
+#
+# The MCU advertises the encodings it understands in the upper nibble of the
+# header format byte (lower nibble is still the pixel format), so firmware
+# that sends a plain format keeps using raw payloads. When any flag is set,
+# every payload in both directions is preceded by
+#
+#   encoding(1) + length(4, little endian) + <length encoded bytes>
+#
+# and the sender may pick any advertised encoding (or raw) frame by frame.
+#
+# RLE   : (count, value) byte pairs, 1 <= count <= 255
+# DELTA : the frame XORed with the previous frame sent in the same
+#         direction, then RLE encoded. The first frame after a geometry
+#         change is never sent as DELTA.
+#
+# lib_imgcodec.c on the STM32 side is the reference decoder for this format.
+
+ENCODING_RAW   = 0
+ENCODING_RLE   = 1
+ENCODING_DELTA = 2
+
+encodingType = { ENCODING_RAW: "Raw", ENCODING_RLE: "RLE", ENCODING_DELTA: "XOR Delta + RLE",}
+
+# Header format byte flags
+ENCODING_FLAGS = { ENCODING_RLE: 0x10, ENCODING_DELTA: 0x20,}
+FORMAT_MASK    = 0x0F
+ENCODING_MASK  = 0x30
+
+PREFIX_FORMAT = "<BI"
+PREFIX_SIZE   = struct.calcsize(PREFIX_FORMAT)
+
+RUN_LIMIT = 255
+
+def rle_encode(data):
+    data = np.frombuffer(data, dtype = np.uint8)
+    if data.size == 0:
+        return b""
+    starts  = np.flatnonzero(data[1:] != data[:-1]) + 1
+    starts  = np.concatenate(([0], starts))
+    lengths = np.diff(np.append(starts, data.size))
+
+    # Split runs longer than RUN_LIMIT into full pieces plus a remainder
+    pieces = (lengths + RUN_LIMIT - 1) // RUN_LIMIT
+    counts = np.full(int(pieces.sum()), RUN_LIMIT, dtype = np.uint8)
+    counts[np.cumsum(pieces) - 1] = lengths - (pieces - 1) * RUN_LIMIT
+
+    encoded = np.empty(2 * counts.size, dtype = np.uint8)
+    encoded[0::2] = counts
+    encoded[1::2] = np.repeat(data[starts], pieces)
+    return encoded.tobytes()
+
+def rle_decode(data, size):
+    data = np.frombuffer(data, dtype = np.uint8)
+    if data.size % 2:
+        raise ValueError("RLE stream has an odd number of bytes")
+    decoded = np.repeat(data[1::2], data[0::2])
+    if decoded.size != size:
+        raise ValueError(f"RLE stream decodes to {decoded.size} bytes, expected {size}")
+    return decoded
+
+def delta_encode(data, previous):
+    data     = np.frombuffer(data, dtype = np.uint8)
+    previous = np.frombuffer(previous, dtype = np.uint8)
+    return rle_encode(np.bitwise_xor(data, previous))
+
+def delta_decode(data, previous):
+    previous = np.frombuffer(previous, dtype = np.uint8)
+    return np.bitwise_xor(rle_decode(data, previous.size), previous)
+
+# Keeps the previous frame of one transfer direction for DELTA
+class PayloadCodec:
+    def __init__(self):
+        self.previous = None
+
+    def reset(self):
+        self.previous = None
+
+    # Returns prefix + body using the smallest encoding allowed by flags
+    def encode(self, data, flags):
+        data = bytes(data)
+        encoding, body = ENCODING_RAW, data
+        if flags & ENCODING_FLAGS[ENCODING_RLE]:
+            candidate = rle_encode(data)
+            if len(candidate) < len(body):
+                encoding, body = ENCODING_RLE, candidate
+        if flags & ENCODING_FLAGS[ENCODING_DELTA] and self.previous is not None \
+                and len(self.previous) == len(data):
+            candidate = delta_encode(data, self.previous)
+            if len(candidate) < len(body):
+                encoding, body = ENCODING_DELTA, candidate
+        self.previous = data
+        return struct.pack(PREFIX_FORMAT, encoding, len(body)) + body
+
+    # Returns the decoded frame as a flat uint8 array
+    def decode(self, encoding, body, size):
+        if encoding == ENCODING_RAW:
+            frame = np.frombuffer(body, dtype = np.uint8)
+        elif encoding == ENCODING_RLE:
+            frame = rle_decode(body, size)
+        elif encoding == ENCODING_DELTA:
+            if self.previous is None or self.previous.size != size:
+                raise ValueError("DELTA frame received without a previous frame")
+            frame = delta_decode(body, self.previous)
+        else:
+            raise ValueError(f"Unknown payload encoding {encoding}")
+        if frame.size != size:
+            raise ValueError(f"Payload has {frame.size} bytes, expected {size}")
+        self.previous = frame
+        return frame
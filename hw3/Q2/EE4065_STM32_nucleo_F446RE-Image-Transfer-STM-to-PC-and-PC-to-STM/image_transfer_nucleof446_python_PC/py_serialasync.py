@@ -0,0 +1,176 @@
+import asyncio
+import struct
+import sys
+import serial
+import cv2
+
+import py_serialimg
+import py_imgcodec
+import py_imgframing
+
+# asyncio version of the py_serialimg protocol (MCU_WRITES / MCU_READS).
+# The port is opened and configured with pyserial and its file descriptor is
+# handed to the event loop, so many boards can share one thread:
+#
+#   link = await AsyncSerialImageLink("/dev/ttyACM0").open()
+#   async for rqType, height, width, format in link.requests():
+#       if rqType == py_serialimg.MCU_WRITES:
+#           img = await link.read_image()
+#       elif rqType == py_serialimg.MCU_READS:
+#           await link.write_image("mandrill.tiff")
+#
+# Framed requests (py_imgframing) run the blocking chunk/NACK exchange on a
+# worker thread whose reads and writes go through the event loop.
+#
+# Serial file descriptors can only be watched by the event loop on POSIX;
+# on Windows use py_serialimg.SerialImageDispatcher instead.
+
+class SerialImageProtocol(asyncio.Protocol):
+    def __init__(self):
+        self.scanner  = py_serialimg.RequestScanner()
+        self.waiter   = None
+        self.error    = None
+        self.writable = asyncio.Event()
+        self.writable.set()
+
+    def data_received(self, data):
+        self.scanner.feed(data)
+        self.wake()
+
+    def connection_lost(self, exc):
+        self.error = exc or ConnectionError("Serial port closed")
+        self.writable.set()
+        self.wake()
+
+    def pause_writing(self):
+        self.writable.clear()
+
+    def resume_writing(self):
+        self.writable.set()
+
+    def wake(self):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    # Suspends until data_received() or connection_lost() is called
+    async def wait_for_data(self):
+        if self.error is not None:
+            raise self.error
+        self.waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self.waiter
+        finally:
+            self.waiter = None
+        if self.error is not None:
+            raise self.error
+
+class AsyncSerialImageLink(py_serialimg.LinkState):
+    def __init__(self, port, baudrate = 2000000):
+        super().__init__()
+        self.port        = port
+        self.baudrate    = baudrate
+        self.serial      = None
+        self.reader      = None
+        self.writer      = None
+        self.protocol    = SerialImageProtocol()
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.serial = serial.Serial(self.port, self.baudrate, timeout = 0)
+        self.serial.reset_input_buffer()
+        self.reader, _ = await loop.connect_read_pipe(lambda: self.protocol, self.serial)
+        self.writer, _ = await loop.connect_write_pipe(lambda: self.protocol, self.serial)
+        return self
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.reader is not None:
+            self.reader.close()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    # Yields [requestType, height, width, format] for every MCU request
+    async def requests(self):
+        scanner = self.protocol.scanner
+        while True:
+            header = scanner.next_header()
+            if header is None:
+                await self.protocol.wait_for_data()
+                continue
+            yield self.set_request(header)
+
+    async def receive(self, n):
+        while self.protocol.scanner.pending() < n:
+            await self.protocol.wait_for_data()
+        return self.protocol.scanner.take(n)
+
+    # Whatever arrives within timeout (b"" if nothing)
+    async def receive_some(self, timeout):
+        scanner = self.protocol.scanner
+        if not scanner.pending():
+            try:
+                await asyncio.wait_for(self.protocol.wait_for_data(), timeout)
+            except asyncio.TimeoutError:
+                return b""
+        return scanner.take(scanner.pending())
+
+    # Runs a py_imgframing transfer(*args, transmit, receive, **kwargs) on a
+    # worker thread, its reads and writes are handed to the event loop
+    async def run_framed(self, transfer, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        def transmit(data):
+            loop.call_soon_threadsafe(self.writer.write, data)
+        def receive(timeout):
+            return asyncio.run_coroutine_threadsafe(self.receive_some(timeout), loop).result()
+        def unread(data):
+            loop.call_soon_threadsafe(self.protocol.scanner.feed, data)
+        return await loop.run_in_executor(None, lambda: transfer(*args, transmit, receive,
+                                                                 unread = unread, **kwargs))
+
+    # Reads Image from MCU
+    async def read_image(self):
+        if self.framed:
+            data = self.unwrap_payload(await self.run_framed(py_imgframing.receive_framed))
+        elif self.encodings:
+            prefix = await self.receive(py_imgcodec.PREFIX_SIZE)
+            encoding, length = struct.unpack(py_imgcodec.PREFIX_FORMAT, prefix)
+            data = self.decode_payload(encoding, await self.receive(length))
+        else:
+            data = await self.receive(self.imgSize)
+        self.frames += 1
+        return py_serialimg.payload_to_image(data, self.tileWidth, self.tileHeight, self.format)
+
+    # Writes Image (file path or BGR array) to MCU
+    async def write_image(self, img, dither = False):
+        data = py_serialimg.image_to_payload(img, self.width, self.height, self.format, dither, self.roi)
+        if self.framed:
+            await self.run_framed(py_imgframing.send_framed, self.encode_payload(data),
+                                  find_request = py_serialimg.find_header)
+        else:
+            self.writer.write(self.encode_payload(data))
+        await self.protocol.writable.wait()
+        if self.protocol.error is not None:
+            raise self.protocol.error
+        self.frames += 1
+
+# Echo server for several boards on one event loop:
+# frames from each MCU are saved, requests for frames are answered with `path`
+async def serve(port, path):
+    async with AsyncSerialImageLink(port) as link:
+        async for rqType, height, width, format in link.requests():
+            if rqType == py_serialimg.MCU_WRITES:
+                img = await link.read_image()
+                cv2.imwrite(f"received_{link.serial.name.split('/')[-1]}_{link.frames}.png", img)
+            elif rqType == py_serialimg.MCU_READS:
+                await link.write_image(path)
+
+async def main(ports, path = "mandrill.tiff"):
+    await asyncio.gather(*(serve(port, path) for port in ports))
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
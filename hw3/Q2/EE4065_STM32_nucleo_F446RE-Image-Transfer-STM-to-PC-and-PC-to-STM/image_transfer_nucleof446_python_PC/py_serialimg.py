@@ -1,8 +1,24 @@
 import numpy as np
 import serial
-import msvcrt
 import cv2
 import time
+import struct
+import threading
+import queue
+import select
+import io
+
+import py_imgcodec
+import py_imgframing
+import py_imgpack
+import py_imgroi
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import msvcrt
+except ImportError:
+    # ESC-to-exit is only available on Windows consoles
+    msvcrt = None
 
 MCU_WRITES = 87
 MCU_READS  = 82
@@ -10,80 +26,545 @@ MCU_READS  = 82
 rqType = { MCU_WRITES: "MCU Sends Image", MCU_READS: "PC Sends Image"} 
 
 # Format 
-formatType = { 1: "Grayscale", 2: "RGB565", 3: "RGB888",} 
+formatType = { 1: "Grayscale", 2: "RGB565", 3: "RGB888",
+               4: "Gray 4-bit", 5: "Gray 2-bit", 6: "Gray 1-bit",} 
 
 IMAGE_FORMAT_GRAYSCALE	= 1
 IMAGE_FORMAT_RGB565		= 2
 IMAGE_FORMAT_RGB888		= 3
+# Packed grayscale, see py_imgpack
+IMAGE_FORMAT_GRAY4		= py_imgpack.IMAGE_FORMAT_GRAY4
+IMAGE_FORMAT_GRAY2		= py_imgpack.IMAGE_FORMAT_GRAY2
+IMAGE_FORMAT_GRAY1		= py_imgpack.IMAGE_FORMAT_GRAY1
 
-# Init Com Port
-def SERIAL_Init(port):
-    global __serial    
-    __serial = serial.Serial(port, 2000000, timeout = 10)
-    __serial.flush()
-    print(__serial.name, "Opened")
-    print("")
+payload_size = py_imgpack.payload_size
 
-# Wait for MCU Request 
-def SERIAL_IMG_PollForRequest():
-    global requestType
-    global height
-    global width
-    global format
-    global imgSize
-    while(1):
-        if msvcrt.kbhit() and msvcrt.getch() == chr(27).encode():
-            print("Exit program!")
-            exit(0)
-        if np.frombuffer(__serial.read(1), dtype= np.uint8) == 83:
-            if np.frombuffer(__serial.read(1), dtype= np.uint8) == 84:
-                requestType  = int(np.frombuffer(__serial.read(1), dtype= np.uint8))
-                width  = int(np.frombuffer(__serial.read(2), dtype= np.uint16))
-                height = int(np.frombuffer(__serial.read(2), dtype= np.uint16))  
-                format       = int(np.frombuffer(__serial.read(1), dtype= np.uint8))
-                imgSize     = height * width * format
-                
-                print("Request Type : ", rqType[int(requestType)])
-                print("Height       : ", int(height))
-                print("Width        : ", int(width))
-                print("Format       : ", formatType[int(format)])
-                print()
-                return [int(requestType), int(height), int(width), int(format)]
-
-# Reads Image from MCU  
-def SERIAL_IMG_Read():
-    img = np.frombuffer(__serial.read(imgSize), dtype = np.uint8)
+# Request Header: "ST" + requestType(1) + width(2) + height(2) + format(1)
+# format: lower nibble pixel format, bits 4-5 encoding flags (see py_imgcodec),
+#         bit 6 region of interest (see py_imgroi), bit 7 chunked CRC framing
+#         (see py_imgframing)
+# An ROI request is followed by x(2) + y(2) + w(2) + h(2) + stride(1).
+HEADER_SYNC   = b"ST"
+HEADER_FORMAT = "<BHHB"
+HEADER_SIZE   = len(HEADER_SYNC) + struct.calcsize(HEADER_FORMAT)
+
+# True for an unpacked (requestType, width, height, format) this module serves
+def valid_header(header):
+    return header[0] in rqType and header[3] & py_imgcodec.FORMAT_MASK in formatType
+
+# Index of the first valid request header in data, -1 if there is none.
+# A framed write takes the MCU's next request as its ACK (see py_imgframing).
+def find_header(data):
+    idx = data.find(HEADER_SYNC)
+    while 0 <= idx <= len(data) - HEADER_SIZE:
+        if valid_header(struct.unpack_from(HEADER_FORMAT, data, idx + len(HEADER_SYNC))):
+            return idx
+        idx = data.find(HEADER_SYNC, idx + 1)
+    return -1
+
+# Incremental "ST" header parser over bulk serial reads
+class RequestScanner:
+    def __init__(self, capacity = 4096):
+        self.buffer = bytearray(capacity)
+        self.view   = memoryview(self.buffer)
+        self.start  = 0
+        self.end    = 0
+
+    def pending(self):
+        return self.end - self.start
+
+    # Moves unparsed bytes to the front of the buffer
+    def compact(self):
+        if self.start:
+            count = self.end - self.start
+            self.buffer[:count] = bytes(self.view[self.start:self.end])
+            self.start = 0
+            self.end   = count
+
+    # Reads everything the port already holds (at least one byte, or until timeout)
+    def fill(self, ser):
+        if self.end == len(self.buffer):
+            self.compact()
+        count = min(max(ser.in_waiting, 1), len(self.buffer) - self.end)
+        count = ser.readinto(self.view[self.end:self.end + count]) or 0
+        self.end += count
+        return count
+
+    # Returns (requestType, width, height, format, roi) or None if no complete
+    # header is buffered; roi is a py_imgroi.Roi or None
+    def next_header(self):
+        while True:
+            idx = self.buffer.find(HEADER_SYNC, self.start, self.end)
+            if idx < 0:
+                # Keep a trailing 'S', it may be the first half of the next sync word
+                keep = self.end > self.start and self.buffer[self.end - 1] == HEADER_SYNC[0]
+                self.start = self.end - 1 if keep else self.end
+                self.compact()
+                return None
+            if self.end - idx < HEADER_SIZE:
+                self.start = idx
+                self.compact()
+                return None
+            header = struct.unpack_from(HEADER_FORMAT, self.buffer, idx + len(HEADER_SYNC))
+            if valid_header(header):
+                if not header[3] & py_imgroi.ROI_FLAG:
+                    self.start = idx + HEADER_SIZE
+                    return header + (None,)
+                if self.end - idx < HEADER_SIZE + py_imgroi.ROI_SIZE:
+                    self.start = idx
+                    self.compact()
+                    return None
+                roi = py_imgroi.Roi(*struct.unpack_from(py_imgroi.ROI_FORMAT, self.buffer, idx + HEADER_SIZE))
+                if roi.fits(header[1], header[2]):
+                    self.start = idx + HEADER_SIZE + py_imgroi.ROI_SIZE
+                    return header + (roi,)
+            # False sync inside payload or noise, resume right after the 'S'
+            self.start = idx + 1
+
+    # Appends bytes that arrived by other means (e.g. an asyncio protocol)
+    def feed(self, data):
+        if self.end + len(data) > len(self.buffer):
+            self.compact()
+        if self.end + len(data) > len(self.buffer):
+            self.view.release()
+            self.buffer.extend(bytes(self.end + len(data) - len(self.buffer)))
+            self.view = memoryview(self.buffer)
+        self.view[self.end:self.end + len(data)] = data
+        self.end += len(data)
+
+    # Removes and returns n already buffered bytes
+    def take(self, n):
+        data = bytes(self.view[self.start:self.start + n])
+        self.start += n
+        return data
+
+    # Copies already buffered bytes into a writable buffer, returns the count
+    def drain_into(self, view):
+        count = min(len(view), self.pending())
+        view[:count] = self.view[self.start:self.start + count]
+        self.start += count
+        return count
+
+    # Returns n bytes, starting with the ones already buffered after the header
+    def read(self, ser, n):
+        count = min(n, self.pending())
+        data = bytes(self.view[self.start:self.start + count])
+        self.start += count
+        if count < n:
+            data += ser.read(n - count)
+        return data
+
+# Raw payload bytes -> BGR image
+def payload_to_image(data, width, height, format):
+    if py_imgpack.is_packed(format):
+        return cv2.cvtColor(py_imgpack.unpack(data, width, height, format), cv2.COLOR_GRAY2BGR)
+    img = np.frombuffer(data, dtype = np.uint8)
     img = np.reshape(img, (height, width, format))
     if format == IMAGE_FORMAT_GRAYSCALE:
         img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
     elif format == IMAGE_FORMAT_RGB565:
         img = cv2.cvtColor(img, cv2.COLOR_BGR5652BGR)
-
-    timestamp = time.strftime('%Y_%m_%d_%H%M%S', time.localtime())     
-    cv2.imshow("img", img) 
-    cv2.waitKey(2000)
-    cv2.destroyAllWindows()
-    
-    #cv2.imwrite("capture/image_"+ timestamp + ".jpg", img)  
     return img
 
-# Writes Image to MCU   
-def SERIAL_IMG_Write(path):
-    img = cv2.imread(path)
-    img = cv2.resize(img, (width,height))
+# Image file path or BGR image -> raw payload bytes in the requested geometry;
+# dither only applies to the packed grayscale formats, roi (py_imgroi.Roi)
+# crops the resized frame
+def image_to_payload(img, width, height, format, dither = False, roi = None):
+    if isinstance(img, str):
+        img = cv2.imread(img)
+    img = cv2.resize(img, (width, height))
+    if roi is not None:
+        img = np.ascontiguousarray(roi.crop(img))
+    if py_imgpack.is_packed(format):
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return py_imgpack.pack(gray, format, dither)
     if format == IMAGE_FORMAT_GRAYSCALE:
         img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     elif format == IMAGE_FORMAT_RGB565:
         img = cv2.cvtColor(img, cv2.COLOR_BGR2BGR565)
+    return img.tobytes()
+
+# One preallocated frame buffer of a FrameRing.
+# raw holds the payload as received, image the BGR version of it.
+class FrameSlot:
+    def __init__(self, ring, index):
+        height, width, format = ring.shape
+        self.ring  = ring
+        self.index = index
+        if py_imgpack.is_packed(format):
+            self.raw = np.empty((height, py_imgpack.row_bytes(width, format)), dtype = np.uint8)
+        else:
+            self.raw = np.empty(ring.shape, dtype = np.uint8)
+        self.flat  = memoryview(self.raw.reshape(-1))
+        if format == IMAGE_FORMAT_RGB888:
+            self.image = self.raw
+        else:
+            self.image = np.empty((height, width, 3), dtype = np.uint8)
+
+    def release(self):
+        self.ring.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+# Fixed set of frame buffers recycled between the receiver and the consumer.
+# acquire() blocks while the consumer still holds every slot.
+class FrameRing:
+    def __init__(self, width, height, format, count = 4):
+        self.shape = (height, width, format)
+        self.slots = [FrameSlot(self, i) for i in range(count)]
+        self.free  = queue.Queue()
+        for slot in self.slots:
+            self.free.put(slot)
+
+    def matches(self, width, height, format):
+        return self.shape == (height, width, format)
+
+    def acquire(self, timeout = None):
+        return self.free.get(timeout = timeout)
+
+    def release(self, slot):
+        self.free.put(slot)
+
+# Shows frames in a window on its own thread so receiving never waits for
+# the display. show() only keeps the newest frame; frames that arrive while
+# the window is busy are skipped. HighGUI needs a display and, on macOS,
+# the main thread, so headless setups should not create a viewer.
+class FrameViewer:
+    def __init__(self, title = "img", interval = 0.03):
+        self.title    = title
+        self.interval = interval
+        self.latest   = None
+        self.ready    = threading.Condition()
+        self.stopped  = False
+        self.shown    = 0
+        self.thread   = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+    def show(self, img):
+        with self.ready:
+            self.latest = img
+            self.ready.notify()
+
+    def run(self):
+        while True:
+            with self.ready:
+                self.ready.wait_for(lambda: self.latest is not None or self.stopped, self.interval)
+                if self.stopped:
+                    break
+                img, self.latest = self.latest, None
+            if img is not None:
+                cv2.imshow(self.title, img)
+                self.shown += 1
+            cv2.waitKey(1)
+        cv2.destroyWindow(self.title)
 
-    img = img.tobytes()
-    __serial.write(img)
-    
+    def close(self):
+        with self.ready:
+            self.stopped = True
+            self.ready.notify()
+        self.thread.join()
 
+# Request geometry and payload encoding negotiated by the last header
+class LinkState:
+    def __init__(self):
+        self.requestType = 0
+        self.width       = 0
+        self.height      = 0
+        self.format      = 0
+        self.encodings   = 0
+        self.framed      = False
+        self.roi         = None
+        self.tileWidth   = 0
+        self.tileHeight  = 0
+        self.imgSize     = 0
+        self.frames      = 0
+        self.rxCodec     = py_imgcodec.PayloadCodec()
+        self.txCodec     = py_imgcodec.PayloadCodec()
 
+    # The payload covers tileWidth x tileHeight pixels, the full frame unless
+    # the request carries an ROI
+    def set_request(self, header):
+        requestType, width, height, format, roi = header
+        encodings = format & py_imgcodec.ENCODING_MASK
+        framed    = bool(format & py_imgframing.FRAMED_FLAG)
+        format    = format & py_imgcodec.FORMAT_MASK
+        if (width, height, format, roi) != (self.width, self.height, self.format, self.roi):
+            self.rxCodec.reset()
+            self.txCodec.reset()
+        self.requestType = requestType
+        self.width       = width
+        self.height      = height
+        self.format      = format
+        self.encodings   = encodings
+        self.framed      = framed
+        self.roi         = roi
+        self.tileWidth, self.tileHeight = roi.tile_size if roi else (width, height)
+        self.imgSize     = payload_size(self.tileWidth, self.tileHeight, format)
+        return [requestType, height, width, format]
 
+    # Bytes to put on the wire for one raw frame
+    def encode_payload(self, data):
+        if not self.encodings:
+            return data
+        return self.txCodec.encode(data, self.encodings)
 
+    # Flat uint8 frame from an encoding prefix and the encoded body
+    def decode_payload(self, encoding, body):
+        return self.rxCodec.decode(encoding, body, self.imgSize)
 
-    
+    # Flat uint8 frame from a complete wire payload (prefix included)
+    def unwrap_payload(self, wire):
+        if not self.encodings:
+            if len(wire) != self.imgSize:
+                raise ValueError(f"Payload has {len(wire)} bytes, expected {self.imgSize}")
+            return wire
+        encoding, length = struct.unpack_from(py_imgcodec.PREFIX_FORMAT, wire)
+        start = py_imgcodec.PREFIX_SIZE
+        return self.decode_payload(encoding, wire[start:start + length])
 
+# One serial port with its own negotiated frame geometry
+class SerialImageLink(LinkState):
+    def __init__(self, port, baudrate = 2000000, timeout = 10):
+        super().__init__()
+        self.serial = serial.Serial(port, baudrate, timeout = timeout)
+        self.serial.flush()
+        self.name        = self.serial.name
+        self.scanner     = RequestScanner()
+        try:
+            # Direct readinto() on the fd, pyserial's own readinto copies through bytes
+            self.raw = io.FileIO(self.serial.fileno(), "rb", closefd = False)
+        except (AttributeError, io.UnsupportedOperation):
+            self.raw = None
+
+    # Waits for MCU Request, returns None if stop() becomes true first
+    def poll_for_request(self, stop = None):
+        while True:
+            header = self.scanner.next_header()
+            if header is not None:
+                break
+            if stop is not None and stop():
+                return None
+            self.scanner.fill(self.serial)
+        return self.set_request(header)
+
+    # Returns whatever arrives within timeout (b"" if nothing)
+    def receive_some(self, timeout):
+        if self.scanner.pending():
+            return self.scanner.take(self.scanner.pending())
+        if self.raw is None:
+            return self.serial.read(max(1, self.serial.in_waiting))
+        if not select.select([self.raw], [], [], timeout)[0]:
+            return b""
+        return self.raw.read(65536) or b""
+
+    # Reads one (possibly encoded or framed) payload and returns the raw frame bytes
+    def read_payload(self):
+        if self.framed:
+            wire = py_imgframing.receive_framed(self.serial.write, self.receive_some,
+                                                unread = self.scanner.feed)
+            return self.unwrap_payload(wire)
+        if not self.encodings:
+            return self.scanner.read(self.serial, self.imgSize)
+        prefix = self.scanner.read(self.serial, py_imgcodec.PREFIX_SIZE)
+        if len(prefix) < py_imgcodec.PREFIX_SIZE:
+            raise TimeoutError(f"{self.name}: payload prefix not received")
+        encoding, length = struct.unpack(py_imgcodec.PREFIX_FORMAT, prefix)
+        return self.decode_payload(encoding, self.scanner.read(self.serial, length))
+
+    # Reads Image from MCU; show is False, True (shared FrameViewer) or a FrameViewer
+    def read(self, show = True):
+        data = self.read_payload()
+        img = payload_to_image(data, self.tileWidth, self.tileHeight, self.format)
+        self.frames += 1
+
+        if show:
+            (show if isinstance(show, FrameViewer) else default_viewer()).show(img)
+        return img
+
+    # Appends the raw payload of the current MCU_WRITES request to a
+    # py_framearchive.FrameArchive; plain payloads are received straight into
+    # the archive's memory map. The image is only converted for a viewer.
+    def capture(self, archive, viewer = None):
+        if self.encodings or self.framed:
+            data = self.read_payload()
+            archive.append(data, self.tileWidth, self.tileHeight, self.format)
+        else:
+            data  = archive.reserve(self.imgSize)
+            count = self.readinto(data)
+            if count < self.imgSize:
+                archive.cancel()
+                raise TimeoutError(f"{self.name}: received {count} of {self.imgSize} bytes")
+            if viewer is not None:
+                # Copy: the viewer must not keep the archive's memory map exported
+                viewer.show(payload_to_image(bytes(data), self.tileWidth, self.tileHeight, self.format))
+                viewer = None
+            archive.commit(self.tileWidth, self.tileHeight, self.format)
+        if viewer is not None:
+            viewer.show(payload_to_image(data, self.tileWidth, self.tileHeight, self.format))
+        self.frames += 1
+
+    # Fills a writable buffer with the next payload bytes, returns the count received
+    def readinto(self, view):
+        count = self.scanner.drain_into(view)
+        while count < len(view):
+            if self.raw is None:
+                received = self.serial.readinto(view[count:])
+            elif select.select([self.raw], [], [], self.serial.timeout)[0]:
+                received = self.raw.readinto(view[count:])
+            else:
+                received = 0
+            if not received:
+                break
+            count += received
+        return count
+
+    # Reads Image from MCU into a free slot of ring without allocating;
+    # the caller must release() the slot (or use it as a context manager)
+    def read_frame(self, ring, convert = True):
+        if not ring.matches(self.tileWidth, self.tileHeight, self.format):
+            raise ValueError(f"Ring shape {ring.shape} does not match request "
+                             f"{(self.tileHeight, self.tileWidth, self.format)}")
+        slot = ring.acquire()
+        if self.encodings or self.framed:
+            try:
+                frame = self.read_payload()
+                slot.flat[:] = frame
+            except Exception:
+                slot.release()
+                raise
+            count = len(frame)
+        else:
+            count = self.readinto(slot.flat)
+        if count < self.imgSize:
+            slot.release()
+            raise TimeoutError(f"{self.name}: received {count} of {self.imgSize} bytes")
+        if convert and self.format == IMAGE_FORMAT_GRAYSCALE:
+            cv2.cvtColor(slot.raw, cv2.COLOR_GRAY2BGR, dst = slot.image)
+        elif convert and self.format == IMAGE_FORMAT_RGB565:
+            cv2.cvtColor(slot.raw, cv2.COLOR_BGR5652BGR, dst = slot.image)
+        elif convert and py_imgpack.is_packed(self.format):
+            gray = py_imgpack.unpack(slot.raw, self.tileWidth, self.tileHeight, self.format)
+            cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst = slot.image)
+        self.frames += 1
+        return slot
+
+    # Writes Image (file path or BGR array) to MCU
+    def write(self, img, dither = False):
+        self.write_payload(image_to_payload(img, self.width, self.height, self.format, dither, self.roi))
+
+    # Asks the MCU to send only the (x, y, w, h) crop, every stride-th pixel,
+    # with its next MCU_WRITES request
+    def request_roi(self, x, y, w, h, stride = 1):
+        self.serial.write(py_imgroi.request_bytes((x, y, w, h, stride)))
+
+    # Writes an already converted raw frame to MCU
+    def write_payload(self, data):
+        if self.framed:
+            py_imgframing.send_framed(self.encode_payload(data), self.serial.write, self.receive_some,
+                                      unread = self.scanner.feed, find_request = find_header)
+        else:
+            self.serial.write(self.encode_payload(data))
+        self.frames += 1
+
+    def close(self):
+        self.serial.close()
+
+# Serves several boards at once, one worker thread per link.
+# handler(link, request) is called on the worker thread for every request
+# and must read or write the frame; it should not open windows.
+class SerialImageDispatcher:
+    def __init__(self, links, handler):
+        self.links    = list(links)
+        self.handler  = handler
+        self.stopped  = threading.Event()
+        self.executor = None
+        self.futures  = []
+        self.started  = 0.0
+
+    def start(self):
+        self.stopped.clear()
+        self.started  = time.perf_counter()
+        self.executor = ThreadPoolExecutor(max_workers = len(self.links))
+        self.futures  = [self.executor.submit(self.serve, link) for link in self.links]
+
+    def serve(self, link):
+        while not self.stopped.is_set():
+            request = link.poll_for_request(stop = self.stopped.is_set)
+            if request is None:
+                break
+            self.handler(link, request)
+
+    # Stops after the current poll returns (at most one serial timeout)
+    def stop(self):
+        self.stopped.set()
+        if self.executor:
+            self.executor.shutdown(wait = True)
+            self.executor = None
+        for future in self.futures:
+            future.result()
+
+    # Aggregate and per-board transferred frames/s since start()
+    def stats(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        boards  = {link.name: link.frames / elapsed for link in self.links}
+        return {"frames": sum(link.frames for link in self.links),
+                "fps":    sum(boards.values()),
+                "boards": boards}
+
+__viewer = None
+
+# FrameViewer shared by read(show = True) and SERIAL_IMG_Read, created on first use
+def default_viewer():
+    global __viewer
+    if __viewer is None:
+        __viewer = FrameViewer()
+    return __viewer
+
+# Init Com Port
+def SERIAL_Init(port):
+    global __link
+    __link = SerialImageLink(port)
+    print(__link.name, "Opened")
+    print("")
+
+def __escape_pressed():
+    if msvcrt and msvcrt.kbhit() and msvcrt.getch() == chr(27).encode():
+        print("Exit program!")
+        exit(0)
+    return False
+
+# Wait for MCU Request 
+def SERIAL_IMG_PollForRequest():
+    requestType, height, width, format = __link.poll_for_request(stop = __escape_pressed)
+
+    print("Request Type : ", rqType[requestType])
+    print("Height       : ", height)
+    print("Width        : ", width)
+    print("Format       : ", formatType[format])
+    if __link.roi:
+        print("ROI          : ", tuple(__link.roi))
+    if __link.encodings:
+        print("Encodings    : ", [name for enc, name in py_imgcodec.encodingType.items()
+                                  if py_imgcodec.ENCODING_FLAGS.get(enc, 0) & __link.encodings])
+    print()
+    return [requestType, height, width, format]
+
+# Reads Image from MCU (shown without blocking unless show is False)
+def SERIAL_IMG_Read(show = True):
+    return __link.read(show)
+
+# Appends the image from MCU to a py_framearchive.FrameArchive, no display
+def SERIAL_IMG_Capture(archive):
+    __link.capture(archive)
+
+# Writes Image to MCU   
+def SERIAL_IMG_Write(path, dither = False):
+    __link.write(path, dither)
 
+# Asks the MCU for a crop of its next image
+def SERIAL_IMG_RequestROI(x, y, w, h, stride = 1):
+    __link.request_roi(x, y, w, h, stride)
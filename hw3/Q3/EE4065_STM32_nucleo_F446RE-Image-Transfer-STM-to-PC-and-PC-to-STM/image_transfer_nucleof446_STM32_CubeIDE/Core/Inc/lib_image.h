@@ -25,8 +25,13 @@ typedef enum
 	IMAGE_FORMAT_GRAYSCALE	= 1, /* 1 Byte for each pixel  */
 	IMAGE_FORMAT_RGB565		= 2, /* 2 Bytes for each pixel */
 	IMAGE_FORMAT_RGB888		= 3, /* 3 Bytes for each pixel */
+	IMAGE_FORMAT_GRAY4		= 4, /* 4 bits for each pixel  */
+	IMAGE_FORMAT_GRAY2		= 5, /* 2 bits for each pixel  */
+	IMAGE_FORMAT_GRAY1		= 6, /* 1 bit for each pixel   */
 }IMAGE_Format;
 
+/* Packed formats: pixels MSB first, every row padded to a whole byte */
+
 typedef struct
 {
 	uint8_t *pData;
@@ -37,6 +42,9 @@ typedef struct
 }IMAGE_HandleTypeDef;
 
 int8_t LIB_IMAGE_InitStruct(IMAGE_HandleTypeDef * img, uint8_t *pImg, uint16_t height, uint16_t width, IMAGE_Format format);
+uint8_t LIB_IMAGE_BitsPerPixel(IMAGE_Format format);
+uint32_t LIB_IMAGE_RowBytes(uint16_t width, IMAGE_Format format);
+int8_t LIB_IMAGE_PackGrayscale(IMAGE_HandleTypeDef * img, const uint8_t * gray);
 
 #ifdef __cplusplus
 }
@@ -16,6 +16,21 @@ extern "C" {
 #define SERIAL_OK				((int8_t)0)
 #define SERIAL_ERROR			((int8_t)-1)
 
+/* Region of interest transfers (see py_imgroi.py): the format byte carries
+ * SERIAL_IMG_ROI_FLAG and the header is followed by x, y, w, h (2 bytes each)
+ * and stride (1 byte). The PC asks for a crop with "SR" + the same fields. */
+#define SERIAL_IMG_ROI_FLAG		((uint8_t)0x40)
+#define SERIAL_IMG_ROI_MAX_ROW	((uint16_t)1024)	/* bytes of one decimated row */
+
+typedef struct
+{
+	uint16_t x;
+	uint16_t y;
+	uint16_t w;
+	uint16_t h;
+	uint8_t stride;
+}IMAGE_RoiTypeDef;
+
 /* * GÜNCELLEME 2: UART Portu değiştirildi.
  * Nucleo kartlarda VCP (PC bağlantısı) genellikle USART2'dir.
  * Eğer .ioc dosyanızda farklı bir UART (örn: USART1) kullandıysanız,
@@ -27,6 +42,8 @@ extern UART_HandleTypeDef 	__huart;
 
 int8_t LIB_SERIAL_IMG_Transmit(IMAGE_HandleTypeDef * img);
 int8_t LIB_SERIAL_IMG_Receive(IMAGE_HandleTypeDef * img);
+int8_t LIB_SERIAL_IMG_TransmitROI(IMAGE_HandleTypeDef * img, const IMAGE_RoiTypeDef * roi);
+int8_t LIB_SERIAL_IMG_ReceiveROIRequest(IMAGE_RoiTypeDef * roi, uint32_t timeout);
 
 #ifdef __cplusplus
 }
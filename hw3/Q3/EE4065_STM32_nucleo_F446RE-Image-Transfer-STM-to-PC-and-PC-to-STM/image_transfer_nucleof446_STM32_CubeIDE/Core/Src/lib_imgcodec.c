@@ -0,0 +1,61 @@
+/*
+ * lib_imgcodec.c
+ */
+
+#include <string.h>
+#include "lib_imgcodec.h"
+
+/**
+  * @brief Decodes one received payload into the image buffer
+  * @param encoding IMAGE_ENCODING_RAW, IMAGE_ENCODING_RLE or IMAGE_ENCODING_DELTA
+  * @param src      Pointer to the encoded bytes (after the 5 byte prefix)
+  * @param srcLen   Number of encoded bytes
+  * @param img      Pointer to image structure, holds the previous frame for DELTA
+  * @retval 0 if the payload decodes to exactly img->size bytes
+  */
+int8_t LIB_IMGCODEC_Decode(uint8_t encoding, const uint8_t * src, uint32_t srcLen, IMAGE_HandleTypeDef * img)
+{
+	uint8_t * __pData = img->pData;
+	uint32_t __pos = 0, __i = 0;
+	uint8_t __count = 0, __value = 0;
+
+	if (encoding == IMAGE_ENCODING_RAW)
+	{
+		if (srcLen != img->size)
+		{
+			return IMAGE_ERROR;
+		}
+		memcpy(__pData, src, srcLen);
+		return IMAGE_OK;
+	}
+	if ((encoding != IMAGE_ENCODING_RLE && encoding != IMAGE_ENCODING_DELTA) || (srcLen & 1))
+	{
+		return IMAGE_ERROR;
+	}
+	for (__i = 0; __i < srcLen; __i += 2)
+	{
+		__count = src[__i];
+		__value = src[__i + 1];
+		if (__pos + __count > img->size)
+		{
+			return IMAGE_ERROR;
+		}
+		if (encoding == IMAGE_ENCODING_RLE)
+		{
+			memset(&__pData[__pos], __value, __count);
+			__pos += __count;
+		}
+		else if (__value == 0)
+		{
+			__pos += __count;
+		}
+		else
+		{
+			while (__count--)
+			{
+				__pData[__pos++] ^= __value;
+			}
+		}
+	}
+	return (__pos == img->size) ? IMAGE_OK : IMAGE_ERROR;
+}
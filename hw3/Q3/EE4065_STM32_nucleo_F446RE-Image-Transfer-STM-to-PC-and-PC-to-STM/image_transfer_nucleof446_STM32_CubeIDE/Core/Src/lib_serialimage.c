@@ -75,6 +75,83 @@ int8_t LIB_SERIAL_IMG_Receive(IMAGE_HandleTypeDef * img)
 	return SERIAL_OK;
 }
 
+/**
+  * @brief Transmits every stride-th pixel of every stride-th row of a crop
+  * @param img Pointer to image structure, GRAYSCALE, RGB565 or RGB888
+  * @param roi Crop inside the image and decimation stride
+  * @retval 0 if successfully transmitted
+  */
+int8_t LIB_SERIAL_IMG_TransmitROI(IMAGE_HandleTypeDef * img, const IMAGE_RoiTypeDef * roi)
+{
+	static uint8_t __row[SERIAL_IMG_ROI_MAX_ROW];
+	uint8_t __header[3] = "STW";
+	uint8_t __format = (uint8_t)img->format | SERIAL_IMG_ROI_FLAG;
+	uint32_t __bpp = (uint32_t)img->format;
+	uint32_t __rowLen, __i, __x, __y;
+	uint8_t * __pSrc;
+
+	if (img->format > IMAGE_FORMAT_RGB888 || roi->stride == 0 || roi->w == 0 || roi->h == 0 ||
+		(uint32_t)roi->x + roi->w > img->width || (uint32_t)roi->y + roi->h > img->height)
+	{
+		return SERIAL_ERROR;
+	}
+	__rowLen = ((uint32_t)(roi->w + roi->stride - 1) / roi->stride) * __bpp;
+	if (__rowLen > SERIAL_IMG_ROI_MAX_ROW && roi->stride != 1)
+	{
+		return SERIAL_ERROR;
+	}
+
+	HAL_UART_Transmit(&__huart, __header, 3, 10);
+	HAL_UART_Transmit(&__huart, (uint8_t*)&img->height, 2, 10);
+	HAL_UART_Transmit(&__huart, (uint8_t*)&img->width,  2, 10);
+	HAL_UART_Transmit(&__huart, &__format, 1, 10);
+	HAL_UART_Transmit(&__huart, (uint8_t*)&roi->x, 2, 10);
+	HAL_UART_Transmit(&__huart, (uint8_t*)&roi->y, 2, 10);
+	HAL_UART_Transmit(&__huart, (uint8_t*)&roi->w, 2, 10);
+	HAL_UART_Transmit(&__huart, (uint8_t*)&roi->h, 2, 10);
+	HAL_UART_Transmit(&__huart, (uint8_t*)&roi->stride, 1, 10);
+	for (__y = roi->y; __y < (uint32_t)roi->y + roi->h; __y += roi->stride)
+	{
+		__pSrc = img->pData + (__y * img->width + roi->x) * __bpp;
+		if (roi->stride == 1)
+		{
+			/* Contiguous row segment, no copy */
+			HAL_UART_Transmit(&__huart, __pSrc, (uint16_t)__rowLen, 1000);
+			continue;
+		}
+		for (__x = 0, __i = 0; __x < roi->w; __x += roi->stride, __pSrc += roi->stride * __bpp)
+		{
+			__row[__i++] = __pSrc[0];
+			if (__bpp > 1) __row[__i++] = __pSrc[1];
+			if (__bpp > 2) __row[__i++] = __pSrc[2];
+		}
+		HAL_UART_Transmit(&__huart, __row, (uint16_t)__rowLen, 1000);
+	}
+	HAL_Delay(1);
+	return SERIAL_OK;
+}
+
+/**
+  * @brief Waits for a crop request ("SR" + x, y, w, h, stride) from the PC
+  * @param roi     Receives the requested crop
+  * @param timeout HAL timeout in ms
+  * @retval 0 if a request was received
+  */
+int8_t LIB_SERIAL_IMG_ReceiveROIRequest(IMAGE_RoiTypeDef * roi, uint32_t timeout)
+{
+	uint8_t __msg[11];
+
+	if (HAL_UART_Receive(&__huart, __msg, sizeof(__msg), timeout) != HAL_OK || __msg[0] != 'S' || __msg[1] != 'R')
+	{
+		return SERIAL_ERROR;
+	}
+	roi->x		= (uint16_t)(__msg[2] | (__msg[3] << 8));
+	roi->y		= (uint16_t)(__msg[4] | (__msg[5] << 8));
+	roi->w		= (uint16_t)(__msg[6] | (__msg[7] << 8));
+	roi->h		= (uint16_t)(__msg[8] | (__msg[9] << 8));
+	roi->stride	= __msg[10];
+	return SERIAL_OK;
+}
 
 //
 //void LIB_SERIAL_ImageCapture(IMAGE_HandleTypeDef * img)
@@ -0,0 +1,200 @@
+import os
+import sys
+import mmap
+import time
+import argparse
+
+import numpy as np
+import cv2
+
+import py_serialimg
+
+# Append-only frame archive for headless capture.
+#
+#   <path>      raw payloads back to back, written through a memory map that
+#               grows in GROW_BYTES steps and is trimmed on close()
+#   <path>.idx  one INDEX_DTYPE record per frame (timestamp, geometry, offset)
+#
+# The index is the source of truth: after a crash the data file may carry
+# unused preallocated space, frames without an index record are ignored.
+#
+#   with FrameArchive("capture.bin", "a") as archive:
+#       link.capture(archive)
+#   archive = FrameArchive("capture.bin")
+#   timestamp, img = archive.image(0)
+
+INDEX_DTYPE = np.dtype([("timestamp", "<f8"), ("width", "<u2"), ("height", "<u2"),
+                        ("format", "u1"), ("offset", "<u8"), ("size", "<u4")])
+GROW_BYTES  = 64 << 20
+
+class FrameArchive:
+    def __init__(self, path, mode = "r"):
+        if mode not in ("r", "a"):
+            raise ValueError(f"mode must be 'r' or 'a', not {mode!r}")
+        self.path  = path
+        self.mode  = mode
+        self.index = np.fromfile(path + ".idx", dtype = INDEX_DTYPE) \
+                     if os.path.exists(path + ".idx") else np.empty(0, dtype = INDEX_DTYPE)
+        self.used  = int(self.index["offset"][-1] + self.index["size"][-1]) if len(self.index) else 0
+        self.map   = None
+        self.view  = None
+        if mode == "r":
+            self.file = open(path, "rb")
+            if self.used:
+                self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+            self.indexFile = None
+        else:
+            self.file      = open(path, "r+b" if os.path.exists(path) else "w+b")
+            self.indexFile = open(path + ".idx", "ab")
+            self.records   = []
+            self.capacity  = 0
+            self.grow(self.used)
+
+    # Remaps the data file so at least `needed` bytes are writable
+    def grow(self, needed):
+        if needed <= self.capacity and self.map is not None:
+            return
+        if self.map is not None:
+            self.map.close()
+        self.capacity = max(needed, self.capacity) + GROW_BYTES
+        self.file.truncate(self.capacity)
+        self.map = mmap.mmap(self.file.fileno(), self.capacity)
+
+    # Writable view for the next frame's payload; commit() makes it a frame
+    def reserve(self, size):
+        self.grow(self.used + size)
+        self.view = memoryview(self.map)[self.used:self.used + size]
+        return self.view
+
+    def commit(self, width, height, format, timestamp = None):
+        size = len(self.view)
+        self.view.release()
+        self.view = None
+        self.records.append((time.time() if timestamp is None else timestamp,
+                             width, height, format, self.used, size))
+        self.used += size
+        if len(self.records) >= 64:
+            self.flush()
+
+    # Drops a reserve() that did not receive a complete frame
+    def cancel(self):
+        self.view.release()
+        self.view = None
+
+    def append(self, data, width, height, format, timestamp = None):
+        self.reserve(len(data))[:] = data
+        self.commit(width, height, format, timestamp)
+
+    def flush(self):
+        if self.mode == "r" or not self.records:
+            return
+        records = np.array(self.records, dtype = INDEX_DTYPE)
+        self.indexFile.write(records.tobytes())
+        self.indexFile.flush()
+        self.index   = np.concatenate([self.index, records])
+        self.records = []
+
+    def __len__(self):
+        return len(self.index) + (len(self.records) if self.mode == "a" else 0)
+
+    # Raw payload of frame i as a uint8 view into the archive; views must be
+    # dropped before close()
+    def payload(self, i):
+        self.flush()
+        record = self.index[i]
+        return np.frombuffer(self.map, dtype = np.uint8, count = int(record["size"]),
+                             offset = int(record["offset"]))
+
+    # (timestamp, BGR image) of frame i
+    def image(self, i):
+        payload = self.payload(i)    # flushes pending records into the index
+        record  = self.index[i]
+        img = py_serialimg.payload_to_image(payload, int(record["width"]),
+                                            int(record["height"]), int(record["format"]))
+        return float(record["timestamp"]), img
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.image(i)
+
+    def close(self):
+        if self.mode == "a":
+            self.flush()
+            self.indexFile.close()
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.mode == "a":
+            self.file.truncate(self.used)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Records every MCU_WRITES frame into the archive (MCU_READS requests are
+# answered with `reply` if given) until `frames` are captured or Ctrl+C.
+def capture(port, path, frames = None, view = False, reply = None):
+    link     = py_serialimg.SerialImageLink(port)
+    viewer   = py_serialimg.FrameViewer() if view else None
+    start    = time.perf_counter()
+    captured = 0    # link.frames also counts the replies
+    with FrameArchive(path, "a") as archive:
+        try:
+            while frames is None or captured < frames:
+                rqType, height, width, format = link.poll_for_request()
+                if rqType == py_serialimg.MCU_WRITES:
+                    link.capture(archive, viewer)
+                    captured += 1
+                elif rqType == py_serialimg.MCU_READS and reply is not None:
+                    link.write(reply)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            elapsed = time.perf_counter() - start
+            if viewer is not None:
+                viewer.close()
+            link.close()
+        print(f"{captured} frames in {elapsed:.2f} s ({captured / max(elapsed, 1e-9):.1f} fps), "
+              f"{len(archive)} in {path}")
+
+# Replays an archive in a window, or writes it out as PNG files
+def replay(path, export = None, delay = 30):
+    archive = FrameArchive(path)
+    img = None
+    for i in range(len(archive)):
+        timestamp, img = archive.image(i)
+        if export:
+            cv2.imwrite(os.path.join(export, f"frame_{i:06d}.png"), img)
+        else:
+            cv2.imshow(path, img)
+            if cv2.waitKey(delay) == 27:
+                break
+    # The last frame may still view the archive's memory map
+    img = None
+    if not export:
+        cv2.destroyAllWindows()
+    archive.close()
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Headless frame capture to a memory-mapped archive")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    record = commands.add_parser("capture")
+    record.add_argument("port")
+    record.add_argument("path")
+    record.add_argument("--frames", type = int, default = None)
+    record.add_argument("--view", action = "store_true", help = "show frames in a non-blocking window")
+    record.add_argument("--reply", help = "image sent for MCU_READS requests")
+    play = commands.add_parser("replay")
+    play.add_argument("path")
+    play.add_argument("--export", help = "write PNG files to this directory instead of showing")
+    args = parser.parse_args(argv)
+    if args.command == "capture":
+        capture(args.port, args.path, args.frames, args.view, args.reply)
+    else:
+        replay(args.path, args.export)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,94 @@
+import time
+import struct
+from collections import namedtuple
+
+import numpy as np
+import cv2
+
+# Region of interest transfers.
+#
+# Bit 6 of the header format byte marks an ROI request. The header width and
+# height stay the full frame geometry and are followed by
+#
+#   x(2) + y(2) + w(2) + h(2) + stride(1)
+#
+# The payload then only holds every stride-th pixel of every stride-th row
+# of the (x, y, w, h) crop: ceil(w / stride) x ceil(h / stride) pixels in the
+# request's pixel format, encoded/framed like a full frame.
+#
+# The host asks the MCU for a crop with the same fields behind "SR":
+#
+#   "SR" + x(2) + y(2) + w(2) + h(2) + stride(1)
+#
+# and the next MCU_WRITES request answers it.
+
+ROI_FLAG    = 0x40
+ROI_FORMAT  = "<HHHHB"
+ROI_SIZE    = struct.calcsize(ROI_FORMAT)
+ROI_REQUEST = b"SR"
+
+class Roi(namedtuple("Roi", "x y w h stride")):
+    __slots__ = ()
+
+    # Payload geometry (width, height) after decimation
+    @property
+    def tile_size(self):
+        return -(-self.w // self.stride), -(-self.h // self.stride)
+
+    def fits(self, width, height):
+        return (self.w > 0 and self.h > 0 and self.stride > 0
+                and self.x + self.w <= width and self.y + self.h <= height)
+
+    def pack(self):
+        return struct.pack(ROI_FORMAT, *self)
+
+    # The decimated crop of a full frame (view, no copy)
+    def crop(self, frame):
+        return frame[self.y:self.y + self.h:self.stride, self.x:self.x + self.w:self.stride]
+
+def request_bytes(roi):
+    return ROI_REQUEST + Roi(*roi).pack()
+
+# Full frame BGR buffer assembled from ROI tiles.
+# The frame is split into cell x cell blocks; every block remembers when and
+# at which stride it was last written, so the host can re-request stale or
+# coarse areas only.
+class TileCanvas:
+    def __init__(self, width, height, cell = 16):
+        self.width   = width
+        self.height  = height
+        self.cell    = cell
+        self.image   = np.zeros((height, width, 3), dtype = np.uint8)
+        grid         = (-(-height // cell), -(-width // cell))
+        self.updated = np.full(grid, -np.inf)
+        self.stride  = np.zeros(grid, dtype = np.uint8)
+
+    # Pastes a decoded tile (BGR, roi.tile_size) into the frame. Decimated
+    # tiles are scaled back up with nearest neighbour.
+    def update(self, roi, tile, timestamp = None):
+        roi = Roi(*roi)
+        if roi.stride > 1:
+            tile = cv2.resize(tile, (roi.tile_size[0] * roi.stride, roi.tile_size[1] * roi.stride),
+                              interpolation = cv2.INTER_NEAREST)
+        self.image[roi.y:roi.y + roi.h, roi.x:roi.x + roi.w] = tile[:roi.h, :roi.w]
+        # Only cells fully covered by the tile count as refreshed
+        c = self.cell
+        rows = slice(-(-roi.y // c), (roi.y + roi.h) // c + (roi.y + roi.h == self.height))
+        cols = slice(-(-roi.x // c), (roi.x + roi.w) // c + (roi.x + roi.w == self.width))
+        self.updated[rows, cols] = time.monotonic() if timestamp is None else timestamp
+        self.stride[rows, cols] = roi.stride
+
+    # Cells older than max_age seconds (or never written), as a boolean grid
+    def stale(self, max_age, now = None):
+        now = time.monotonic() if now is None else now
+        return now - self.updated > max_age
+
+    # Bounding Roi of the stale cells, None if everything is fresh
+    def stale_roi(self, max_age, stride = 1, now = None):
+        rows, cols = np.nonzero(self.stale(max_age, now))
+        if rows.size == 0:
+            return None
+        c = self.cell
+        x, y = int(cols.min()) * c, int(rows.min()) * c
+        return Roi(x, y, min(self.width, (int(cols.max()) + 1) * c) - x,
+                   min(self.height, (int(rows.max()) + 1) * c) - y, stride)
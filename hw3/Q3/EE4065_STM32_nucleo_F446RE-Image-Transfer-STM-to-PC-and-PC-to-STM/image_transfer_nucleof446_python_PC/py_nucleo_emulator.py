@@ -0,0 +1,200 @@
+import os
+import sys
+import pty
+import tty
+import time
+import select
+import struct
+import argparse
+import threading
+
+import numpy as np
+
+import py_serialimg
+import py_imgcodec
+import py_imgframing
+import py_imgpack
+import py_imgroi
+
+# Stand-in for the Nucleo firmware that speaks the lib_serialimage.c protocol
+# over a pseudo terminal, so py_serialimg can be exercised without hardware.
+# Open `emulator.port` with py_serialimg.SerialImageLink like a real COM port.
+#
+#   mix        : request pattern, cycled ("W" = MCU_WRITES, "R" = MCU_READS)
+#   baudrate   : simulated line rate (10 bits per byte), None for pty speed
+#   error_rate : probability of a flipped bit in each transmitted byte
+#   encodings  : py_imgcodec flags advertised in the header format byte
+#   framed     : use py_imgframing chunks with CRC and selective retransmit
+#   roi        : (x, y, w, h, stride) carried by every request, None for full frames
+#
+# Transmitted frames are a flat background with a moving square, so the
+# RLE/DELTA encodings behave like they do on real, mostly static scenes.
+# POSIX only (pty).
+class VirtualNucleo:
+    def __init__(self, width = 128, height = 128, format = py_serialimg.IMAGE_FORMAT_RGB565,
+                 mix = "W", frames = 100, baudrate = None, error_rate = 0.0, encodings = 0,
+                 framed = False, roi = None, seed = 0):
+        self.width      = width
+        self.height     = height
+        self.format     = format
+        self.mix        = mix
+        self.frames     = frames
+        self.baudrate   = baudrate
+        self.error_rate = error_rate
+        self.encodings  = encodings
+        self.framed     = framed
+        self.roi        = py_imgroi.Roi(*roi) if roi else None
+        self.rng        = np.random.default_rng(seed)
+        self.txCodec    = py_imgcodec.PayloadCodec()
+        self.rxCodec    = py_imgcodec.PayloadCodec()
+        self.imgSize    = py_imgpack.payload_size(*(self.roi.tile_size if self.roi else (width, height)), format)
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        self.port       = os.ttyname(self.slave)
+        self.thread     = None
+        self.sent       = 0
+        self.received   = 0
+        self.flipped    = 0
+        self.retransmitted = 0
+        self.failed     = 0
+
+    def scene(self, index):
+        packed = py_imgpack.is_packed(self.format)
+        frame = np.full((self.height, self.width) if packed else (self.height, self.width, self.format),
+                        32, dtype = np.uint8)
+        size  = max(1, min(self.width, self.height) // 4)
+        x = (index * 3) % max(1, self.width - size)
+        y = (index * 2) % max(1, self.height - size)
+        frame[y:y + size, x:x + size] = 200
+        if self.roi:
+            frame = np.ascontiguousarray(self.roi.crop(frame))
+        return py_imgpack.pack(frame, self.format) if packed else frame.tobytes()
+
+    def header(self, requestType):
+        format = self.format | self.encodings | (py_imgframing.FRAMED_FLAG if self.framed else 0)
+        if self.roi:
+            format |= py_imgroi.ROI_FLAG
+        header = py_serialimg.HEADER_SYNC + struct.pack(py_serialimg.HEADER_FORMAT, requestType,
+                                                        self.width, self.height, format)
+        return header + self.roi.pack() if self.roi else header
+
+    def corrupt(self, data):
+        if not self.error_rate:
+            return data
+        data = np.frombuffer(data, dtype = np.uint8).copy()
+        hits = np.flatnonzero(self.rng.random(data.size) < self.error_rate)
+        data[hits] ^= (1 << self.rng.integers(0, 8, hits.size)).astype(np.uint8)
+        self.flipped += hits.size
+        return data.tobytes()
+
+    # Writes data paced to the simulated baud rate
+    def transmit(self, data):
+        data  = memoryview(self.corrupt(data))
+        chunk = len(data) if self.baudrate is None else max(64, self.baudrate // 10000)
+        start = time.perf_counter()
+        done  = 0
+        while done < len(data):
+            done += os.write(self.master, data[done:done + chunk])
+            if self.baudrate is not None:
+                delay = start + done * 10 / self.baudrate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        self.sent += len(data)
+
+    def receive(self, n):
+        data = bytearray()
+        while len(data) < n:
+            chunk = os.read(self.master, n - len(data))
+            if not chunk:
+                raise ConnectionError("Host closed the port")
+            data += chunk
+        self.received += n
+        return bytes(data)
+
+    # Whatever the host sent within timeout, for py_imgframing
+    def receive_some(self, timeout):
+        if not select.select([self.master], [], [], timeout)[0]:
+            return b""
+        data = os.read(self.master, 65536)
+        self.received += len(data)
+        return data
+
+    def send_payload(self, payload):
+        if self.encodings:
+            payload = self.txCodec.encode(payload, self.encodings)
+        if self.framed:
+            self.retransmitted += py_imgframing.send_framed(payload, self.transmit, self.receive_some)
+        else:
+            self.transmit(payload)
+
+    def receive_payload(self):
+        if self.framed:
+            # The host may have missed the header, then nothing comes at all
+            wire = py_imgframing.receive_framed(self.transmit, self.receive_some, start_timeout = 1.0)
+            if self.encodings:
+                encoding, length = struct.unpack_from(py_imgcodec.PREFIX_FORMAT, wire)
+                self.rxCodec.decode(encoding, wire[py_imgcodec.PREFIX_SIZE:], self.imgSize)
+        elif self.encodings:
+            encoding, length = struct.unpack(py_imgcodec.PREFIX_FORMAT,
+                                             self.receive(py_imgcodec.PREFIX_SIZE))
+            self.rxCodec.decode(encoding, self.receive(length), self.imgSize)
+        else:
+            self.receive(self.imgSize)
+
+    # A transfer that fails (e.g. the host missed a damaged header) is
+    # counted in failed and the next request is served, like the firmware
+    def run(self):
+        for index in range(self.frames):
+            try:
+                if self.mix[index % len(self.mix)] == "W":
+                    self.transmit(self.header(py_serialimg.MCU_WRITES))
+                    self.send_payload(self.scene(index))
+                else:
+                    self.transmit(self.header(py_serialimg.MCU_READS))
+                    self.receive_payload()
+            except (ValueError, TimeoutError):
+                self.failed += 1
+
+    def start(self):
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+        return self
+
+    def join(self, timeout = None):
+        self.thread.join(timeout)
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description = "Virtual Nucleo-F446RE image transfer board")
+    parser.add_argument("--width", type = int, default = 128)
+    parser.add_argument("--height", type = int, default = 128)
+    parser.add_argument("--format", type = int, default = py_serialimg.IMAGE_FORMAT_RGB565)
+    parser.add_argument("--mix", default = "W")
+    parser.add_argument("--frames", type = int, default = 100)
+    parser.add_argument("--baud", type = int, default = None)
+    parser.add_argument("--errors", type = float, default = 0.0)
+    parser.add_argument("--encodings", type = lambda v: int(v, 0), default = 0)
+    parser.add_argument("--framed", action = "store_true")
+    parser.add_argument("--roi", type = lambda v: tuple(int(n) for n in v.split(",")), default = None,
+                        help = "x,y,w,h,stride")
+    parser.add_argument("--seed", type = int, default = 0)
+    return parser.parse_args(argv)
+
+# Prints the port name, then starts serving once a line arrives on stdin;
+# prints "done <failed transfers>" after the last request
+def main(argv):
+    args = parse_args(argv)
+    board = VirtualNucleo(args.width, args.height, args.format, args.mix, args.frames,
+                          args.baud, args.errors, args.encodings, args.framed, args.roi, args.seed)
+    print(board.port, flush = True)
+    sys.stdin.readline()
+    board.run()
+    print("done", board.failed, flush = True)
+    sys.stdin.readline()
+    board.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import time
+import select
+import argparse
+import subprocess
+
+import numpy as np
+
+import py_serialimg
+import py_imgroi
+
+# Host-side throughput benchmark for py_serialimg against py_nucleo_emulator.
+# The emulator runs in its own process so CPU time measured here is the
+# host's only. Reports payload MB/s, latency percentiles of
+# SERIAL_IMG_PollForRequest / SERIAL_IMG_Read / SERIAL_IMG_Write and host CPU
+# per frame. With --baseline it fails when MB/s drops or CPU per frame rises
+# by more than --tolerance against a previous --json result:
+#
+#   python py_serialbench.py --mix WR --frames 500 --json base.json
+#   python py_serialbench.py --mix WR --frames 500 --baseline base.json
+
+EMULATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "py_nucleo_emulator.py")
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    values = np.percentile(np.asarray(samples) * 1e3, [50, 90, 99])
+    return {"p50_ms": float(values[0]), "p90_ms": float(values[1]), "p99_ms": float(values[2])}
+
+def run(args):
+    emulator = subprocess.Popen(
+        [sys.executable, EMULATOR, "--width", str(args.width), "--height", str(args.height),
+         "--format", str(args.format), "--mix", args.mix, "--frames", str(args.frames),
+         "--errors", str(args.errors), "--encodings", str(args.encodings)]
+        + (["--baud", str(args.baud)] if args.baud else [])
+        + (["--framed"] if args.framed else [])
+        + (["--roi", ",".join(map(str, args.roi))] if args.roi else [])
+        + ["--seed", str(args.seed)],
+        stdin = subprocess.PIPE, stdout = subprocess.PIPE, text = True)
+    port = emulator.stdout.readline().strip()
+    link = py_serialimg.SerialImageLink(port, timeout = args.timeout)
+    tile = py_imgroi.Roi(*args.roi).tile_size if args.roi else (args.width, args.height)
+    ring = py_serialimg.FrameRing(*tile, args.format) if args.ring else None
+    # Converted by every write, like SERIAL_IMG_Write does with its image
+    frame = np.full((args.height, args.width, 3), 128, dtype = np.uint8)
+
+    latency = {"poll": [], "read": [], "write": []}
+    cpu = []
+    transferred = 0
+    # The emulator prints "done" once it served its last request
+    served = lambda: bool(select.select([emulator.stdout], [], [], 0)[0])
+    emulator.stdin.write("start\n")
+    emulator.stdin.flush()
+    start = time.perf_counter()
+    while len(cpu) < args.frames:
+        deadline = time.perf_counter() + args.timeout
+        t0, c0 = time.perf_counter(), time.process_time()
+        request = link.poll_for_request(stop = lambda: time.perf_counter() > deadline or served())
+        t1 = time.perf_counter()
+        if request is None:
+            # A framed emulator gives up on a request whose header was
+            # damaged and sends the next one
+            if served() or not args.framed:
+                break
+            continue
+        latency["poll"].append(t1 - t0)
+        try:
+            if request[0] == py_serialimg.MCU_WRITES:
+                if ring is not None:
+                    link.read_frame(ring).release()
+                else:
+                    link.read(show = False)
+                latency["read"].append(time.perf_counter() - t1)
+            else:
+                link.write(frame)
+                latency["write"].append(time.perf_counter() - t1)
+            transferred += link.imgSize
+            cpu.append(time.process_time() - c0)
+        except (ValueError, TimeoutError):
+            # Counted in failed, the link stays in sync for the next request
+            pass
+    elapsed = time.perf_counter() - start
+
+    emulator.stdin.close()
+    emulator.wait()
+    link.close()
+    return {
+        "config":          {key: value for key, value in vars(args).items()
+                            if key not in ("json", "baseline", "tolerance")},
+        "frames":          len(cpu),
+        "failed":          args.frames - len(cpu),
+        "seconds":         elapsed,
+        "mb_per_s":        transferred / elapsed / 1e6,
+        "cpu_us_per_frame": float(np.mean(cpu) * 1e6) if cpu else 0.0,
+        "poll":            percentiles(latency["poll"]),
+        "read":            percentiles(latency["read"]),
+        "write":           percentiles(latency["write"]),
+    }
+
+# Returns a list of regressions against a previous result
+def compare(result, baseline, tolerance):
+    problems = []
+    if result["mb_per_s"] < baseline["mb_per_s"] * (1 - tolerance):
+        problems.append(f"MB/s {result['mb_per_s']:.2f} < baseline {baseline['mb_per_s']:.2f}")
+    if result["cpu_us_per_frame"] > baseline["cpu_us_per_frame"] * (1 + tolerance):
+        problems.append(f"CPU/frame {result['cpu_us_per_frame']:.0f} us > "
+                        f"baseline {baseline['cpu_us_per_frame']:.0f} us")
+    return problems
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description = "py_serialimg throughput benchmark")
+    parser.add_argument("--width", type = int, default = 128)
+    parser.add_argument("--height", type = int, default = 128)
+    parser.add_argument("--format", type = int, default = py_serialimg.IMAGE_FORMAT_RGB565)
+    parser.add_argument("--mix", default = "W")
+    parser.add_argument("--frames", type = int, default = 200)
+    parser.add_argument("--baud", type = int, default = None)
+    parser.add_argument("--errors", type = float, default = 0.0)
+    parser.add_argument("--encodings", type = lambda v: int(v, 0), default = 0)
+    parser.add_argument("--framed", action = "store_true", help = "chunked CRC framing with retransmit")
+    parser.add_argument("--ring", action = "store_true", help = "receive with read_frame() into a FrameRing")
+    parser.add_argument("--roi", type = lambda v: tuple(int(n) for n in v.split(",")), default = None,
+                        help = "x,y,w,h,stride carried by every request")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the emulator's bit errors")
+    parser.add_argument("--timeout", type = float, default = 2.0)
+    parser.add_argument("--json", help = "write the result to this file")
+    parser.add_argument("--baseline", help = "previous --json result to compare against")
+    parser.add_argument("--tolerance", type = float, default = 0.15)
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    result = run(args)
+    print(f"Frames       : {result['frames']} ok, {result['failed']} failed in {result['seconds']:.2f} s")
+    print(f"Throughput   : {result['mb_per_s']:.2f} MB/s")
+    print(f"CPU / frame  : {result['cpu_us_per_frame']:.0f} us")
+    for name in ("poll", "read", "write"):
+        if result[name]:
+            print(f"{name:<13}: " + "  ".join(f"{k} {v:.3f}" for k, v in result[name].items()))
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(result, file, indent = 2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            problems = compare(result, json.load(file), args.tolerance)
+        for problem in problems:
+            print("REGRESSION:", problem)
+        return 1 if problems else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))